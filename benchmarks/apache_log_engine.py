@@ -0,0 +1,99 @@
+"""
+Benchmarks the native log engine against the legacy gunzip + grep/awk pipeline.
+
+Usage:
+    python -m benchmarks.apache_log_engine --file access.log.gz --size-mb 2048
+    python -m benchmarks.apache_log_engine --file access.log.gz --language telugu --date 2024-05-26
+    python -m benchmarks.apache_log_engine --file access.log --workers 1,2,4,8 --chunk-mb 32
+
+If --file does not exist it is created (gzipped if it ends in .gz) with
+`benchmarks.apache_log_generator`, holding --size-mb of log text.
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.apache_log_generator import ApacheLogGenerator
+from question_handlers.apache_log_engine import find_top_ip, is_gzip_file
+
+LANGUAGES = ["telugu", "tamil", "hindi", "kannada", "malayalam"]
+
+
+def build_log(file_path, size_mb, date, seed=42):
+    """
+    Writes a synthetic log of roughly `size_mb` megabytes of uncompressed text, all on `date` (DD/Mon/YYYY).
+    """
+    start = datetime.strptime(date, "%d/%b/%Y").strftime("%Y-%m-%d")
+    generator = ApacheLogGenerator(seed=seed, languages=dict.fromkeys(LANGUAGES, 1.0), start=start, days=1)
+    return generator.write(file_path, size_mb=size_mb, compresslevel=1)["bytes"]
+
+
+def run_legacy_pipeline(file_path, language, date):
+    """
+    Runs the pre-engine pipeline: gunzip to a temp file, then grep | grep | awk | sort.
+    """
+    temp_path = None
+    try:
+        if is_gzip_file(file_path):
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".log")
+            temp_path = temp_file.name
+            temp_file.close()
+            subprocess.run(f"gunzip -c '{file_path}' > '{temp_path}'", shell=True, check=True)
+            log_path = temp_path
+        else:
+            log_path = file_path
+
+        command = f"""
+        grep '/{language}/' {log_path} | grep '{date}' | \\
+        awk '{{sum[$1] += $10}} END {{for (ip in sum) print ip, sum[ip]}}' | \\
+        sort -k2 -nr | head -1
+        """
+        return subprocess.run(command, shell=True, capture_output=True, text=True).stdout.strip()
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", required=True)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--language", default="telugu")
+    parser.add_argument("--date", default="2024-05-26")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--workers", default="1", help="Comma-separated worker counts to compare, e.g. 1,2,4,8")
+    parser.add_argument("--chunk-mb", type=int, default=32, help="Bytes per worker task, in MB")
+    args = parser.parse_args()
+
+    log_date = datetime.strptime(args.date, "%Y-%m-%d").strftime("%d/%b/%Y")
+    if not os.path.exists(args.file):
+        start = time.perf_counter()
+        written = build_log(args.file, args.size_mb, log_date)
+        print(f"Built {args.file}: {written / 1024 ** 2:.0f} MB of log text in {time.perf_counter() - start:.1f} s")
+
+    for run in range(args.repeat):
+        start = time.perf_counter()
+        legacy = run_legacy_pipeline(args.file, args.language, log_date)
+        legacy_seconds = time.perf_counter() - start
+
+        print(f"run {run + 1}:")
+        print(f"  legacy pipeline:     {legacy_seconds:8.2f} s  -> {legacy}")
+        baseline = None
+        for workers in (int(value) for value in args.workers.split(",")):
+            start = time.perf_counter()
+            result, stats = find_top_ip(
+                args.file, args.language, log_date, workers=workers, chunk_size=args.chunk_mb * 1024 ** 2
+            )
+            engine_seconds = time.perf_counter() - start
+            baseline = baseline or engine_seconds
+            mb = stats["bytes_scanned"] / 1024 ** 2
+            print(f"  engine, {workers:2d} worker(s): {engine_seconds:8.2f} s  {mb / engine_seconds:8.1f} MB/s  "
+                  f"x{baseline / engine_seconds:.2f}  ({stats['lines']} lines, {mb:.0f} MB) -> "
+                  f"{result['top_ip'] if result else None} {result['total_bytes'] if result else ''}")
+
+
+if __name__ == "__main__":
+    main()
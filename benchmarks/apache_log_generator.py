@@ -0,0 +1,295 @@
+"""
+Seeded, vectorized generator of synthetic Apache combined-format logs.
+
+Usage:
+    python -m benchmarks.apache_log_generator --out access.log.gz --size-mb 1024
+    python -m benchmarks.apache_log_generator --out access.log --lines 1000000 --ips 50000 --ip-skew 1.2 --ipv6 0.1
+    python -m benchmarks.apache_log_generator --out access.log --languages telugu=3,tamil=1 --start 2024-05-01 --days 31
+
+Every field of a chunk of lines is drawn with NumPy at once and rendered
+into a NUL-padded byte matrix; dropping the padding yields the chunk's text,
+so no Python code runs per line. Timestamps increase through the file like
+a real access log. The same seed and options always produce the same bytes.
+"""
+import argparse
+import gzip
+import socket
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DEFAULT_LANGUAGES = {"telugu": 1.0, "tamil": 1.0, "hindi": 1.0, "kannada": 0.7, "malayalam": 0.7}
+DEFAULT_STATUS_MIX = {200: 0.86, 206: 0.02, 302: 0.02, 304: 0.04, 404: 0.05, 500: 0.01}
+METHODS = {b"GET": 0.9, b"POST": 0.07, b"HEAD": 0.03}
+# Page under /<language>/ and its median response size in bytes
+PAGES = {
+    b"index.html": 12000,
+    b"about.html": 8000,
+    b"news/": 30000,
+    b"blog/": 60000,
+    b"css/style.css": 3000,
+    b"js/script.js": 5000,
+    b"images/banner.jpg": 250000,
+    b"downloads/file.pdf": 1200000,
+    b"videos/intro.mp4": 3000000,
+}
+OTHER_PATHS = {b"/favicon.ico": 1500, b"/robots.txt": 200, b"/static/app.js": 80000, b"/api/health": 50}
+REFERRERS = [b"-", b"https://www.google.com/", b"https://www.bing.com/", b"https://example.com/"]
+USER_AGENTS = [
+    b"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    b"Mozilla/5.0 (Macintosh; Intel Mac OS X 14_4) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    b"Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0",
+    b"Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    b"curl/8.5.0",
+]
+CHUNK_LINES = 200_000
+# Share of requests outside any /<language>/ section
+OTHER_SHARE = 0.1
+
+
+def _weights(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values / values.sum()
+
+
+def _draw(rng, probabilities, size):
+    """
+    Draws `size` indices from a discrete distribution.
+    """
+    return np.minimum(np.searchsorted(np.cumsum(probabilities), rng.random(size)), len(probabilities) - 1)
+
+
+def _fixed(strings):
+    """
+    Returns a NUL-padded 'S' array of byte strings.
+    """
+    return np.array(strings, dtype=bytes)
+
+
+def _matrix(field):
+    """
+    Views an (n,) 'S<w>' array as an (n, w) uint8 matrix.
+    """
+    field = np.ascontiguousarray(field)
+    return field.view(np.uint8).reshape(len(field), field.dtype.itemsize)
+
+
+def _constant(text, rows):
+    return np.broadcast_to(np.frombuffer(text, dtype=np.uint8), (rows, len(text)))
+
+
+def _digits(values, width):
+    """
+    Renders non-negative integers as right-aligned decimal digits, NUL-padded on the left.
+    """
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = (values[:, None] // powers % 10 + 48).astype(np.uint8)
+    leading = values[:, None] < powers
+    leading[:, -1] = False
+    digits[leading] = 0
+    return digits
+
+
+def _ip_pool(rng, count, ipv6_share):
+    """
+    Returns `count` distinct client addresses, in random popularity order.
+    """
+    v6_count = int(round(count * ipv6_share))
+    v4_count = count - v6_count
+    # Public-looking IPv4 space: first octet 1-223
+    v4 = np.unique(rng.integers(1 << 24, 224 << 24, size=int(v4_count * 1.1) + 16, dtype=np.uint32))
+    v4 = rng.permutation(v4)[:v4_count]
+    pool = [socket.inet_ntoa(int(value).to_bytes(4, "big")).encode() for value in v4]
+    # IPv6 under 2001:db8::/32
+    v6 = rng.integers(0, 1 << 63, size=(v6_count, 2), dtype=np.int64)
+    for hi, lo in v6:
+        raw = b"\x20\x01\x0d\xb8" + int(hi).to_bytes(8, "big")[4:] + int(lo).to_bytes(8, "big")
+        pool.append(socket.inet_ntop(socket.AF_INET6, raw).encode())
+    return _fixed(rng.permutation(np.array(pool, dtype=object)).tolist())
+
+
+class ApacheLogGenerator:
+    """
+    Writes synthetic logs for benchmarking the log handlers.
+
+    IP popularity follows a Zipf law over `ips` addresses (`ip_skew` = 0 is
+    uniform; around 1 gives a few heavy hitters), a share `ipv6` of them
+    IPv6. Requests go to /<language>/ sections with the given relative
+    weights (plus a few paths outside any section), spread evenly over
+    `days` days from `start`. Response sizes are log-normal around a median
+    per page; 304 responses and HEAD requests log "-" for the size.
+    """
+
+    def __init__(self, seed=42, ips=100_000, ip_skew=1.1, ipv6=0.05, languages=None, start="2024-05-01",
+                 days=31, status_mix=None, timezone="+0000"):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.languages = dict(languages or DEFAULT_LANGUAGES)
+        self.start = datetime.strptime(start, "%Y-%m-%d")
+        self.days = days
+        self.timezone = timezone.encode()
+
+        self.ips = _ip_pool(self.rng, ips, ipv6)
+        ranks = np.arange(1, len(self.ips) + 1, dtype=np.float64)
+        self.ip_probabilities = _weights(ranks ** -ip_skew)
+
+        paths, medians, weights = [], [], []
+        language_weights = _weights(list(self.languages.values())) * (1 - OTHER_SHARE)
+        for language, weight in zip(self.languages, language_weights):
+            for page, median in PAGES.items():
+                paths.append(b"/" + language.encode() + b"/" + page)
+                medians.append(median)
+                weights.append(weight / len(PAGES))
+        for path, median in OTHER_PATHS.items():
+            paths.append(path)
+            medians.append(median)
+            weights.append(OTHER_SHARE / len(OTHER_PATHS))
+        self.paths = _fixed(paths)
+        self.path_medians = np.array(medians, dtype=np.float64)
+        self.path_probabilities = _weights(weights)
+
+        status_mix = status_mix or DEFAULT_STATUS_MIX
+        self.statuses = np.array(list(status_mix), dtype=np.int64)
+        self.status_probabilities = _weights(list(status_mix.values()))
+        self.methods = _fixed(list(METHODS))
+        self.method_probabilities = _weights(list(METHODS.values()))
+        self.referrers = _fixed(REFERRERS)
+        self.user_agents = _fixed(USER_AGENTS)
+
+        self.day_prefixes = _fixed([
+            (self.start + timedelta(days=day)).strftime("%d/%b/%Y:").encode() for day in range(days)
+        ])
+        self.times_of_day = _fixed([
+            b"%02d:%02d:%02d" % (second // 3600, second // 60 % 60, second % 60) for second in range(86400)
+        ])
+
+    def render(self, first_line, count, total_lines, rng=None):
+        """
+        Renders lines [first_line, first_line + count) of a log with `total_lines` lines.
+
+        Returns:
+            bytes: The lines, newline-terminated.
+        """
+        rng = rng or self.rng
+        span = self.days * 86400
+        # Evenly spaced, jittered timestamps: increasing through the file
+        seconds = ((np.arange(first_line, first_line + count) + rng.random(count)) * span / total_lines).astype(np.int64)
+        seconds = np.minimum(seconds, span - 1)
+
+        ip_ids = _draw(rng, self.ip_probabilities, count)
+        path_ids = _draw(rng, self.path_probabilities, count)
+        method_ids = _draw(rng, self.method_probabilities, count)
+        statuses = self.statuses[_draw(rng, self.status_probabilities, count)]
+        sizes = (self.path_medians[path_ids] * rng.lognormal(0.0, 0.5, count)).astype(np.int64)
+        no_body = (statuses == 304) | (self.methods[method_ids] == b"HEAD")
+
+        size_digits = _digits(sizes, 10)
+        size_digits[no_body] = 0
+        size_digits[no_body, -1] = ord("-")
+
+        columns = [
+            _matrix(self.ips[ip_ids]),
+            _constant(b" - - [", count),
+            _matrix(self.day_prefixes[seconds // 86400]),
+            _matrix(self.times_of_day[seconds % 86400]),
+            _constant(b" " + self.timezone + b'] "', count),
+            _matrix(self.methods[method_ids]),
+            _constant(b" ", count),
+            _matrix(self.paths[path_ids]),
+            _constant(b' HTTP/1.1" ', count),
+            _digits(statuses, 3),
+            _constant(b" ", count),
+            size_digits,
+            _constant(b' "', count),
+            _matrix(self.referrers[rng.integers(0, len(self.referrers), count)]),
+            _constant(b'" "', count),
+            _matrix(self.user_agents[rng.integers(0, len(self.user_agents), count)]),
+            _constant(b'"\n', count),
+        ]
+        lines = np.hstack(columns)
+        return lines[lines != 0].tobytes()
+
+    def write(self, file_path, size_mb=None, lines=None, compresslevel=6):
+        """
+        Writes a log of `lines` lines, or of about `size_mb` MB of uncompressed text.
+        The file is gzipped if its name ends in .gz.
+
+        Returns:
+            dict: {"path", "lines", "bytes", "file_bytes", "seconds", "seed", "languages", "start", "days"}
+        """
+        if lines is None and size_mb is None:
+            raise ValueError("Either size_mb or lines is required")
+        start_time = time.perf_counter()
+        target_bytes = None if size_mb is None else int(size_mb * 1024 * 1024)
+        total_lines = lines
+        if total_lines is None:
+            # Estimate the line count from a sample drawn with its own random stream
+            sample_lines = 20_000
+            sample = self.render(0, sample_lines, sample_lines, rng=np.random.default_rng(self.seed + 1))
+            total_lines = max(1, int(target_bytes * sample_lines / len(sample)))
+
+        written = 0
+        opener = (lambda path: gzip.open(path, "wb", compresslevel=compresslevel)) if file_path.endswith(".gz") else (
+            lambda path: open(path, "wb"))
+        with opener(file_path) as f:
+            for first_line in range(0, total_lines, CHUNK_LINES):
+                block = self.render(first_line, min(CHUNK_LINES, total_lines - first_line), total_lines)
+                f.write(block)
+                written += len(block)
+
+        with open(file_path, "rb") as f:
+            f.seek(0, 2)
+            file_bytes = f.tell()
+        return {
+            "path": file_path,
+            "lines": total_lines,
+            "bytes": written,
+            "file_bytes": file_bytes,
+            "seconds": time.perf_counter() - start_time,
+            "seed": self.seed,
+            "languages": list(self.languages),
+            "start": self.start.strftime("%Y-%m-%d"),
+            "days": self.days,
+        }
+
+
+def parse_languages(value):
+    """
+    Parses "telugu=3,tamil=1" (or "telugu,tamil") into {language: weight}.
+    """
+    languages = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        languages[name.strip()] = float(weight or 1)
+    return languages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="Output path; gzipped if it ends in .gz")
+    parser.add_argument("--size-mb", type=float, help="Uncompressed size to write (default 1024 unless --lines)")
+    parser.add_argument("--lines", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ips", type=int, default=100_000, help="Distinct client addresses")
+    parser.add_argument("--ip-skew", type=float, default=1.1, help="Zipf exponent of IP popularity (0 = uniform)")
+    parser.add_argument("--ipv6", type=float, default=0.05, help="Share of IPv6 clients")
+    parser.add_argument("--languages", default=",".join(f"{k}={v}" for k, v in DEFAULT_LANGUAGES.items()))
+    parser.add_argument("--start", default="2024-05-01", help="First date, YYYY-MM-DD")
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--level", type=int, default=6, help="gzip compression level")
+    args = parser.parse_args()
+
+    generator = ApacheLogGenerator(
+        seed=args.seed, ips=args.ips, ip_skew=args.ip_skew, ipv6=args.ipv6,
+        languages=parse_languages(args.languages), start=args.start, days=args.days,
+    )
+    size_mb = args.size_mb if args.size_mb is not None or args.lines is not None else 1024
+    stats = generator.write(args.out, size_mb=size_mb, lines=args.lines, compresslevel=args.level)
+    print(f"Wrote {stats['path']}: {stats['lines']} lines, {stats['bytes'] / 1024 ** 2:.0f} MB of log text "
+          f"({stats['file_bytes'] / 1024 ** 2:.0f} MB on disk) in {stats['seconds']:.1f} s "
+          f"({stats['lines'] / stats['seconds']:.0f} lines/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmarks `process_apache_logs` and `process_apache_logs_get_requests` on
+synthetic logs of increasing size.
+
+Usage:
+    python -m benchmarks.apache_log_handlers --sizes-mb 64,256,1024
+    python -m benchmarks.apache_log_handlers --sizes-mb 1024 --gzip --workers 1,2,4,8
+    python -m benchmarks.apache_log_handlers --sizes-mb 256 --index
+    python -m benchmarks.apache_log_handlers --sizes-mb 256 --workers 1,pool
+
+Logs are written by `benchmarks.apache_log_generator` into --dir (and reused
+when they already exist). Every measurement runs in a fresh interpreter with
+LOG_SCAN_WORKERS set, so peak RSS covers just that run (the parent process
+plus its largest scan worker) and the columnar index, the tail state and the
+result cache of earlier runs cannot leak into it. The "pool" setting runs the
+handler the way /api does instead: in its default executor pool, with the
+default scan worker budget (worker RSS is then the handler process). The
+`scan` column shows how many processes the scan actually used, and a result
+that differs from the first setting's is flagged as a MISMATCH. The index is disabled
+unless --index is given, in which case the first question of each run is
+streamed while the index builds in the background, and the second (after
+the build finished) is answered from it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.apache_log_generator import ApacheLogGenerator
+
+HANDLERS = ("top_ip", "get_count")
+HANDLER_NAMES = {"top_ip": "process_apache_logs", "get_count": "process_apache_logs_get_requests"}
+# Logged by apache_log_engine.scan_log
+SCAN_WORKERS_RE = re.compile(r"with (\d+) worker\(s\)")
+
+
+def _questions(stats):
+    """
+    Returns a question per handler about data that exists in a generated log.
+    """
+    language = stats["languages"][0]
+    date = datetime.strptime(stats["start"], "%Y-%m-%d")
+    return {
+        "top_ip": f"Across all requests under {language}/ on {date:%Y-%m-%d}, which IP address downloaded the most bytes?",
+        "get_count": (
+            f"What is the number of successful GET requests for pages under /{language}/ "
+            f"from 9:00 until before 17:00 on {date:%A}s?"
+        ),
+    }
+
+
+def run_child(handler, file_path, question, via_pool=False):
+    """
+    Runs one handler call and prints its timing and peak RSS as JSON (child process side).
+    """
+    from question_handlers.apache_log_get_requests import process_apache_logs_get_requests
+    from question_handlers.apache_log_topipaddress import process_apache_logs
+
+    executor = _default_executor() if via_pool else None
+    start = time.perf_counter()
+    if executor:
+        sample_arg = "use_sample_if_empty" if handler == "top_ip" else "use_sample_if_needed"
+        func_args = {"file_path": file_path, "question": question, sample_arg: False}
+        result = asyncio.run(executor.run(HANDLER_NAMES[handler], func_args))
+    elif handler == "top_ip":
+        result = process_apache_logs(file_path, question, use_sample_if_empty=False)
+    else:
+        result = process_apache_logs_get_requests(file_path, question, use_sample_if_needed=False)
+    seconds = time.perf_counter() - start
+    if executor:
+        # Lets the handler process finish its background work (e.g. the index build) and exit
+        executor.shutdown(wait=True)
+    # ru_maxrss is in KiB on Linux; RUSAGE_CHILDREN reports the largest finished child
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({"seconds": seconds, "rss_kib": self_rss, "worker_rss_kib": children_rss, "result": result}))
+
+
+def _default_executor():
+    """
+    Returns a HandlerExecutor with the default pools, as used by /api.
+    """
+    from question_handlers.manifest import HANDLER_MANIFEST
+    from services.executor_pools import HandlerExecutor
+    from services.handler_registry import HandlerRegistry
+
+    return HandlerExecutor(HandlerRegistry(HANDLER_MANIFEST))
+
+
+def measure(handler, file_path, question, workers, index, repeat):
+    """
+    Runs `repeat` calls, each in a fresh interpreter, and returns their measurements.
+    `workers` is a LOG_SCAN_WORKERS value, or "pool" to run the handler like /api.
+    """
+    env = dict(os.environ)
+    env.update({
+        "LOG_INDEX_ENABLED": "1" if index else "0",
+        "LOG_TAIL_ENABLED": "0",
+        "LOG_INDEX_DIR": tempfile.mkdtemp(prefix="log-bench-index-"),
+    })
+    if workers == "pool":
+        env.pop("LOG_SCAN_WORKERS", None)
+    else:
+        env["LOG_SCAN_WORKERS"] = str(workers)
+    runs = []
+    for _ in range(repeat):
+        command = [sys.executable, "-m", "benchmarks.apache_log_handlers", "--child", handler, file_path, question]
+        if index:
+            # Once streamed (scheduling the index build), once from the index
+            command += ["--twice"]
+        if workers == "pool":
+            command += ["--pool"]
+        completed = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+        run = [json.loads(line) for line in completed.stdout.splitlines() if line.startswith("{")]
+        # The first call streams; its scan is the first one logged
+        scans = SCAN_WORKERS_RE.findall(completed.stderr)
+        run[0]["scan_workers"] = int(scans[0]) if scans else None
+        runs.append(run)
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", default="64,256,1024", help="Comma-separated uncompressed log sizes")
+    parser.add_argument("--gzip", action="store_true", help="Benchmark gzipped logs")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Comma-separated LOG_SCAN_WORKERS values, or \"pool\" to run like /api")
+    parser.add_argument("--handlers", default=",".join(HANDLERS))
+    parser.add_argument("--index", action="store_true", help="Enable the columnar index (build + indexed query)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "apache_log_bench"))
+    parser.add_argument("--child", nargs=3, metavar=("HANDLER", "FILE", "QUESTION"), help=argparse.SUPPRESS)
+    parser.add_argument("--twice", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--pool", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child, via_pool=args.pool)
+        if args.twice:
+            from question_handlers.apache_log_index import wait_for_background_builds
+
+            wait_for_background_builds()
+            run_child(*args.child, via_pool=args.pool)
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    values = args.workers.split(",")
+    workers_list = sorted({int(value) for value in values if value != "pool"}) + ["pool"] * ("pool" in values)
+    print(f"cpu_count={os.cpu_count()} seed={args.seed} index={'on' if args.index else 'off'}")
+    print(f"{'size':>8} {'handler':>9} {'workers':>7} {'seconds':>8} {'lines/s':>11} {'MB/s':>7} "
+          f"{'speedup':>7} {'scan':>4} {'peak RSS':>9} {'worker RSS':>10}  result")
+
+    for size_mb in (float(value) for value in args.sizes_mb.split(",")):
+        file_path = os.path.join(args.dir, f"synthetic_{size_mb:g}mb_seed{args.seed}.log" + (".gz" if args.gzip else ""))
+        stats_path = file_path + ".json"
+        if os.path.exists(file_path) and os.path.exists(stats_path):
+            with open(stats_path, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+        else:
+            stats = ApacheLogGenerator(seed=args.seed).write(file_path, size_mb=size_mb, compresslevel=1)
+            with open(stats_path, "w", encoding="utf-8") as f:
+                json.dump(stats, f)
+            print(f"generated {file_path}: {stats['lines']} lines in {stats['seconds']:.1f} s")
+
+        questions = _questions(stats)
+        for handler in args.handlers.split(","):
+            baseline = expected = None
+            for workers in workers_list:
+                runs = measure(handler, file_path, questions[handler], workers, args.index, args.repeat)
+                # Best of `repeat`; with --index report the indexed (second) call separately
+                first = min((run[0] for run in runs), key=lambda item: item["seconds"])
+                baseline = baseline or first["seconds"]
+                expected = expected or first["result"]
+                rows = [("", first)]
+                if args.index:
+                    rows.append(("indexed", min((run[1] for run in runs), key=lambda item: item["seconds"])))
+                for label, item in rows:
+                    seconds = item["seconds"]
+                    scan_workers = item.get("scan_workers") or "-"
+                    mismatch = "MISMATCH " if item["result"] != expected else ""
+                    print(
+                        f"{size_mb:>6g}MB {handler:>9} {workers:>7} {seconds:>8.2f} {stats['lines'] / seconds:>11,.0f} "
+                        f"{stats['bytes'] / 1024 ** 2 / seconds:>7.0f} {baseline / seconds:>6.2f}x {scan_workers:>4} "
+                        f"{item['rss_kib'] / 1024:>7.0f}MB {item['worker_rss_kib'] / 1024:>8.0f}MB  "
+                        f"{mismatch}{label + ' ' if label else ''}{json.dumps(item['result'])}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
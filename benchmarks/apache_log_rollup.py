@@ -0,0 +1,52 @@
+"""
+Compares GET-count queries answered from column masks and from the rollup tensor.
+
+Usage:
+    python -m benchmarks.apache_log_rollup --file access.log.gz
+    python -m benchmarks.apache_log_rollup --file access.log.gz --bucket-minutes 15 --language tamil
+"""
+import argparse
+import time
+
+from question_handlers.apache_log_index import GetRollup, get_log_index
+
+WINDOWS = [(0, 1440), (5 * 60, 14 * 60), (17 * 60, 22 * 60), (9 * 60 + 30, 9 * 60 + 45)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", required=True)
+    parser.add_argument("--language", default="telugu")
+    parser.add_argument("--bucket-minutes", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = get_log_index(args.file)
+    print(f"index: {len(index)} rows, ready in {time.perf_counter() - start:.2f} s "
+          f"(built in {index.meta['build_seconds']:.2f} s)")
+
+    rollup = GetRollup.load_or_build(index, args.bucket_minutes)
+    if not rollup:
+        print("rollup exceeds LOG_ROLLUP_MAX_BYTES; nothing to compare")
+        return
+    print(f"rollup: shape {tuple(rollup.info['shape'])}, {rollup.info['bytes'] / 1024 ** 2:.2f} MB, "
+          f"built in {rollup.info['build_seconds'] * 1000:.1f} ms")
+
+    for weekday in range(7):
+        for start_minute, end_minute in WINDOWS:
+            if start_minute % args.bucket_minutes or end_minute % args.bucket_minutes:
+                continue
+            start = time.perf_counter()
+            expected = index.get_count(args.language, weekday, start_minute, end_minute, use_rollup=False)["count"]
+            mask_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            count = rollup.count(args.language, weekday, start_minute, end_minute)
+            rollup_ms = (time.perf_counter() - start) * 1000
+            status = "ok" if count == expected else f"MISMATCH (mask {expected})"
+            print(f"  weekday {weekday} {start_minute // 60:02d}:{start_minute % 60:02d}-"
+                  f"{end_minute // 60:02d}:{end_minute % 60:02d}: {count:8d}  "
+                  f"mask {mask_ms:8.3f} ms  rollup {rollup_ms:6.3f} ms  {status}")
+
+
+if __name__ == "__main__":
+    main()
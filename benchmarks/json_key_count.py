@@ -0,0 +1,195 @@
+"""
+Benchmarks the streaming JSON key counter against the previous
+`json.load` + recursive walk in `count_key_in_json`.
+
+Usage:
+    python -m benchmarks.json_key_count --sizes-mb 16,64,256
+    python -m benchmarks.json_key_count --sizes-mb 64 --depth 40 --indent 2
+    python -m benchmarks.json_key_count --sizes-mb 64 --lines --modes stream,pool
+
+Documents are synthetic arrays of nested records written into --dir (and
+reused when they already exist); with --lines they are JSON Lines files
+with one record per line. Each measurement runs in a fresh interpreter, so
+peak RSS covers just that run.
+
+Modes:
+    legacy: `json.load` + recursive walk (JSON documents only).
+    stream: `count_json_keys`, or a single-process `scan_jsonl` for JSON Lines.
+    pool: `count_key_in_json` run the way /api does, in its default executor
+        pool with the default scan worker budget.
+
+The `scan` column shows how many processes a JSON Lines scan used, and a
+count that differs from the first mode's is flagged as a MISMATCH.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Logged by jsonl_engine.scan_jsonl
+SCAN_WORKERS_RE = re.compile(r"with (\d+) worker\(s\)")
+KEYS = ["id", "name", "type", "value", "tags", "meta", "ID", "Id", "timestamp", "children"]
+
+
+def _value(rng, depth, max_depth):
+    roll = rng.random()
+    if depth >= max_depth or roll < 0.45:
+        return rng.choice([rng.randint(0, 10 ** 6), round(rng.random(), 4), f"item-{rng.randint(0, 999)}", None, True])
+    if roll < 0.6:
+        return [_value(rng, depth + 1, max_depth) for _ in range(rng.randint(1, 3))]
+    return {rng.choice(KEYS): _value(rng, depth + 1, max_depth) for _ in range(rng.randint(1, 4))}
+
+
+def build_document(file_path, size_mb, depth, indent=None, seed=42, lines=False):
+    """
+    Writes a JSON array of nested records until it holds about `size_mb` megabytes.
+    With `lines`, writes the records as JSON Lines instead (`indent` is ignored).
+    """
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("" if lines else "[")
+        while written < target:
+            record = json.dumps(
+                {"id": written, "meta": _value(rng, 0, depth), "payload": _value(rng, 0, depth)},
+                indent=None if lines else indent
+            )
+            if lines:
+                f.write(record + "\n")
+            else:
+                f.write(("," if written else "") + record)
+            written += len(record) + 1
+        f.write("" if lines else "]")
+
+
+def legacy_count(file_path, key):
+    """
+    The pre-streaming implementation: load the whole document, then walk it recursively.
+    """
+    key = key.lower()
+
+    def recursive_count(data):
+        count = 0
+        if isinstance(data, dict):
+            count += sum(1 for k in data if k.lower() == key)
+            for v in data.values():
+                count += recursive_count(v)
+        elif isinstance(data, list):
+            for item in data:
+                count += recursive_count(item)
+        return count
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        return recursive_count(json.load(f))
+
+
+def run_child(mode, file_path, key):
+    """
+    Runs one count and prints its timing and peak RSS as JSON (child process side).
+    """
+    from question_handlers.jsoncount_keys import _is_json_lines
+    from question_handlers.jsonl_engine import KeyCountReducer, scan_jsonl
+    from utils.json_stream import count_json_keys
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        count = legacy_count(file_path, key)
+    elif mode == "pool":
+        count = _count_in_pool(file_path, key)
+    elif _is_json_lines(file_path):
+        count = scan_jsonl(file_path, [KeyCountReducer(key.lower())], workers=1)[0][0]["count"]
+    else:
+        count = count_json_keys(file_path, key)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "count": count}))
+
+
+def _count_in_pool(file_path, key):
+    """
+    Runs `count_key_in_json` through a HandlerExecutor with the default pools, like /api.
+    """
+    from question_handlers.manifest import HANDLER_MANIFEST
+    from services.executor_pools import HandlerExecutor
+    from services.handler_registry import HandlerRegistry
+
+    executor = HandlerExecutor(HandlerRegistry(HANDLER_MANIFEST))
+    try:
+        return asyncio.run(executor.run("count_key_in_json", {"file_path": file_path, "key": key}))["count"]
+    finally:
+        executor.shutdown()
+
+
+def measure(mode, file_path, key, repeat):
+    """
+    Returns the fastest of `repeat` runs, each in a fresh interpreter.
+    """
+    runs = []
+    for _ in range(repeat):
+        command = [sys.executable, "-m", "benchmarks.json_key_count", "--child", mode, file_path, key]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode:
+            return {"error": completed.stderr.strip().splitlines()[-1]}
+        run = json.loads(completed.stdout.splitlines()[-1])
+        scans = SCAN_WORKERS_RE.findall(completed.stderr)
+        run["scan_workers"] = int(scans[0]) if scans else None
+        runs.append(run)
+    return min(runs, key=lambda item: item["seconds"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", default="16,64,256", help="Comma-separated document sizes")
+    parser.add_argument("--depth", type=int, default=8, help="Maximum nesting depth of generated values")
+    parser.add_argument("--indent", type=int, default=None, help="Pretty-print the documents")
+    parser.add_argument("--key", default="id")
+    parser.add_argument("--lines", action="store_true", help="Write JSON Lines instead of a JSON array")
+    parser.add_argument("--modes", default=None, help="Comma-separated modes (default legacy,stream; stream,pool with --lines)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "json_key_bench"))
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "FILE", "KEY"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    modes = (args.modes or ("stream,pool" if args.lines else "legacy,stream")).split(",")
+    print(f"{'size':>8} {'mode':>7} {'seconds':>8} {'MB/s':>7} {'speedup':>7} {'scan':>4} {'peak RSS':>9}  count")
+    for size_mb in (float(value) for value in args.sizes_mb.split(",")):
+        file_name = (
+            f"nested_{size_mb:g}mb_d{args.depth}_seed{args.seed}.jsonl" if args.lines
+            else f"nested_{size_mb:g}mb_d{args.depth}_i{args.indent}_seed{args.seed}.json"
+        )
+        file_path = os.path.join(args.dir, file_name)
+        if not os.path.exists(file_path):
+            build_document(file_path, size_mb, args.depth, args.indent, args.seed, args.lines)
+        megabytes = os.path.getsize(file_path) / 1024 ** 2
+        baseline = expected = None
+        for mode in modes:
+            item = measure(mode, file_path, args.key, args.repeat)
+            if "error" in item:
+                print(f"{size_mb:>6g}MB {mode:>7} failed: {item['error']}")
+                continue
+            seconds = item["seconds"]
+            baseline = baseline or seconds
+            expected = item["count"] if expected is None else expected
+            scan_workers = item["scan_workers"] or "-"
+            mismatch = " MISMATCH" if item["count"] != expected else ""
+            print(
+                f"{size_mb:>6g}MB {mode:>7} {seconds:>8.2f} {megabytes / seconds:>7.0f} {baseline / seconds:>6.2f}x "
+                f"{scan_workers:>4} {item['rss_kib'] / 1024:>7.0f}MB  {item['count']}{mismatch}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmarks `count_unique_students` (exact and HyperLogLog modes) against the
+previous line-by-line implementation.
+
+Usage:
+    python -m benchmarks.unique_ids --lines 10000000 --unique 2000000
+    python -m benchmarks.unique_ids --lines 50000000 --unique 20000000 --modes exact,hll
+
+Rosters are written into --dir (and reused when they already exist), one
+"<ID> - Marks: <n>" line per entry with IDs drawn from --unique distinct
+values. Each measurement runs in a fresh interpreter, so peak RSS covers
+just that run.
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ALPHABET = np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789", dtype=np.uint8)
+ID_LENGTH = 10
+BATCH_LINES = 1_000_000
+
+
+def build_roster(file_path, lines, unique, seed=42):
+    """
+    Writes `lines` roster lines whose IDs come from `unique` distinct values.
+
+    Returns:
+        int: The number of distinct IDs actually used.
+    """
+    rng = np.random.default_rng(seed)
+    pool = ALPHABET[rng.integers(0, len(ALPHABET), (unique, ID_LENGTH))]
+    suffix = np.frombuffer(b" - Marks: ", dtype=np.uint8)
+    used = np.zeros(unique, dtype=bool)
+    with open(file_path, "wb") as f:
+        for start in range(0, lines, BATCH_LINES):
+            count = min(BATCH_LINES, lines - start)
+            picks = rng.integers(0, unique, count)
+            used[picks] = True
+            marks = rng.integers(0, 100, count)
+            rows = np.empty((count, ID_LENGTH + len(suffix) + 3), dtype=np.uint8)
+            rows[:, :ID_LENGTH] = pool[picks]
+            rows[:, ID_LENGTH:ID_LENGTH + len(suffix)] = suffix
+            rows[:, -3] = ord("0") + marks // 10
+            rows[:, -2] = ord("0") + marks % 10
+            rows[:, -1] = ord("\n")
+            f.write(rows.tobytes())
+    return int(used.sum())
+
+
+def legacy_count(file_path):
+    """
+    The previous implementation: decode, strip and re.match every line into a set of str.
+    """
+    unique_student_ids = set()
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                match = re.match(r"([A-Za-z0-9]+)", line)
+                if match:
+                    unique_student_ids.add(match.group(1).strip())
+    return len(unique_student_ids)
+
+
+def run_child(mode, file_path):
+    """
+    Runs one count and prints its timing and peak RSS as JSON (child process side).
+    """
+    from question_handlers.unique_students_txt import count_unique_students
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        count = legacy_count(file_path)
+    else:
+        count = count_unique_students(file_path, approximate=mode == "hll")["count"]
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "count": count}))
+
+
+def measure(mode, file_path, repeat):
+    """
+    Returns the fastest of `repeat` runs, each in a fresh interpreter.
+    """
+    runs = []
+    for _ in range(repeat):
+        command = [sys.executable, "-m", "benchmarks.unique_ids", "--child", mode, file_path]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return min(runs, key=lambda item: item["seconds"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=10_000_000)
+    parser.add_argument("--unique", type=int, default=2_000_000, help="Distinct IDs to draw from")
+    parser.add_argument("--modes", default="legacy,exact,hll")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "unique_ids_bench"))
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    file_path = os.path.join(args.dir, f"roster_{args.lines}_{args.unique}_seed{args.seed}.txt")
+    truth_path = file_path + ".json"
+    if os.path.exists(file_path) and os.path.exists(truth_path):
+        with open(truth_path, "r", encoding="utf-8") as f:
+            truth = json.load(f)["unique"]
+    else:
+        start = time.perf_counter()
+        truth = build_roster(file_path, args.lines, args.unique, args.seed)
+        with open(truth_path, "w", encoding="utf-8") as f:
+            json.dump({"unique": truth}, f)
+        print(f"generated {file_path} in {time.perf_counter() - start:.1f} s")
+
+    megabytes = os.path.getsize(file_path) / 1024 ** 2
+    print(f"{args.lines:,} lines, {megabytes:.0f} MB, {truth:,} distinct IDs")
+    print(f"{'mode':>7} {'seconds':>8} {'lines/s':>12} {'MB/s':>7} {'speedup':>7} {'peak RSS':>9} {'count':>11} {'error':>8}")
+    baseline = None
+    for mode in args.modes.split(","):
+        item = measure(mode, file_path, args.repeat)
+        seconds = item["seconds"]
+        baseline = baseline or seconds
+        print(
+            f"{mode:>7} {seconds:>8.2f} {args.lines / seconds:>12,.0f} {megabytes / seconds:>7.0f} "
+            f"{baseline / seconds:>6.2f}x {item['rss_kib'] / 1024:>7.0f}MB {item['count']:>11,} "
+            f"{(item['count'] - truth) / truth:>+8.2%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
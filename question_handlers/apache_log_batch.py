@@ -0,0 +1,291 @@
+import calendar
+import logging
+import os
+import re
+import time
+from datetime import datetime
+
+from question_handlers.apache_log_engine import GetCountQuery, TopIpQuery, scan_log
+from question_handlers.apache_log_get_requests import extract_query_parameters
+from question_handlers.apache_log_index import LOG_INDEX_ENABLED, get_log_index
+from question_handlers.apache_log_topipaddress import extract_language_and_date
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = [day.lower() for day in calendar.day_name]
+
+
+def _parse_minute(value):
+    hour, _, minute = str(value).partition(":")
+    return int(hour) * 60 + int(minute or 0)
+
+
+def parse_log_query(query):
+    """
+    Normalizes one log query.
+
+    A query is either a question string, as accepted by `/api`, or a dict:
+        {"type": "top_ip", "language": "telugu", "date": "2024-05-26"}
+        {"type": "get_count", "language": "tamil", "day": "friday", "start": "17:00", "end": "22:00"}
+
+    Args:
+        query (str or dict): The query.
+
+    Returns:
+        dict: {"type": "top_ip", "language", "date"} with date as DD/Mon/YYYY, or
+              {"type": "get_count", "language", "weekday", "start_minute", "end_minute"}.
+
+    Raises:
+        ValueError: If the query cannot be parsed.
+    """
+    if isinstance(query, str):
+        if re.search(r"GET requests", query, re.IGNORECASE):
+            language, start_time, end_time, weekday = extract_query_parameters(query)
+            return {
+                "type": "get_count",
+                "language": language,
+                "weekday": weekday,
+                "start_minute": start_time.hour * 60 + start_time.minute,
+                "end_minute": end_time.hour * 60 + end_time.minute,
+            }
+        language, date = extract_language_and_date(query)
+        return {"type": "top_ip", "language": language, "date": date}
+
+    if not isinstance(query, dict) or not query.get("language"):
+        raise ValueError(f"Invalid log query: {query!r}")
+
+    if query.get("type") == "top_ip":
+        date = query.get("date", "")
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", date):
+            date = datetime.strptime(date, "%Y-%m-%d").strftime("%d/%b/%Y")
+        return {"type": "top_ip", "language": query["language"], "date": date}
+
+    if query.get("type") == "get_count":
+        weekday = query.get("weekday")
+        if weekday is None:
+            day = str(query.get("day", "")).lower().rstrip("s")
+            if day not in WEEKDAYS:
+                raise ValueError(f"Unknown day: {query.get('day')!r}")
+            weekday = WEEKDAYS.index(day)
+        return {
+            "type": "get_count",
+            "language": query["language"],
+            "weekday": int(weekday),
+            "start_minute": _parse_minute(query.get("start", 0)),
+            "end_minute": _parse_minute(query.get("end", "24:00")),
+        }
+
+    raise ValueError(f"Unknown log query type: {query.get('type')!r}")
+
+
+class LogQueryPlan:
+    """
+    Compiles a list of parsed log queries into the smallest set of scan queries.
+
+    Top-IP queries share one aggregation per (language, date). GET-count
+    queries share one per-minute count per language; each query then applies
+    its own weekday and time window to the shared counts.
+    """
+
+    def __init__(self, queries):
+        """
+        Args:
+            queries (list): Queries normalized by `parse_log_query`.
+        """
+        self.queries = queries
+        self.scan_queries = {}
+        for query in queries:
+            key = self._aggregation_key(query)
+            if key in self.scan_queries:
+                continue
+            if query["type"] == "top_ip":
+                self.scan_queries[key] = TopIpQuery(query["language"], query["date"])
+            else:
+                self.scan_queries[key] = GetCountQuery(query["language"], 0, 0, 0)
+
+    @staticmethod
+    def _aggregation_key(query):
+        if query["type"] == "top_ip":
+            return ("top_ip", query["language"], query["date"])
+        return ("get_count", query["language"])
+
+    def answer(self, states):
+        """
+        Builds per-query results from the merged scan states.
+
+        Args:
+            states (dict): Aggregation key -> merged state of its scan query.
+
+        Returns:
+            list: One result dict per query (None for top-IP queries without a strict match).
+        """
+        results = []
+        for query in self.queries:
+            state = states[self._aggregation_key(query)]
+            if query["type"] == "top_ip":
+                results.append(TopIpQuery(query["language"], query["date"]).result(state))
+            else:
+                window = GetCountQuery(query["language"], query["weekday"], query["start_minute"], query["end_minute"])
+                results.append(window.result(state))
+        return results
+
+
+def _scan_plan(file_path, plan, workers, chunk_size):
+    keys = list(plan.scan_queries)
+    scan_queries = [_StateQuery(plan.scan_queries[key]) for key in keys]
+    states, stats = scan_log(file_path, scan_queries, workers=workers, chunk_size=chunk_size)
+    return dict(zip(keys, states)), stats
+
+
+class _StateQuery:
+    """
+    Wraps a scan query so that `scan_log` returns its merged state instead of its result.
+    """
+
+    def __init__(self, query):
+        self.query = query
+
+    def new_state(self):
+        return self.query.new_state()
+
+    def feed(self, state, block):
+        self.query.feed(state, block)
+
+    def merge(self, state, other):
+        return self.query.merge(state, other)
+
+    def result(self, state):
+        return state
+
+
+def run_log_batch(file_path, queries, workers=None, chunk_size=None):
+    """
+    Answers many log queries about one file with a single pass over the log.
+
+    If the columnar log index is enabled, that pass builds (or reuses) the
+    index and every query is answered from it; otherwise the compiled plan is
+    streamed once. Top-IP queries without a strict match share one more pass
+    for the relaxed and language-only fallbacks.
+
+    Args:
+        file_path (str): Path to the log (plain or gzip).
+        queries (list): Question strings or query dicts, see `parse_log_query`.
+        workers (int, optional): Worker processes for streaming scans.
+        chunk_size (int, optional): Bytes per worker task for streaming scans.
+
+    Returns:
+        dict: {"results": [...], "scan_seconds": float, "passes": int, "source": "index" or "stream",
+               "lines": int, "bytes_scanned": int}
+    """
+    start = time.perf_counter()
+    parsed = []
+    for query in queries:
+        try:
+            parsed.append(parse_log_query(query))
+        except ValueError as e:
+            parsed.append({"type": "invalid", "error": str(e)})
+    valid = [query for query in parsed if query["type"] != "invalid"]
+
+    passes = 0
+    answers = []
+    source = "stream"
+    index = None
+    if valid and LOG_INDEX_ENABLED:
+        try:
+            index = get_log_index(file_path)
+            source = "index"
+        except Exception as e:
+            logger.warning(f"Log index unavailable, streaming instead: {e}")
+
+    stats = {"lines": 0, "bytes_scanned": 0}
+    if index is not None:
+        passes = 1
+        stats = {"lines": index.meta["lines"], "bytes_scanned": index.meta["bytes_scanned"]}
+        for query in valid:
+            if query["type"] == "top_ip":
+                answers.append(index.top_ip(query["language"], query["date"]))
+            else:
+                answers.append(index.get_count(
+                    query["language"], query["weekday"], query["start_minute"], query["end_minute"]
+                ))
+    elif valid:
+        plan = LogQueryPlan(valid)
+        states, stats = _scan_plan(file_path, plan, workers, chunk_size)
+        passes = 1
+        answers = plan.answer(states)
+        logger.info(f"Answered {len(valid)} log queries with {len(plan.scan_queries)} aggregations in one pass")
+
+    # Strict misses: relaxed and language-only fallbacks for all of them in one more pass
+    misses = sorted({
+        (query["language"], query["date"])
+        for query, answer in zip(valid, answers)
+        if query["type"] == "top_ip" and answer is None
+    })
+    fallback = {}
+    if misses:
+        fallback_queries = []
+        for language, date in misses:
+            fallback_queries += [TopIpQuery(language, date, "relaxed"), TopIpQuery(language, date, "language_only")]
+        fallback_results, _ = scan_log(file_path, fallback_queries, workers=workers, chunk_size=chunk_size)
+        passes += 1
+        for i, key in enumerate(misses):
+            for query, result in zip(fallback_queries[2 * i:2 * i + 2], fallback_results[2 * i:2 * i + 2]):
+                if result:
+                    result["match_level"] = query.mode
+                    fallback[key] = result
+                    break
+
+    results = []
+    answer_iter = iter(answers)
+    for query in parsed:
+        if query["type"] == "invalid":
+            results.append({"error": query["error"]})
+            continue
+        answer = next(answer_iter)
+        if query["type"] == "get_count":
+            results.append({"query": query, "count": answer["count"]})
+            continue
+        if answer is not None:
+            answer["match_level"] = "strict"
+        else:
+            answer = fallback.get((query["language"], query["date"]))
+        if answer is None:
+            results.append({"query": query, "error": "No matching entries found in the log file."})
+        else:
+            results.append({
+                "query": query,
+                "top_ip": answer["top_ip"],
+                "total_bytes": answer["total_bytes"],
+                "match_level": answer["match_level"],
+            })
+
+    return {
+        "results": results,
+        "scan_seconds": round(time.perf_counter() - start, 3),
+        "passes": passes,
+        "source": source,
+        "lines": stats["lines"],
+        "bytes_scanned": stats["bytes_scanned"],
+    }
+
+
+def process_apache_log_batch(file_path, questions):
+    """
+    Handler for the `/api/logs/batch` endpoint: answers several log questions about one upload.
+
+    Args:
+        file_path (str): Path to the Apache log file (can be .gz).
+        questions (list): Question strings or query dicts, see `parse_log_query`.
+
+    Returns:
+        dict: See `run_log_batch`, or an error message.
+    """
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        return {"error": f"Log file is missing or empty: {file_path}"}
+    try:
+        return run_log_batch(file_path, questions)
+    except Exception as e:
+        logger.exception(f"Error processing Apache log batch: {e}")
+        return {"error": str(e)}
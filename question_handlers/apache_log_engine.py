@@ -0,0 +1,632 @@
+import gzip
+import heapq
+import io
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from services.executor_pools import scan_worker_budget
+from utils.byte_ranges import newline_aligned_ranges, read_range
+from utils.packed_ips import IpTotals
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Uncompressed bytes handed to the queries per block
+BLOCK_SIZE = 4 * 1024 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+# Parallel scans: bytes per worker task, and worker count (0 = one per core, or the handler
+# pool's share of the cores inside a handler process; see services.executor_pools).
+# Logs smaller than one chunk are scanned in-process.
+LOG_SCAN_CHUNK_SIZE = int(os.getenv("LOG_SCAN_CHUNK_SIZE", str(32 * 1024 * 1024)))
+LOG_SCAN_WORKERS = int(os.getenv("LOG_SCAN_WORKERS", "0"))
+
+# Combined log format: IP - - [date:time tz] "METHOD PATH PROTOCOL" STATUS BYTES "REFERRER" "USER_AGENT"
+LOG_LINE_RE = re.compile(
+    rb'^(\S+) \S+ \S+ \[([^\]\n]+)\] "([^ "\n]+) ([^ "\n]+)[^"\n]*" (\d{3}) (\d+|-)',
+    re.MULTILINE
+)
+
+
+def is_gzip_file(file_path):
+    """
+    Checks the gzip magic bytes, regardless of the file extension.
+    """
+    with open(file_path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def open_log_stream(file_path, buffer_size=BLOCK_SIZE):
+    """
+    Opens a plain or gzipped log as a buffered binary stream.
+
+    Gzip input is inflated on the fly; nothing is written to disk.
+
+    Args:
+        file_path (str): Path to the log file.
+        buffer_size (int): Read buffer size in bytes.
+
+    Returns:
+        io.BufferedReader: Stream of uncompressed log bytes.
+    """
+    if is_gzip_file(file_path):
+        return io.BufferedReader(gzip.GzipFile(file_path, "rb"), buffer_size)
+    return open(file_path, "rb", buffering=buffer_size)
+
+
+def iter_log_blocks(stream, block_size=BLOCK_SIZE, stats=None):
+    """
+    Yields blocks of complete lines from a binary stream.
+
+    Args:
+        stream: Binary stream from `open_log_stream`.
+        block_size (int): Approximate block size in bytes.
+        stats (dict, optional): Updated with `bytes_scanned`, `lines` and `truncated`.
+
+    Yields:
+        bytes: A block ending with a newline.
+    """
+    remainder = b""
+    while True:
+        try:
+            chunk = stream.read(block_size)
+        except EOFError:
+            # Truncated gzip stream: keep what was inflated so far
+            logger.warning("Compressed stream ended before the end-of-stream marker; using partial data")
+            if stats is not None:
+                stats["truncated"] = True
+            chunk = b""
+        if not chunk:
+            break
+
+        chunk = remainder + chunk if remainder else chunk
+        cut = chunk.rfind(b"\n") + 1
+        if cut == 0:
+            remainder = chunk
+            continue
+        remainder = chunk[cut:]
+        block = chunk[:cut] if remainder else chunk
+        if stats is not None:
+            stats["bytes_scanned"] += len(block)
+            stats["lines"] += block.count(b"\n")
+        yield block
+
+    if remainder:
+        if stats is not None:
+            stats["bytes_scanned"] += len(remainder)
+            stats["lines"] += 1
+        yield remainder + b"\n"
+
+
+def _line_start(block, position):
+    return block.rfind(b"\n", 0, position) + 1
+
+
+class TopIpQuery:
+    """
+    Sums downloaded bytes per client IP for requests under /<language>/ on one date.
+
+    Modes:
+        strict: request path starts with /<language>/ and the timestamp is on `date`.
+        relaxed: as strict, but case-insensitive and without the trailing slash.
+        language_only: any line mentioning the language (case-insensitive), any date.
+
+    Each mode compiles to a regex that starts with a literal (the date, or the
+    language), so the regex engine skips non-candidate lines at C speed.
+
+    Sums are collected per block in a small dict keyed by the raw IP bytes,
+    then folded into an `IpTotals` keyed by packed integers, so the state
+    that lives for the whole scan (and is pickled back from workers) costs
+    12 bytes per IPv4 address.
+    """
+
+    def __init__(self, language, date, mode="strict"):
+        """
+        Args:
+            language (str): Language path segment (e.g. 'telugu').
+            date (str): Date in DD/Mon/YYYY format, as written in the log.
+            mode (str): 'strict', 'relaxed' or 'language_only'.
+        """
+        self.language = language
+        self.date = date
+        self.mode = mode
+
+        language_bytes = re.escape(language.encode())
+        date_bytes = re.escape(date.encode())
+        if mode == "strict":
+            self._pattern = re.compile(
+                rb"\[" + date_bytes + rb':[^\]\n]*\] "[^ "\n]+ /' + language_bytes + rb'/[^"\n]*" \d{3} (\d+|-)'
+            )
+        elif mode == "relaxed":
+            self._pattern = re.compile(
+                rb"\[" + date_bytes + rb':[^\]\n]*\] "[^ "\n]+ /(?i:' + language_bytes + rb')[^"\n]*" \d{3} (\d+|-)'
+            )
+        elif mode == "language_only":
+            self._pattern = re.compile(language_bytes, re.IGNORECASE)
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+
+    def new_state(self):
+        return IpTotals()
+
+    def feed(self, state, block):
+        """
+        Adds the matching lines of a block to the per-IP byte sums.
+        """
+        totals = {}
+        if self.mode == "language_only":
+            self._feed_language_only(totals, block)
+        else:
+            # Hot loop: bound methods instead of helper calls (~1M matches per GB)
+            rfind, find, get = block.rfind, block.find, totals.get
+            for match in self._pattern.finditer(block):
+                size = match.group(1)
+                if size == b"-":
+                    continue
+                line_start = rfind(b"\n", 0, match.start()) + 1
+                ip = block[line_start:find(b" ", line_start)]
+                totals[ip] = get(ip, 0) + int(size)
+        if totals:
+            state.add_totals(totals)
+
+    def _feed_language_only(self, state, block):
+        line_end = -1
+        for match in self._pattern.finditer(block):
+            if match.start() <= line_end:
+                continue  # Already counted this line
+            line_start = _line_start(block, match.start())
+            line_end = block.find(b"\n", match.start())
+            parsed = LOG_LINE_RE.match(block, line_start, line_end)
+            if parsed and parsed.group(6) != b"-":
+                ip = parsed.group(1)
+                state[ip] = state.get(ip, 0) + int(parsed.group(6))
+
+    def merge(self, state, other):
+        return state.merge(other)
+
+    def result(self, state):
+        """
+        Returns:
+            dict: {"top_ip": str, "total_bytes": int, "matching_ips": int} or None if nothing matched.
+        """
+        top = state.top()
+        if top is None:
+            return None
+        top_ip, total_bytes = top
+        return {"top_ip": top_ip, "total_bytes": total_bytes, "matching_ips": len(state)}
+
+
+class HeavyHitterTopIpQuery(TopIpQuery):
+    """
+    Approximate strict top-IP query in bounded memory (weighted Misra-Gries summary).
+
+    At most 2 * capacity IPs are tracked. When the summary overflows, the
+    (capacity + 1)-th largest sum is subtracted from every entry and the
+    entries that drop to zero are discarded. The subtracted total
+    `error_bound` bounds the underestimate of every IP:
+    true - error_bound <= estimate <= true. Summaries merge by adding and
+    reducing again, so the query also runs in parallel scans.
+    """
+
+    def __init__(self, language, date, capacity=1024):
+        """
+        Args:
+            language (str): Language path segment.
+            date (str): Date in DD/Mon/YYYY format.
+            capacity (int): Number of heavy hitters to keep with guaranteed accuracy.
+        """
+        super().__init__(language, date, "strict")
+        self.capacity = capacity
+
+    def new_state(self):
+        return {"counts": {}, "error_bound": 0, "total_bytes": 0}
+
+    def _reduce(self, state):
+        counts = state["counts"]
+        threshold = heapq.nlargest(self.capacity + 1, counts.values())[-1]
+        kept = {ip: total - threshold for ip, total in counts.items() if total > threshold}
+        counts.clear()
+        counts.update(kept)
+        state["error_bound"] += threshold
+
+    def feed(self, state, block):
+        counts = state["counts"]
+        limit = 2 * self.capacity
+        rfind, find, get = block.rfind, block.find, counts.get
+        block_bytes = 0
+        for match in self._pattern.finditer(block):
+            size = match.group(1)
+            if size == b"-":
+                continue
+            line_start = rfind(b"\n", 0, match.start()) + 1
+            ip = block[line_start:find(b" ", line_start)]
+            size = int(size)
+            block_bytes += size
+            total = get(ip)
+            if total is None:
+                counts[ip] = size
+                if len(counts) > limit:
+                    self._reduce(state)
+            else:
+                counts[ip] = total + size
+        state["total_bytes"] += block_bytes
+
+    def merge(self, state, other):
+        counts = state["counts"]
+        for ip, total in other["counts"].items():
+            counts[ip] = counts.get(ip, 0) + total
+        state["error_bound"] += other["error_bound"]
+        state["total_bytes"] += other["total_bytes"]
+        if len(counts) > 2 * self.capacity:
+            self._reduce(state)
+        return state
+
+    def result(self, state):
+        """
+        Returns:
+            dict: {"top_ip", "total_bytes" (lower bound), "error_bound", "candidates",
+                   "guaranteed", "summary_size"} or None if nothing matched.
+                   `candidates` holds every IP that may be the true top; it is
+                   complete when `guaranteed` is True.
+        """
+        counts = state["counts"]
+        if not counts:
+            return None
+        error_bound = state["error_bound"]
+        top_ip, estimate = max(counts.items(), key=lambda item: item[1])
+        candidates = sorted(ip.decode() for ip, total in counts.items() if total + error_bound >= estimate)
+        return {
+            "top_ip": top_ip.decode(),
+            "total_bytes": estimate,
+            "error_bound": error_bound,
+            "candidates": candidates,
+            # An IP outside the summary has at most `error_bound` bytes
+            "guaranteed": estimate > error_bound,
+            "summary_size": len(counts),
+            "matched_bytes": state["total_bytes"],
+        }
+
+
+class CandidateTopIpQuery(TopIpQuery):
+    """
+    Exact strict top-IP query restricted to a set of candidate IPs.
+    """
+
+    def __init__(self, language, date, candidates):
+        super().__init__(language, date, "strict")
+        self.candidates = frozenset(ip.encode() for ip in candidates)
+
+    def feed(self, state, block):
+        candidates = self.candidates
+        totals = {}
+        rfind, find, get = block.rfind, block.find, totals.get
+        for match in self._pattern.finditer(block):
+            size = match.group(1)
+            if size == b"-":
+                continue
+            line_start = rfind(b"\n", 0, match.start()) + 1
+            ip = block[line_start:find(b" ", line_start)]
+            if ip in candidates:
+                totals[ip] = get(ip, 0) + int(size)
+        if totals:
+            state.add_totals(totals)
+
+
+class GetCountQuery:
+    """
+    Counts successful (2xx) GET requests under /<language>/ on one weekday within a time window.
+
+    The partial aggregate is a count per "DD/Mon/YYYY:HH:MM" timestamp prefix,
+    so partials from different byte ranges merge by addition and the weekday
+    is computed once per distinct date from the date itself.
+    """
+
+    def __init__(self, language, weekday, start_minute, end_minute):
+        """
+        Args:
+            language (str): Language path segment (e.g. 'tamil').
+            weekday (int): Day of week (0=Monday, 6=Sunday).
+            start_minute (int): Start of the window in minutes after midnight (inclusive).
+            end_minute (int): End of the window in minutes after midnight (exclusive).
+        """
+        self.language = language
+        self.weekday = weekday
+        self.start_minute = start_minute
+        self.end_minute = end_minute
+        self._pattern = re.compile(rb'"GET /' + re.escape(language.encode()) + rb'/[^"\n]*" 2\d\d ')
+
+    def new_state(self):
+        return {}
+
+    def feed(self, state, block):
+        """
+        Counts the matching requests of a block per minute timestamp.
+        """
+        rfind, find, get = block.rfind, block.find, state.get
+        for match in self._pattern.finditer(block):
+            position = match.start()
+            bracket = find(b"[", rfind(b"\n", 0, position) + 1, position)
+            if bracket == -1:
+                continue
+            minute_key = block[bracket + 1:bracket + 18]
+            state[minute_key] = get(minute_key, 0) + 1
+
+    def merge(self, state, other):
+        for minute_key, count in other.items():
+            state[minute_key] = state.get(minute_key, 0) + count
+        return state
+
+    def result(self, state):
+        """
+        Returns:
+            dict: {"count": int, "matching_dates": int}.
+        """
+        weekdays = {}
+        count = 0
+        dates = set()
+        for minute_key, minute_count in state.items():
+            date = minute_key[:11]
+            if date not in weekdays:
+                weekdays[date] = _weekday_of(date)
+            if weekdays[date] != self.weekday:
+                continue
+            try:
+                minute = int(minute_key[12:14]) * 60 + int(minute_key[15:17])
+            except ValueError:
+                continue
+            if self.start_minute <= minute < self.end_minute:
+                count += minute_count
+                dates.add(date)
+        return {"count": count, "matching_dates": len(dates)}
+
+
+def _weekday_of(date):
+    """
+    Returns the weekday of a b"DD/Mon/YYYY" log date, or None if it cannot be parsed.
+    """
+    try:
+        return datetime.strptime(date.decode("ascii"), "%d/%b/%Y").weekday()
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def _resolve_workers(workers):
+    if workers is None:
+        workers = LOG_SCAN_WORKERS
+    return max(1, workers or scan_worker_budget())
+
+
+def _feed_block(queries, block):
+    """
+    Runs every query over one block and returns their partial states.
+    Executed in the worker processes of a parallel scan.
+    """
+    states = [query.new_state() for query in queries]
+    for query, state in zip(queries, states):
+        query.feed(state, block)
+    return states, len(block), block.count(b"\n")
+
+
+def _feed_range(file_path, start, end, queries):
+    block = read_range(file_path, start, end)
+    if block and not block.endswith(b"\n"):
+        block += b"\n"
+    return _feed_block(queries, block)
+
+
+def scan_log(file_path, queries, block_size=BLOCK_SIZE, workers=1, chunk_size=None):
+    """
+    Streams a log once and feeds every block to every query.
+
+    With more than one worker, the log is split into chunks that are parsed
+    in a process pool, and the per-chunk aggregates are merged in order:
+    plain logs are cut into newline-aligned byte ranges that each worker
+    reads itself, gzipped logs are inflated here and the inflated chunks are
+    handed to the workers.
+
+    Args:
+        file_path (str): Path to the log (plain or gzip, detected by magic bytes).
+        queries (list): Query objects with new_state/feed/merge/result methods.
+        block_size (int): Block size in bytes for the in-process scan.
+        workers (int, optional): Worker processes. None uses LOG_SCAN_WORKERS (0 = `scan_worker_budget()`).
+        chunk_size (int, optional): Bytes per worker task. Defaults to LOG_SCAN_CHUNK_SIZE.
+
+    Returns:
+        tuple: (list of per-query results, scan stats dict)
+    """
+    workers = _resolve_workers(workers)
+    chunk_size = chunk_size or LOG_SCAN_CHUNK_SIZE
+    stats = {"bytes_scanned": 0, "lines": 0, "truncated": False, "workers": 1, "chunks": 0}
+    states = [query.new_state() for query in queries]
+    start = time.perf_counter()
+
+    gzipped = is_gzip_file(file_path)
+    # Access logs compress roughly 8:1, so a gzip of chunk_size / 8 inflates to about one chunk
+    parallel_threshold = chunk_size // 8 if gzipped else chunk_size
+    if workers > 1 and os.path.getsize(file_path) > parallel_threshold:
+        stats["workers"] = workers
+        _scan_parallel(file_path, queries, states, stats, workers, chunk_size, gzipped)
+    else:
+        with open_log_stream(file_path, block_size) as stream:
+            for block in iter_log_blocks(stream, block_size, stats):
+                stats["chunks"] += 1
+                for query, state in zip(queries, states):
+                    query.feed(state, block)
+
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    logger.info(
+        f"Scanned {stats['lines']} lines ({stats['bytes_scanned']} bytes) in {stats['elapsed_seconds']:.3f} s "
+        f"with {stats['workers']} worker(s)"
+    )
+    return [query.result(state) for query, state in zip(queries, states)], stats
+
+
+def _scan_parallel(file_path, queries, states, stats, workers, chunk_size, gzipped):
+    def merge(partial):
+        partial_states, size, lines = partial
+        for query, state, partial_state in zip(queries, states, partial_states):
+            query.merge(state, partial_state)
+        stats["bytes_scanned"] += size
+        stats["lines"] += lines
+        stats["chunks"] += 1
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        if not gzipped:
+            ranges = newline_aligned_ranges(file_path, chunk_size)
+            futures = [pool.submit(_feed_range, file_path, start, end, queries) for start, end in ranges]
+            for future in futures:
+                merge(future.result())
+            return
+
+        # Inflation is sequential; keep at most two chunks per worker in flight
+        pending = deque()
+        stream_stats = {"bytes_scanned": 0, "lines": 0, "truncated": False}
+        with open_log_stream(file_path, BLOCK_SIZE) as stream:
+            for block in iter_log_blocks(stream, chunk_size, stream_stats):
+                if len(pending) >= workers * 2:
+                    merge(pending.popleft().result())
+                pending.append(pool.submit(_feed_block, queries, block))
+        while pending:
+            merge(pending.popleft().result())
+        stats["truncated"] = stream_stats["truncated"]
+
+
+def find_top_ip(file_path, language, date, block_size=BLOCK_SIZE, workers=None, chunk_size=None):
+    """
+    Finds the IP that downloaded the most bytes under /<language>/ on `date`.
+
+    The strict match runs in a single pass. Only if it finds nothing, one more
+    pass computes the relaxed and language-only fallbacks together.
+
+    Args:
+        file_path (str): Path to the log (plain or gzip).
+        language (str): Language path segment (e.g. 'telugu').
+        date (str): Date in DD/Mon/YYYY format.
+        block_size (int): Block size in bytes.
+        workers (int, optional): Worker processes, see `scan_log`.
+        chunk_size (int, optional): Bytes per worker task, see `scan_log`.
+
+    Returns:
+        tuple: (result dict with `match_level`, or None; scan stats dict)
+    """
+    (result,), stats = scan_log(file_path, [TopIpQuery(language, date)], block_size, workers, chunk_size)
+    if result:
+        result["match_level"] = "strict"
+        return result, stats
+
+    result, fallback_stats = find_top_ip_fallback(file_path, language, date, block_size, workers, chunk_size)
+    stats["elapsed_seconds"] += fallback_stats["elapsed_seconds"]
+    return result, stats
+
+
+def find_top_ip_fallback(file_path, language, date, block_size=BLOCK_SIZE, workers=None, chunk_size=None):
+    """
+    Runs the relaxed and language-only top-IP queries together in one pass.
+
+    Returns:
+        tuple: (result dict with `match_level`, or None; scan stats dict)
+    """
+    logger.info("No results with strict matching. Trying relaxed and language-only matching")
+    fallback_queries = [TopIpQuery(language, date, "relaxed"), TopIpQuery(language, date, "language_only")]
+    results, stats = scan_log(file_path, fallback_queries, block_size, workers, chunk_size)
+    for query, result in zip(fallback_queries, results):
+        if result:
+            result["match_level"] = query.mode
+            return result, stats
+    return None, stats
+
+
+def find_top_ip_heavy_hitters(file_path, language, date, capacity=1024, verify=True,
+                              block_size=BLOCK_SIZE, workers=None, chunk_size=None):
+    """
+    Finds the strict top IP with a bounded-memory heavy-hitters summary.
+
+    With `verify`, a second pass sums the bytes of the candidate IPs exactly,
+    so the answer is exact while memory stays bounded by the candidate set.
+    If the summary cannot guarantee that the true top is among its
+    candidates (very flat distributions), the second pass is a full exact scan.
+
+    Args:
+        file_path (str): Path to the log (plain or gzip).
+        language (str): Language path segment.
+        date (str): Date in DD/Mon/YYYY format.
+        capacity (int): Heavy hitters tracked with guaranteed accuracy (memory is 2 * capacity IPs).
+        verify (bool): Whether to run the exact verification pass.
+        block_size (int): Block size in bytes.
+        workers (int, optional): Worker processes, see `scan_log`.
+        chunk_size (int, optional): Bytes per worker task, see `scan_log`.
+
+    Returns:
+        tuple: (result dict with `match_level` and `exact`, or None; scan stats dict)
+    """
+    query = HeavyHitterTopIpQuery(language, date, capacity)
+    (sketch,), stats = scan_log(file_path, [query], block_size, workers, chunk_size)
+    if sketch is None:
+        return None, stats
+    sketch["match_level"] = "strict"
+    sketch["exact"] = False
+    if not verify:
+        return sketch, stats
+
+    if sketch["guaranteed"]:
+        verify_query = CandidateTopIpQuery(language, date, sketch["candidates"])
+    else:
+        logger.info("Heavy-hitters summary is not conclusive; verifying with a full exact scan")
+        verify_query = TopIpQuery(language, date)
+    (exact,), verify_stats = scan_log(file_path, [verify_query], block_size, workers, chunk_size)
+    stats["elapsed_seconds"] += verify_stats["elapsed_seconds"]
+    exact.update({
+        "match_level": "strict",
+        "exact": True,
+        "estimate": sketch["total_bytes"],
+        "error_bound": sketch["error_bound"],
+        "candidates": len(sketch["candidates"]),
+        "summary_size": sketch["summary_size"],
+    })
+    return exact, stats
+
+
+def count_get_requests(file_path, language, weekday, start_minute, end_minute,
+                       block_size=BLOCK_SIZE, workers=None, chunk_size=None):
+    """
+    Counts successful GET requests under /<language>/ on a weekday within [start_minute, end_minute).
+
+    Args:
+        file_path (str): Path to the log (plain or gzip).
+        language (str): Language path segment (e.g. 'tamil').
+        weekday (int): Day of week (0=Monday, 6=Sunday).
+        start_minute (int): Window start in minutes after midnight (inclusive).
+        end_minute (int): Window end in minutes after midnight (exclusive).
+        block_size (int): Block size in bytes.
+        workers (int, optional): Worker processes, see `scan_log`.
+        chunk_size (int, optional): Bytes per worker task, see `scan_log`.
+
+    Returns:
+        tuple: (result dict, scan stats dict)
+    """
+    query = GetCountQuery(language, weekday, start_minute, end_minute)
+    (result,), stats = scan_log(file_path, [query], block_size, workers, chunk_size)
+    return result, stats
+
+
+def read_head_lines(file_path, lines=5):
+    """
+    Returns the first lines of a plain or gzipped log, for diagnostics.
+    """
+    head = []
+    try:
+        with open_log_stream(file_path, 64 * 1024) as stream:
+            for _ in range(lines):
+                line = stream.readline()
+                if not line:
+                    break
+                head.append(line.decode("utf-8", errors="replace").rstrip("\n"))
+    except Exception as e:
+        logger.warning(f"Failed to read sample lines: {e}")
+    return head
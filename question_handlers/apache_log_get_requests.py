@@ -1,11 +1,12 @@
-import subprocess
 import re
-from datetime import datetime, time
-import gzip
+from datetime import time
 import tempfile
 import os
 import logging
 import calendar
+import zlib
+from question_handlers.apache_log_index import indexed_get_count
+from question_handlers.apache_log_tail import LOG_TAIL_ENABLED, tail_get_count
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -75,55 +76,6 @@ def extract_query_parameters(question):
     
     return language, start_time, end_time, day_of_week
 
-def decompress_gzip_file(gzip_file_path):
-    """
-    Decompresses a .gz file to a temporary file and returns the path.
-    
-    Args:
-        gzip_file_path (str): Path to the gzipped file
-        
-    Returns:
-        str: Path to the temporary decompressed file
-    """
-    # Check if file exists
-    if not os.path.exists(gzip_file_path):
-        raise FileNotFoundError(f"File not found: {gzip_file_path}")
-    
-    # Check if file has content
-    if os.path.getsize(gzip_file_path) == 0:
-        raise ValueError(f"File is empty: {gzip_file_path}")
-    
-    # Create a temporary file to store the unzipped content
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.log')
-    temp_file_path = temp_file.name
-    temp_file.close()
-    
-    try:
-        # Try using gunzip command (often more reliable for large files)
-        command = f"gunzip -c '{gzip_file_path}' > '{temp_file_path}'"
-        logger.info(f"Decompressing with command: {command}")
-        
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        
-        # Check if command succeeded
-        if result.returncode != 0:
-            # If system command fails, try with Python's gzip module
-            logger.info("System gunzip failed, trying Python's gzip module")
-            with gzip.open(gzip_file_path, 'rb') as gz_file:
-                with open(temp_file_path, 'wb') as out_file:
-                    out_file.write(gz_file.read())
-        
-        # Verify the output file has content
-        if os.path.getsize(temp_file_path) == 0:
-            raise Exception("Decompressed file is empty. The gzip file might be corrupted.")
-        
-        return temp_file_path
-    except Exception as e:
-        # Clean up if decompression fails
-        if os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
-        raise Exception(f"Failed to decompress file: {str(e)}")
-
 def generate_sample_data(language, day_of_week, start_time, end_time, output_path):
     """
     Generates sample Apache log data when the input file is empty or invalid.
@@ -200,7 +152,27 @@ def generate_sample_data(language, day_of_week, start_time, end_time, output_pat
     logger.info(f"Generated sample data with {expected_count} matching requests")
     return True, expected_count
 
-def process_apache_logs_get_requests(file_path, question, use_sample_if_needed=True):
+def sample_data_response(language, day_of_week, start_time, end_time):
+    """
+    Builds the response used when no readable log was uploaded.
+    
+    Returns:
+        dict: {"count": int, "note": str, "cacheable": False} or error message.
+    """
+    with tempfile.NamedTemporaryFile(suffix='.log') as sample_file:
+        success, expected_count = generate_sample_data(
+            language, day_of_week, start_time, end_time, sample_file.name
+        )
+    if not success:
+        return {"error": "Failed to generate sample data"}
+    return {
+        "count": expected_count,
+        "note": "Using generated sample data. This is not based on real logs.",
+        "cacheable": False
+    }
+
+def process_apache_logs_get_requests(file_path, question, use_sample_if_needed=True, workers=None, chunk_size=None,
+                                     incremental=None):
     """
     Processes Apache logs to count successful GET requests for specific language paths
     during given time periods on specific days of the week.
@@ -209,14 +181,14 @@ def process_apache_logs_get_requests(file_path, question, use_sample_if_needed=T
         file_path (str): Path to the Apache log file (can be .gz)
         question (str): The question containing query parameters.
         use_sample_if_needed (bool): Whether to generate sample data if needed
+        workers (int, optional): Worker processes for the scan (None = LOG_SCAN_WORKERS)
+        chunk_size (int, optional): Bytes per worker task (None = LOG_SCAN_CHUNK_SIZE)
+        incremental (bool, optional): Only parse what was appended since the last question about
+            this path (for live logs read in place; uploads get a new path each time). Defaults to LOG_TAIL_ENABLED.
         
     Returns:
         dict: {"count": int} or error message.
     """
-    temp_file_path = None
-    sample_data_used = False
-    expected_count = None
-    
     try:
         # Extract query parameters
         language, start_time, end_time, day_of_week = extract_query_parameters(question)
@@ -226,128 +198,38 @@ def process_apache_logs_get_requests(file_path, question, use_sample_if_needed=T
         
         # Check if file exists and has content
         if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
-            if use_sample_if_needed:
-                logger.warning(f"File {file_path} is missing or empty, generating sample data")
-                
-                # Create a temporary file for sample data
-                sample_file = tempfile.NamedTemporaryFile(delete=False, suffix='.log')
-                temp_file_path = sample_file.name
-                sample_file.close()
-                
-                # Generate sample data
-                success, expected_count = generate_sample_data(
-                    language, day_of_week, start_time, end_time, temp_file_path
-                )
-                
-                if success:
-                    processing_file_path = temp_file_path
-                    sample_data_used = True
-                else:
-                    return {"error": "Failed to generate sample data"}
-            else:
+            if not use_sample_if_needed:
                 if not os.path.exists(file_path):
                     return {"error": f"File not found: {file_path}"}
-                else:
-                    return {"error": f"File is empty: {file_path}"}
-        else:
-            # Decompress the file if it's a gzip file
-            if file_path.endswith('.gz'):
-                try:
-                    temp_file_path = decompress_gzip_file(file_path)
-                    processing_file_path = temp_file_path
-                except Exception as e:
-                    if use_sample_if_needed:
-                        logger.warning(f"Failed to decompress file: {e}, generating sample data")
-                        
-                        # Create a temporary file for sample data
-                        sample_file = tempfile.NamedTemporaryFile(delete=False, suffix='.log')
-                        temp_file_path = sample_file.name
-                        sample_file.close()
-                        
-                        # Generate sample data
-                        success, expected_count = generate_sample_data(
-                            language, day_of_week, start_time, end_time, temp_file_path
-                        )
-                        
-                        if success:
-                            processing_file_path = temp_file_path
-                            sample_data_used = True
-                        else:
-                            return {"error": f"Failed to decompress file and generate sample data: {e}"}
-                    else:
-                        return {"error": f"Failed to decompress file: {e}"}
+                return {"error": f"File is empty: {file_path}"}
+            logger.warning(f"File {file_path} is missing or empty, generating sample data")
+            return sample_data_response(language, day_of_week, start_time, end_time)
+        
+        # Answered from the log's columnar index once built; the first question streams while it builds
+        start_minute = start_time.hour * 60 + start_time.minute
+        end_minute = end_time.hour * 60 + end_time.minute
+        try:
+            if LOG_TAIL_ENABLED if incremental is None else incremental:
+                result, scan_stats = tail_get_count(file_path, language, day_of_week, start_minute, end_minute)
             else:
-                processing_file_path = file_path
-        
-        # For sample data, we can return the expected count directly
-        if sample_data_used and expected_count is not None:
-            return {
-                "count": expected_count,
-                "note": "Using generated sample data. This is not based on real logs."
-            }
-        
-        # Build the command to count successful GET requests
-        # Format: Day/Month/Year:Hour:Minute:Second
-        start_hour_str = f"{start_time.hour:02d}"
-        end_hour_str = f"{end_time.hour:02d}"
-        
-        # We're constructing a complex grep pattern to match:
-        # 1. The day of week
-        # 2. The time range
-        # 3. GET requests
-        # 4. The language path
-        # 5. Successful responses (2xx status codes)
-        
-        command = f"""
-        grep "\\[{day_name}" {processing_file_path} | awk '{{
-            # Extract time from log entry
-            split($4, a, ":");
-            hour = substr(a[1], length(a[1])-1, 2);
-            
-            # Check if within time range
-            if (hour >= {start_hour_str} && hour < {end_hour_str}) {{
-                # Check if it's a GET request for the language path
-                if ($6 == "\\"GET" && $7 ~ "^\\/{language}\\/" && $9 ~ "^2[0-9][0-9]") {{
-                    count++;
-                }}
-            }}
-        }} END {{ print count }}'
-        """
-        
-        logger.info(f"Running command: {command}")
-        
-        # Execute the command
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        
-        # Check for errors
-        if result.returncode != 0:
-            return {"error": f"Command failed: {result.stderr}"}
+                result, scan_stats = indexed_get_count(
+                    file_path, language, day_of_week, start_minute, end_minute,
+                    workers=workers, chunk_size=chunk_size
+                )
+        except (OSError, EOFError, zlib.error) as e:
+            if use_sample_if_needed:
+                logger.warning(f"Failed to read log file: {e}, generating sample data")
+                return sample_data_response(language, day_of_week, start_time, end_time)
+            return {"error": f"Failed to read log file: {e}"}
         
-        # Parse the output
-        output = result.stdout.strip()
-        if output:
-            try:
-                count = int(output)
-                response = {"count": count}
-                if sample_data_used:
-                    response["note"] = "Using generated sample data. This is not based on real logs."
-                return response
-            except ValueError:
-                return {"error": f"Failed to parse count: {output}"}
-        else:
-            return {"error": "Command produced no output"}
+        response = {"count": result["count"]}
+        if scan_stats["truncated"]:
+            response["note"] = "The compressed log was truncated; counted the readable part."
+        return response
     
     except Exception as e:
         logger.exception(f"Error processing Apache logs: {e}")
         return {"error": str(e)}
-    finally:
-        # Clean up temporary files
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.info(f"Cleaned up temporary file: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up temporary file: {e}")
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,685 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+from question_handlers.apache_log_engine import (
+    LOG_LINE_RE,
+    count_get_requests,
+    find_top_ip,
+    find_top_ip_fallback,
+    scan_log,
+)
+from services.upload_store import file_sha256
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOG_INDEX_DIR = os.getenv("LOG_INDEX_DIR", os.path.join(tempfile.gettempdir(), "tds_solver_log_index"))
+LOG_INDEX_ENABLED = os.getenv("LOG_INDEX_ENABLED", "1") not in ("0", "false", "no")
+# Single questions about a log without an index are streamed (parallel engine) and the
+# index is built from a background thread (parsed by the same engine) for the next ones;
+# 0 builds it before answering
+LOG_INDEX_BACKGROUND_BUILD = os.getenv("LOG_INDEX_BACKGROUND_BUILD", "1") not in ("0", "false", "no")
+# Oldest indexes beyond this count are deleted after each build
+LOG_INDEX_MAX_ENTRIES = int(os.getenv("LOG_INDEX_MAX_ENTRIES", "32"))
+# GET-count rollup: minutes per bucket (must divide 60; 0 disables) and size cap
+LOG_ROLLUP_BUCKET_MINUTES = int(os.getenv("LOG_ROLLUP_BUCKET_MINUTES", "5"))
+LOG_ROLLUP_MAX_BYTES = int(os.getenv("LOG_ROLLUP_MAX_BYTES", str(256 * 1024 ** 2)))
+INDEX_VERSION = 1
+
+COLUMNS = ("ip_id", "epoch", "tz_minutes", "method_id", "status", "prefix_id", "bytes")
+SECONDS_PER_DAY = 86400
+
+_build_lock = threading.Lock()
+# Background builds: one at a time, at most one scheduled per index directory
+_background_builds = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-index-build")
+_scheduled_builds = {}
+_scheduled_lock = threading.Lock()
+
+
+def _path_prefix(path):
+    """
+    Returns the first path segment when it is followed by a slash
+    (b"/telugu/a.html" -> b"telugu"), else b"" (b"/favicon.ico" -> b"").
+    """
+    end = path.find(b"/", 1)
+    return path[1:end] if path.startswith(b"/") and end > 0 else b""
+
+
+class LogIndex:
+    """
+    Columnar, memory-mapped view of a parsed Apache log.
+
+    One row per parsed line:
+        ip_id (int32): index into `ips`.
+        epoch (int64): the logged wall-clock time as seconds since 1970-01-01,
+            without applying the timezone offset, so day/hour/weekday
+            arithmetic matches what is written in the log.
+        tz_minutes (int16): the logged timezone offset in minutes.
+        method_id (uint16): index into `methods`.
+        status (int16): HTTP status.
+        prefix_id (int32): index into `prefixes` (first path segment, see `_path_prefix`).
+        bytes (int64): response size, -1 for "-".
+    """
+
+    def __init__(self, directory, meta, columns, ips):
+        self.directory = directory
+        self.meta = meta
+        self.columns = columns
+        self.ips = ips
+        self.methods = [method.encode() for method in meta["methods"]]
+        self.prefixes = {
+            prefix.encode("utf-8", errors="surrogateescape"): prefix_id
+            for prefix_id, prefix in enumerate(meta["prefixes"])
+        }
+        self._rollups = {}
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Opens an index directory, memory-mapping every column.
+        """
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported log index version: {meta.get('version')}")
+        columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+        ips = np.load(os.path.join(directory, "ips.npy"), mmap_mode="r")
+        return cls(directory, meta, columns, ips)
+
+    def __len__(self):
+        return self.meta["lines"]
+
+    def _prefix_mask(self, language):
+        prefix_id = self.prefixes.get(language.encode())
+        if prefix_id is None:
+            return None
+        return self.columns["prefix_id"] == prefix_id
+
+    def top_ip(self, language, date):
+        """
+        Finds the IP with the most bytes for paths under /<language>/ on `date` (exact, case-sensitive).
+
+        Args:
+            language (str): Language path segment.
+            date (str): Date in DD/Mon/YYYY format.
+
+        Returns:
+            dict: {"top_ip", "total_bytes", "matching_ips"} or None if nothing matched.
+        """
+        mask = self._prefix_mask(language)
+        if mask is None:
+            return None
+        day_start = int((datetime.strptime(date, "%d/%b/%Y") - datetime(1970, 1, 1)).total_seconds())
+        epoch = self.columns["epoch"]
+        sizes = self.columns["bytes"]
+        mask &= (epoch >= day_start) & (epoch < day_start + SECONDS_PER_DAY) & (sizes >= 0)
+
+        ip_ids = self.columns["ip_id"][mask]
+        if ip_ids.size == 0:
+            return None
+        totals = np.bincount(ip_ids, weights=sizes[mask], minlength=len(self.ips))
+        top_id = int(np.argmax(totals))
+        return {
+            "top_ip": self.ips[top_id].decode(),
+            "total_bytes": int(round(totals[top_id])),
+            "matching_ips": int(np.count_nonzero(np.bincount(ip_ids))),
+        }
+
+    def get_count(self, language, weekday, start_minute, end_minute, use_rollup=True):
+        """
+        Counts 2xx GET requests under /<language>/ on a weekday within [start_minute, end_minute).
+
+        Windows aligned to the rollup's buckets are answered from the rollup
+        (see `get_rollup`); others from masks over the columns.
+
+        Args:
+            language (str): Language path segment.
+            weekday (int): Day of week (0=Monday, 6=Sunday).
+            start_minute (int): Window start in minutes after midnight (inclusive).
+            end_minute (int): Window end in minutes after midnight (exclusive).
+            use_rollup (bool): Whether aligned windows may be answered from the rollup.
+
+        Returns:
+            dict: {"count": int, "matching_dates": int or None (unknown when answered from the rollup)}.
+        """
+        bucket = LOG_ROLLUP_BUCKET_MINUTES
+        if use_rollup and bucket and start_minute % bucket == 0 and end_minute % bucket == 0:
+            rollup = self.get_rollup(bucket)
+            if rollup is not None:
+                return {"count": rollup.count(language, weekday, start_minute, end_minute), "matching_dates": None}
+
+        mask = self._prefix_mask(language)
+        if mask is None or b"GET" not in self.methods:
+            return {"count": 0, "matching_dates": 0}
+        status = self.columns["status"]
+        mask &= (self.columns["method_id"] == self.methods.index(b"GET")) & (status >= 200) & (status < 300)
+
+        epoch = self.columns["epoch"][mask]
+        days = epoch // SECONDS_PER_DAY
+        minutes = (epoch % SECONDS_PER_DAY) // 60
+        # 1970-01-01 was a Thursday (weekday 3)
+        selected = ((days + 3) % 7 == weekday) & (minutes >= start_minute) & (minutes < end_minute)
+        return {
+            "count": int(np.count_nonzero(selected)),
+            "matching_dates": int(np.unique(days[selected]).size),
+        }
+
+
+    def get_rollup(self, bucket_minutes=None):
+        """
+        Returns the GET-count rollup of this log, building and saving it on first use.
+
+        Args:
+            bucket_minutes (int, optional): Minutes per bucket. Defaults to LOG_ROLLUP_BUCKET_MINUTES.
+
+        Returns:
+            GetRollup: The rollup, or None if it would exceed LOG_ROLLUP_MAX_BYTES.
+        """
+        bucket_minutes = bucket_minutes or LOG_ROLLUP_BUCKET_MINUTES
+        rollup = self._rollups.get(bucket_minutes)
+        if rollup is None:
+            rollup = GetRollup.load_or_build(self, bucket_minutes)
+            self._rollups[bucket_minutes] = rollup
+        return rollup or None
+
+
+STATUS_CLASSES = 6  # 0 (unparsable) and 1xx..5xx
+SUCCESS_CLASS = 2
+# Index rows folded into the rollup per step
+ROLLUP_BLOCK_ROWS = 1 << 20
+
+
+class GetRollup:
+    """
+    Dense count tensor of GET requests: [weekday, hour, minute bucket, path prefix, status class].
+
+    A "GET requests under /X/ from HH:MM until before HH:MM on <day>" query is
+    a slice of the (hour, bucket) axes at one weekday, prefix and status
+    class, so its cost depends only on the window length, not on the log size.
+    """
+
+    def __init__(self, index, bucket_minutes, counts, info):
+        self.index = index
+        self.bucket_minutes = bucket_minutes
+        self.counts = counts
+        self.info = info
+
+    @staticmethod
+    def _paths(index, bucket_minutes):
+        base = os.path.join(index.directory, f"get_rollup_{bucket_minutes}m")
+        return base + ".npy", base + ".json"
+
+    @classmethod
+    def load_or_build(cls, index, bucket_minutes):
+        """
+        Loads the rollup saved next to the index, or builds and saves it.
+
+        Returns:
+            GetRollup or False: False if the tensor would exceed LOG_ROLLUP_MAX_BYTES.
+        """
+        if 60 % bucket_minutes:
+            raise ValueError(f"Rollup bucket must divide 60 minutes, got {bucket_minutes}")
+        shape = (7, 24, 60 // bucket_minutes, len(index.prefixes), STATUS_CLASSES)
+        size_bytes = int(np.prod(shape)) * np.dtype(np.uint32).itemsize
+        if size_bytes > LOG_ROLLUP_MAX_BYTES:
+            logger.info(f"Skipping GET rollup of {size_bytes} bytes for {index.directory} (limit {LOG_ROLLUP_MAX_BYTES})")
+            return False
+
+        counts_path, info_path = cls._paths(index, bucket_minutes)
+        try:
+            with open(info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            return cls(index, bucket_minutes, np.load(counts_path, mmap_mode="r"), info)
+        except FileNotFoundError:
+            pass
+
+        start = time.perf_counter()
+        columns = index.columns
+        counts = np.zeros(shape, dtype=np.uint32)
+        flat_counts = counts.reshape(-1)
+        if b"GET" in index.methods:
+            get_id = index.methods.index(b"GET")
+            # Rows are folded in blocks, so memory stays at the uint32 tensor plus one block
+            for row_start in range(0, len(index), ROLLUP_BLOCK_ROWS):
+                rows = slice(row_start, row_start + ROLLUP_BLOCK_ROWS)
+                is_get = columns["method_id"][rows] == get_id
+                epoch = columns["epoch"][rows][is_get]
+                minute_of_day = (epoch % SECONDS_PER_DAY) // 60
+                flat = np.ravel_multi_index(
+                    (
+                        (epoch // SECONDS_PER_DAY + 3) % 7,  # 1970-01-01 was a Thursday
+                        minute_of_day // 60,
+                        (minute_of_day % 60) // bucket_minutes,
+                        columns["prefix_id"][rows][is_get],
+                        np.clip(columns["status"][rows][is_get] // 100, 0, STATUS_CLASSES - 1),
+                    ),
+                    shape,
+                )
+                cells, cell_counts = np.unique(flat, return_counts=True)
+                flat_counts[cells] += cell_counts.astype(np.uint32)
+
+        info = {
+            "shape": list(shape),
+            "bytes": int(counts.nbytes),
+            "build_seconds": round(time.perf_counter() - start, 4),
+        }
+        # Info is written last, so readers never see a partial tensor
+        with open(counts_path + ".part", "wb") as f:
+            np.save(f, counts)
+        os.replace(counts_path + ".part", counts_path)
+        with open(info_path + ".part", "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(info_path + ".part", info_path)
+        logger.info(
+            f"Built GET rollup {shape} for {index.directory}: {info['bytes'] / 1024 ** 2:.2f} MB "
+            f"in {info['build_seconds'] * 1000:.1f} ms"
+        )
+        return cls(index, bucket_minutes, counts, info)
+
+    def count(self, language, weekday, start_minute, end_minute):
+        """
+        Counts 2xx GET requests under /<language>/ on a weekday in [start_minute, end_minute).
+        Both bounds must be multiples of the bucket size.
+        """
+        prefix_id = self.index.prefixes.get(language.encode())
+        if prefix_id is None:
+            return 0
+        by_bucket = self.counts[weekday, :, :, prefix_id, SUCCESS_CLASS].reshape(-1)
+        return int(by_bucket[start_minute // self.bucket_minutes:end_minute // self.bucket_minutes].sum())
+
+
+@lru_cache(maxsize=65536)
+def _minute_epoch(minute_key):
+    """
+    Returns the epoch of a b"DD/Mon/YYYY:HH:MM" minute, or None if it does not parse.
+    """
+    try:
+        moment = datetime.strptime(minute_key.decode("ascii"), "%d/%b/%Y:%H:%M")
+    except (UnicodeDecodeError, ValueError):
+        return None
+    return int((moment - datetime(1970, 1, 1)).total_seconds())
+
+
+def _intern(values, table):
+    """
+    Maps a block's values to ids in `table` (value -> id, extended in order of first appearance).
+
+    Only the distinct values of the block are looked up in Python.
+
+    Returns:
+        tuple: (ids per value as an int64 array, distinct values in order of first appearance)
+    """
+    distinct, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    distinct = distinct[order].tolist()
+    ids = np.empty(len(distinct), dtype=np.int64)
+    ids[order] = [table.setdefault(value, len(table)) for value in distinct]
+    return ids[inverse.reshape(-1)], distinct
+
+
+class _ColumnQuery:
+    """
+    Parses every line into the index columns (a query for `apache_log_engine.scan_log`).
+
+    Each block is matched with one `LOG_LINE_RE.findall` and converted with
+    NumPy; IPs, methods, path prefixes and minutes are handled once per
+    distinct value. Every partial state interns its own IPs, methods and
+    prefixes, and `merge` remaps the other state's ids onto this one's, so
+    the columns can be parsed in the engine's worker processes.
+    """
+
+    def new_state(self):
+        return {
+            "ips": {},
+            "methods": {},
+            "prefixes": {},
+            "parts": {name: [] for name in COLUMNS},
+            "rows": 0,
+        }
+
+    def feed(self, state, block):
+        rows = LOG_LINE_RE.findall(block)
+        if not rows:
+            return
+        ips, timestamps, methods, paths, statuses, sizes = (np.array(values) for values in zip(*rows))
+
+        # timestamp: b"26/May/2024:13:45:12 +0530", zero-padded to 26 bytes
+        minute_keys, inverse = np.unique(timestamps.astype("S17"), return_inverse=True)
+        minute_epochs = [_minute_epoch(key) for key in minute_keys.tolist()]
+        minute_valid = np.array([epoch is not None for epoch in minute_epochs])
+        minute_epochs = np.array([epoch or 0 for epoch in minute_epochs], dtype=np.int64)
+        inverse = inverse.reshape(-1)
+        chars = timestamps.astype("S26").view(np.uint8).reshape(len(rows), 26).astype(np.int64)
+        digits = chars - ord("0")
+        is_digit = (digits >= 0) & (digits <= 9)
+        # A timestamp shorter than 26 bytes has no offset, as before
+        has_tz = chars[:, 25] != 0
+        valid = (
+            minute_valid[inverse]
+            & is_digit[:, 18] & is_digit[:, 19]
+            & (~has_tz | is_digit[:, 22:26].all(axis=1))
+        )
+        if not valid.all():
+            ips, methods, paths, statuses, sizes = ips[valid], methods[valid], paths[valid], statuses[valid], sizes[valid]
+            inverse, digits, chars, has_tz = inverse[valid], digits[valid], chars[valid], has_tz[valid]
+        epochs = minute_epochs[inverse] + digits[:, 18] * 10 + digits[:, 19]
+        offsets = np.where(has_tz, (digits[:, 22] * 10 + digits[:, 23]) * 60 + digits[:, 24] * 10 + digits[:, 25], 0)
+        offsets[chars[:, 21] == ord("-")] *= -1
+
+        ip_ids, _ = _intern(ips, state["ips"])
+        method_ids, _ = _intern(methods, state["methods"])
+        path_ids, distinct_paths = _intern(paths, {})
+        prefix_of_path = np.array(
+            [state["prefixes"].setdefault(_path_prefix(path), len(state["prefixes"])) for path in distinct_paths],
+            dtype=np.int64,
+        )
+        dashes = sizes == b"-"
+        sizes[dashes] = b"0"
+        sizes = sizes.astype(np.int64)
+        sizes[dashes] = -1
+
+        parts = state["parts"]
+        parts["ip_id"].append(ip_ids.astype(np.int32))
+        parts["epoch"].append(epochs)
+        parts["tz_minutes"].append(offsets.astype(np.int16))
+        parts["method_id"].append(method_ids.astype(np.uint16))
+        parts["status"].append(statuses.astype(np.int16))
+        parts["prefix_id"].append(prefix_of_path[path_ids].astype(np.int32))
+        parts["bytes"].append(sizes)
+        state["rows"] += len(ip_ids)
+
+    def merge(self, state, other):
+        remaps = {}
+        for name in ("ips", "methods", "prefixes"):
+            table = state[name]
+            remaps[name] = np.array([table.setdefault(value, len(table)) for value in other[name]], dtype=np.int64)
+        for name, parts in other["parts"].items():
+            remap = {"ip_id": remaps["ips"], "method_id": remaps["methods"], "prefix_id": remaps["prefixes"]}.get(name)
+            state["parts"][name].extend(
+                parts if remap is None else (remap[part].astype(part.dtype) for part in parts)
+            )
+        state["rows"] += other["rows"]
+        return state
+
+    def result(self, state):
+        return state
+
+
+def _write_columns(columns, directory, meta):
+    """
+    Writes the columns, interned values and meta parsed by `_ColumnQuery` to `directory`.
+    """
+    for name in COLUMNS:
+        parts = columns["parts"][name]
+        column = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        np.save(os.path.join(directory, f"{name}.npy"), column)
+        columns["parts"][name] = None  # Release each column once it is on disk
+    np.save(os.path.join(directory, "ips.npy"), np.array(list(columns["ips"]), dtype=bytes))
+    meta["methods"] = [method.decode("ascii", errors="replace") for method in columns["methods"]]
+    meta["prefixes"] = [prefix.decode("utf-8", errors="surrogateescape") for prefix in columns["prefixes"]]
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def build_log_index(file_path, directory, workers=None):
+    """
+    Parses a plain or gzipped log once and writes its columns to `directory`.
+
+    The log is parsed by `apache_log_engine.scan_log`, in parallel worker
+    processes for logs above its parallel threshold.
+
+    Args:
+        file_path (str): Path to the log.
+        directory (str): Target directory (created; replaced atomically if it exists).
+        workers (int, optional): Worker processes for the parse, see `scan_log`.
+
+    Returns:
+        LogIndex: The loaded index.
+    """
+    start = time.perf_counter()
+    (columns,), stats = scan_log(file_path, [_ColumnQuery()], workers=workers)
+
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=parent, prefix=".build-")
+    try:
+        meta = {
+            "version": INDEX_VERSION,
+            "lines": columns["rows"],
+            "skipped_lines": stats["lines"] - columns["rows"],
+            "bytes_scanned": stats["bytes_scanned"],
+            "truncated": stats["truncated"],
+            "build_seconds": round(time.perf_counter() - start, 3),
+        }
+        _write_columns(columns, temp_dir, meta)
+        # An unreadable index in the way is moved aside first, so the new one is published with a rename
+        stale_dir = None
+        if os.path.isdir(directory):
+            stale_dir = tempfile.mkdtemp(dir=parent, prefix=".stale-")
+            os.replace(directory, os.path.join(stale_dir, "index"))
+        os.replace(temp_dir, directory)
+        if stale_dir:
+            shutil.rmtree(stale_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    logger.info(
+        f"Built log index {directory}: {meta['lines']} rows, {meta['skipped_lines']} unparsed lines, "
+        f"{len(columns['ips'])} IPs in {meta['build_seconds']:.2f} s"
+    )
+    return LogIndex.load(directory)
+
+
+def _load_existing(directory):
+    """
+    Returns the index in `directory` (marking it recently used), or None if there is none or it is unreadable.
+    """
+    try:
+        index = LogIndex.load(directory)
+        os.utime(directory)
+        return index
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Rebuilding unreadable log index {directory}: {e}")
+        return None
+
+
+def _load_or_build(file_path, index_dir, directory):
+    index = _load_existing(directory)
+    if index is not None:
+        return index
+    os.makedirs(index_dir, exist_ok=True)
+    # The file lock keeps other processes (handler pool workers, other app
+    # instances) from building the same index at the same time
+    with _build_lock, open(directory + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        index = _load_existing(directory)
+        if index is not None:
+            return index
+        index = build_log_index(file_path, directory)
+    prune_indexes(index_dir)
+    return index
+
+
+def get_log_index(file_path, index_dir=None):
+    """
+    Returns the columnar index of a log, building it on first use.
+
+    Indexes are keyed by the log's SHA-256, so re-uploads of the same content
+    (under any name) reuse the index.
+
+    Args:
+        file_path (str): Path to the log (plain or gzip).
+        index_dir (str, optional): Root directory for indexes. Defaults to LOG_INDEX_DIR.
+
+    Returns:
+        LogIndex: The index.
+    """
+    index_dir = index_dir or LOG_INDEX_DIR
+    return _load_or_build(file_path, index_dir, os.path.join(index_dir, file_sha256(file_path)))
+
+
+def find_log_index(file_path, index_dir=None):
+    """
+    Returns the columnar index of a log if it is already built, else None.
+
+    Callers stream the question with the parallel engine instead of waiting
+    for the build (which parses every field and writes the columns), then
+    call `schedule_log_index_build`. With LOG_INDEX_BACKGROUND_BUILD off, the
+    index is built here (see `get_log_index`).
+
+    Args:
+        file_path (str): Path to the log (plain or gzip).
+        index_dir (str, optional): Root directory for indexes. Defaults to LOG_INDEX_DIR.
+
+    Returns:
+        LogIndex or None
+    """
+    if not LOG_INDEX_BACKGROUND_BUILD:
+        return get_log_index(file_path, index_dir)
+    return _load_existing(os.path.join(index_dir or LOG_INDEX_DIR, file_sha256(file_path)))
+
+
+def schedule_log_index_build(file_path, index_dir=None):
+    """
+    Builds the columnar index of a log in a background thread, unless that build is already scheduled.
+
+    Scheduling is de-duplicated within the process; a build that another
+    process is already running is waited for (see `_load_or_build`) and not repeated.
+    """
+    index_dir = index_dir or LOG_INDEX_DIR
+    directory = os.path.join(index_dir, file_sha256(file_path))
+    with _scheduled_lock:
+        if directory not in _scheduled_builds:
+            logger.info(f"Scheduling a background build of log index {directory}")
+            _scheduled_builds[directory] = _background_builds.submit(
+                _build_in_background, file_path, index_dir, directory
+            )
+
+
+def _build_in_background(file_path, index_dir, directory):
+    try:
+        _load_or_build(file_path, index_dir, directory)
+    except Exception as e:
+        logger.warning(f"Background build of log index {directory} failed: {e}")
+    finally:
+        with _scheduled_lock:
+            _scheduled_builds.pop(directory, None)
+
+
+def wait_for_background_builds(timeout=None):
+    """
+    Blocks until the scheduled background index builds have finished (or `timeout` seconds passed).
+    """
+    with _scheduled_lock:
+        futures = list(_scheduled_builds.values())
+    wait(futures, timeout=timeout)
+
+
+def prune_indexes(index_dir=None, max_entries=None):
+    """
+    Deletes the least recently used indexes beyond `max_entries`.
+
+    Their empty `.lock` files are kept: deleting one while a build holds it
+    would let a second build take a new lock on the same index.
+    """
+    index_dir = index_dir or LOG_INDEX_DIR
+    max_entries = LOG_INDEX_MAX_ENTRIES if max_entries is None else max_entries
+    entries = sorted(
+        (entry.stat().st_mtime, entry.path)
+        for entry in os.scandir(index_dir)
+        if entry.is_dir() and not entry.name.startswith(".")
+    )
+    for mtime, path in entries[:max(0, len(entries) - max_entries)]:
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Pruned log index {path}")
+
+
+def _index_stats(index, query_start):
+    return {
+        "index": True,
+        "lines": index.meta["lines"],
+        "bytes_scanned": index.meta["bytes_scanned"],
+        "truncated": index.meta["truncated"],
+        "build_seconds": index.meta["build_seconds"],
+        "elapsed_seconds": time.perf_counter() - query_start,
+    }
+
+
+def indexed_top_ip(file_path, language, date, workers=None, chunk_size=None):
+    """
+    `find_top_ip` answered from the log's columnar index.
+
+    Strict matches come from the index; the relaxed fallbacks, which need the
+    raw request paths, still stream the log. If the index is not built yet
+    (see `find_log_index`) or cannot be used, the whole query streams.
+
+    Returns:
+        tuple: (result dict with `match_level`, or None; stats dict)
+    """
+    index = None
+    if LOG_INDEX_ENABLED:
+        try:
+            index = find_log_index(file_path)
+            if index is not None:
+                start = time.perf_counter()
+                result = index.top_ip(language, date)
+                stats = _index_stats(index, start)
+        except Exception as e:
+            logger.warning(f"Log index unavailable, streaming instead: {e}")
+            return find_top_ip(file_path, language, date, workers=workers, chunk_size=chunk_size)
+    if index is None:
+        streamed = find_top_ip(file_path, language, date, workers=workers, chunk_size=chunk_size)
+        if LOG_INDEX_ENABLED:
+            schedule_log_index_build(file_path)
+        return streamed
+
+    if result:
+        result["match_level"] = "strict"
+        return result, stats
+    result, fallback_stats = find_top_ip_fallback(file_path, language, date, workers=workers, chunk_size=chunk_size)
+    stats["elapsed_seconds"] += fallback_stats["elapsed_seconds"]
+    return result, stats
+
+
+def indexed_get_count(file_path, language, weekday, start_minute, end_minute, workers=None, chunk_size=None):
+    """
+    `count_get_requests` answered from the log's columnar index, streaming if
+    the index is not built yet (see `find_log_index`) or cannot be used.
+
+    Returns:
+        tuple: (result dict, stats dict)
+    """
+    index = None
+    if LOG_INDEX_ENABLED:
+        try:
+            index = find_log_index(file_path)
+            if index is not None:
+                start = time.perf_counter()
+                result = index.get_count(language, weekday, start_minute, end_minute)
+                return result, _index_stats(index, start)
+        except Exception as e:
+            logger.warning(f"Log index unavailable, streaming instead: {e}")
+            return count_get_requests(
+                file_path, language, weekday, start_minute, end_minute, workers=workers, chunk_size=chunk_size
+            )
+    streamed = count_get_requests(
+        file_path, language, weekday, start_minute, end_minute, workers=workers, chunk_size=chunk_size
+    )
+    if LOG_INDEX_ENABLED:
+        schedule_log_index_build(file_path)
+    return streamed
@@ -0,0 +1,512 @@
+import base64
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from question_handlers.apache_log_engine import (
+    BLOCK_SIZE,
+    GZIP_MAGIC,
+    LOG_LINE_RE,
+    GetCountQuery,
+    TopIpQuery,
+    find_top_ip_fallback,
+)
+from question_handlers.apache_log_index import _path_prefix
+from utils.packed_ips import IpTotals
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Incremental mode: remember how far each log was read and only parse what was appended since.
+# States are keyed by the log's absolute path, so this only pays off for logs read in place
+# (e.g. a live log on the server's disk). Every `/api` upload is stored under a new
+# content-addressed path, so uploads of a growing log never hit a stored state.
+LOG_TAIL_ENABLED = os.getenv("LOG_TAIL_ENABLED", "0") in ("1", "true", "yes")
+# Private to the app's user (created with mode 0o700), not a predictable name in the shared temp dir
+LOG_TAIL_DIR = os.getenv("LOG_TAIL_DIR") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "tds_solver", "log_tail"
+)
+# Refreshes append what they read to a delta file; the full state is rewritten once this many
+# deltas (or more delta bytes than the full state holds) have piled up
+LOG_TAIL_COMPACT_DELTAS = int(os.getenv("LOG_TAIL_COMPACT_DELTAS", "64"))
+# Loaded states kept per process, so a refresh only reads the deltas appended since
+LOG_TAIL_CACHE_ENTRIES = int(os.getenv("LOG_TAIL_CACHE_ENTRIES", "8"))
+# Leading bytes remembered to tell an appended log from a rotated one
+HEAD_SIZE = 4096
+READ_SIZE = 1024 * 1024
+STATE_VERSION = 3
+POSITION_FIELDS = ("rotations", "device", "inode", "gzip", "offset", "member_skip", "members", "lines", "bytes_ingested")
+
+# State directory -> LogTail loaded by this process (see `LogTail.load`)
+_loaded_tails = {}
+
+
+def _text(raw):
+    return raw.decode("utf-8", errors="surrogateescape")
+
+
+def _raw(text):
+    return text.encode("utf-8", errors="surrogateescape")
+
+
+class LogTail:
+    """
+    Stored aggregates of a growing log and how far it has been read.
+
+    Aggregates:
+        top_ip_totals: (b"DD/Mon/YYYY", prefix) -> IpTotals of strict per-IP bytes.
+        get_counts: prefix -> {b"DD/Mon/YYYY:HH:MM": successful GET count}.
+
+    Position:
+        Plain logs: `offset` is the end of the last complete line read.
+        Gzip logs: `offset` is the compressed start of the gzip member being
+        read and `member_skip` the uncompressed bytes of it already consumed.
+        Completed members (e.g. segments appended with `gzip -c >> log.gz`)
+        are never inflated again; only the member still being written is.
+
+    A log is considered rotated (and its aggregates rebuilt from byte zero)
+    when it shrank below the read position or its leading bytes changed, so
+    both copytruncate and create-style rotation are detected. A new inode
+    with the same leading bytes (an appended copy moved into place) is
+    followed without re-reading. Only newline-terminated lines are counted;
+    a partial last line is picked up once its newline arrives.
+
+    States are saved as a directory per log (like the columnar index):
+    `state.json` for the position and GET counts, `top_ip.npz` for the
+    per-IP byte totals, and `deltas.jsonl` with one line per later refresh
+    (its new position and the aggregates of the lines it read). Saving a
+    refresh costs what it read, not the size of the state; the delta file
+    is folded into a new full state every LOG_TAIL_COMPACT_DELTAS refreshes.
+    Nothing in them is executable on load.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = os.path.abspath(file_path)
+        self.version = STATE_VERSION
+        self.rotations = 0
+        # Saved full state this object was loaded from (see `_snapshot_id`) and the deltas read after it
+        self._snapshot = None
+        self._deltas_read = self._deltas = 0
+        self._reset()
+
+    def _reset(self):
+        self.device = None
+        self.inode = None
+        self.head = b""
+        self.gzip = None
+        self.offset = 0
+        self.member_skip = 0
+        self.carry = b""
+        self.members = 0
+        self.lines = 0
+        self.bytes_ingested = 0
+        self.top_ip_totals = {}
+        self.get_counts = {}
+        # What the next save appends as a delta; a reset state is saved in full instead
+        self._delta_top_ip = {}
+        self._delta_get_counts = {}
+        self._full_save = True
+
+    @staticmethod
+    def state_path(file_path, tail_dir=None):
+        key = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(tail_dir or LOG_TAIL_DIR, key)
+
+    @classmethod
+    def load(cls, file_path, tail_dir=None):
+        """
+        Returns the stored state of a log, or None if there is none (or it is unreadable).
+
+        A state this process already loaded is reused as long as its full
+        state file is unchanged; only the deltas appended since are read.
+        Callers hold the state's file lock (see `get_log_tail`).
+        """
+        directory = cls.state_path(file_path, tail_dir)
+        try:
+            snapshot = _snapshot_id(directory)
+            tail = _loaded_tails.pop(directory, None)
+            if tail is None or tail._snapshot != snapshot:
+                tail = cls._load_full(file_path, directory)
+                if tail is None:
+                    return None
+                tail._snapshot = snapshot
+            tail._read_deltas(directory)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable log tail state {directory}: {e}")
+            return None
+        _loaded_tails[directory] = tail
+        while len(_loaded_tails) > LOG_TAIL_CACHE_ENTRIES:
+            _loaded_tails.pop(next(iter(_loaded_tails)))
+        return tail
+
+    @classmethod
+    def _load_full(cls, file_path, directory):
+        with open(os.path.join(directory, "state.json"), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != STATE_VERSION or state.get("file_path") != os.path.abspath(file_path):
+            return None
+        tail = cls(file_path)
+        tail._set_position(state)
+        tail.get_counts = {
+            _raw(prefix): {_raw(minute): count for minute, count in counts.items()}
+            for prefix, counts in state["get_counts"].items()
+        }
+        with np.load(os.path.join(directory, "top_ip.npz")) as arrays:
+            for i, (date, prefix, other) in enumerate(state["top_ip"]):
+                tail.top_ip_totals[(_raw(date), _raw(prefix))] = IpTotals.from_arrays(
+                    arrays[f"v4_keys_{i}"], arrays[f"v4_sums_{i}"],
+                    arrays[f"v6_keys_{i}"], arrays[f"v6_sums_{i}"],
+                    {_raw(ip): total for ip, total in other.items()}
+                )
+        tail._full_save = False
+        return tail
+
+    def _set_position(self, state):
+        for name in POSITION_FIELDS:
+            setattr(self, name, state[name])
+        self.head = base64.b64decode(state["head"])
+        self.carry = base64.b64decode(state["carry"])
+
+    def _position(self):
+        position = {name: getattr(self, name) for name in POSITION_FIELDS}
+        position["head"] = base64.b64encode(self.head).decode("ascii")
+        position["carry"] = base64.b64encode(self.carry).decode("ascii")
+        return position
+
+    def _read_deltas(self, directory):
+        """
+        Applies the deltas appended after the ones already read. A partial
+        last line (an interrupted save) is ignored and overwritten by the next save.
+        """
+        try:
+            f = open(os.path.join(directory, "deltas.jsonl"), "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self._deltas_read)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                delta = json.loads(line)
+                self._set_position(delta)
+                for prefix, counts in delta["get_counts"].items():
+                    stored = self.get_counts.setdefault(_raw(prefix), {})
+                    for minute, count in counts.items():
+                        minute = _raw(minute)
+                        stored[minute] = stored.get(minute, 0) + count
+                for date, prefix, totals in delta["top_ip"]:
+                    key = (_raw(date), _raw(prefix))
+                    ip_totals = self.top_ip_totals.get(key)
+                    if ip_totals is None:
+                        ip_totals = self.top_ip_totals[key] = IpTotals()
+                    ip_totals.add_totals({_raw(ip): total for ip, total in totals.items()})
+                self._deltas_read += len(line)
+                self._deltas += 1
+
+    def save(self, tail_dir=None):
+        """
+        Saves what changed since the state was loaded: a delta line, or the
+        full state if it is new, was reset by a rotation or is due for compaction.
+        """
+        directory = self.state_path(self.file_path, tail_dir)
+        if (
+            self._full_save
+            or self._deltas >= LOG_TAIL_COMPACT_DELTAS
+            or self._deltas_read > self._snapshot[2]
+        ):
+            self._save_full(directory)
+        else:
+            self._append_delta(directory)
+        self._delta_top_ip, self._delta_get_counts = {}, {}
+        _loaded_tails[directory] = self
+
+    def _append_delta(self, directory):
+        delta = self._position()
+        delta["get_counts"] = {
+            _text(prefix): {_text(minute): count for minute, count in counts.items()}
+            for prefix, counts in self._delta_get_counts.items()
+        }
+        delta["top_ip"] = [
+            [_text(date), _text(prefix), {_text(ip): total for ip, total in totals.items()}]
+            for (date, prefix), totals in self._delta_top_ip.items()
+        ]
+        line = (json.dumps(delta) + "\n").encode("utf-8")
+        with open(os.path.join(directory, "deltas.jsonl"), "ab") as f:
+            # Drops a partial line left by an interrupted save
+            f.truncate(self._deltas_read)
+            f.write(line)
+        self._deltas_read += len(line)
+        self._deltas += 1
+
+    def _save_full(self, directory):
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, mode=0o700, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=parent, prefix=".save-")
+        try:
+            arrays, top_ip = {}, []
+            for i, ((date, prefix), totals) in enumerate(self.top_ip_totals.items()):
+                columns, other = totals.arrays()
+                arrays.update({f"{name}_{i}": column for name, column in columns.items()})
+                top_ip.append([_text(date), _text(prefix), {_text(ip): total for ip, total in other.items()}])
+            np.savez(os.path.join(temp_dir, "top_ip.npz"), **arrays)
+            state = self._position()
+            state.update({
+                "version": self.version,
+                "file_path": self.file_path,
+                "get_counts": {
+                    _text(prefix): {_text(minute): count for minute, count in counts.items()}
+                    for prefix, counts in self.get_counts.items()
+                },
+                "top_ip": top_ip,
+            })
+            with open(os.path.join(temp_dir, "state.json"), "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            if os.path.isdir(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+            os.replace(temp_dir, directory)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        self._snapshot = _snapshot_id(directory)
+        self._full_save = False
+        self._deltas_read = self._deltas = 0
+
+    def refresh(self):
+        """
+        Reads whatever was appended since the last refresh into the aggregates.
+
+        Returns:
+            dict: {"incremental": True, "new_bytes", "rotated", "lines", "bytes_scanned",
+                   "truncated", "elapsed_seconds"}
+        """
+        start = time.perf_counter()
+        with open(self.file_path, "rb") as f:
+            file_stat = os.fstat(f.fileno())
+            head = f.read(HEAD_SIZE)
+            rotated = self.inode is not None and (
+                file_stat.st_size < self.offset or not head.startswith(self.head)
+            )
+            if rotated:
+                logger.info(f"{self.file_path} was rotated (inode {self.inode} -> {file_stat.st_ino}); re-reading it")
+                self._reset()
+                self.rotations += 1
+            elif self.inode is not None and file_stat.st_ino != self.inode:
+                logger.info(f"{self.file_path} was replaced by a copy with the same content; continuing at {self.offset}")
+            self.device, self.inode = file_stat.st_dev, file_stat.st_ino
+            if len(head) > len(self.head):
+                self.head = head
+            if self.gzip is None and head:
+                self.gzip = head[:2] == GZIP_MAGIC
+
+            ingested = self.bytes_ingested
+            if self.gzip:
+                self._read_gzip(f)
+            elif self.gzip is not None:
+                self._read_plain(f)
+
+        return {
+            "incremental": True,
+            "new_bytes": self.bytes_ingested - ingested,
+            "rotated": rotated,
+            "lines": self.lines,
+            "bytes_scanned": self.bytes_ingested,
+            "truncated": False,
+            "elapsed_seconds": time.perf_counter() - start,
+        }
+
+    def _read_plain(self, f):
+        f.seek(self.offset)
+        pending = b""
+        while True:
+            data = f.read(BLOCK_SIZE)
+            if not data:
+                break
+            data = pending + data if pending else data
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                self._ingest(data[:cut])
+                self.offset += cut
+            pending = data[cut:]
+
+    def _read_gzip(self, f):
+        f.seek(self.offset)
+        decompressor = zlib.decompressobj(31)
+        skip, produced = self.member_skip, 0
+        pending = self.carry
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            while chunk:
+                try:
+                    data = decompressor.decompress(chunk)
+                except zlib.error:
+                    if produced == 0 and not chunk.strip(b"\x00"):
+                        self.carry = pending
+                        return  # Zero padding after the last member
+                    raise
+                if produced < skip:
+                    # Already consumed on an earlier refresh
+                    drop = min(len(data), skip - produced)
+                    produced += drop
+                    data = data[drop:]
+                if data:
+                    produced += len(data)
+                    pending += data
+                    cut = pending.rfind(b"\n") + 1
+                    if cut:
+                        self._ingest(pending[:cut])
+                        pending = pending[cut:]
+                self.member_skip = produced
+                if not decompressor.eof:
+                    break
+                # Member complete: the next one starts right after it
+                chunk = decompressor.unused_data
+                self.offset = f.tell() - len(chunk)
+                self.member_skip = skip = produced = 0
+                self.members += 1
+                decompressor = zlib.decompressobj(31)
+        self.carry = pending
+
+    def _ingest(self, block):
+        """
+        Folds a block of complete lines into the aggregates (and into the next delta).
+        """
+        by_key, gets = {}, {}
+        for ip, timestamp, method, path, status, size in LOG_LINE_RE.findall(block):
+            prefix = _path_prefix(path)
+            if size != b"-":
+                key = (timestamp[:11], prefix)
+                totals = by_key.get(key)
+                if totals is None:
+                    totals = by_key[key] = {}
+                totals[ip] = totals.get(ip, 0) + int(size)
+            if method == b"GET" and status[:1] == b"2":
+                key = (prefix, timestamp[:17])
+                gets[key] = gets.get(key, 0) + 1
+
+        # A state saved in full next needs no delta
+        targets = (self.get_counts,) if self._full_save else (self.get_counts, self._delta_get_counts)
+        for (prefix, minute_key), count in gets.items():
+            for get_counts in targets:
+                counts = get_counts.get(prefix)
+                if counts is None:
+                    counts = get_counts[prefix] = {}
+                counts[minute_key] = counts.get(minute_key, 0) + count
+        for key, totals in by_key.items():
+            ip_totals = self.top_ip_totals.get(key)
+            if ip_totals is None:
+                ip_totals = self.top_ip_totals[key] = IpTotals()
+            ip_totals.add_totals(totals)
+            if not self._full_save:
+                delta = self._delta_top_ip.setdefault(key, {})
+                for ip, total in totals.items():
+                    delta[ip] = delta.get(ip, 0) + total
+        self.lines += block.count(b"\n")
+        self.bytes_ingested += len(block)
+
+    def top_ip(self, language, date):
+        """
+        Strict top IP by bytes for requests under /<language>/ on `date` (DD/Mon/YYYY).
+
+        Returns:
+            dict: {"top_ip", "total_bytes", "matching_ips"} or None if nothing matched.
+        """
+        totals = self.top_ip_totals.get((date.encode(), language.encode()))
+        return TopIpQuery(language, date).result(totals) if totals is not None else None
+
+    def get_count(self, language, weekday, start_minute, end_minute):
+        """
+        Successful GET requests under /<language>/ on `weekday` in [start_minute, end_minute).
+
+        Returns:
+            dict: {"count": int, "matching_dates": int}
+        """
+        counts = self.get_counts.get(language.encode(), {})
+        return GetCountQuery(language, weekday, start_minute, end_minute).result(counts)
+
+
+def _snapshot_id(directory):
+    """
+    Identifies the full state file of a state directory: (inode, mtime in ns, bytes of the full state).
+    """
+    state_stat = os.stat(os.path.join(directory, "state.json"))
+    size = state_stat.st_size + os.path.getsize(os.path.join(directory, "top_ip.npz"))
+    return state_stat.st_ino, state_stat.st_mtime_ns, size
+
+
+def get_log_tail(file_path, tail_dir=None):
+    """
+    Returns the stored aggregates of a log, brought up to date with what was appended to it.
+
+    A file lock next to the state directory serializes refreshes of the
+    same log across threads and handler processes.
+
+    Args:
+        file_path (str): Path to the log (plain or gzip).
+        tail_dir (str, optional): Directory holding the states. Defaults to LOG_TAIL_DIR.
+
+    Returns:
+        tuple: (LogTail, refresh stats dict)
+    """
+    directory = LogTail.state_path(file_path, tail_dir)
+    os.makedirs(os.path.dirname(directory), mode=0o700, exist_ok=True)
+    with open(directory + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        tail = LogTail.load(file_path, tail_dir) or LogTail(file_path)
+        position = (tail.inode, tail.offset, tail.member_skip)
+        try:
+            stats = tail.refresh()
+            if stats["rotated"] or (tail.inode, tail.offset, tail.member_skip) != position:
+                tail.save(tail_dir)
+        except Exception:
+            # The in-memory state may be ahead of what was saved
+            _loaded_tails.pop(directory, None)
+            raise
+    if stats["new_bytes"]:
+        logger.info(
+            f"Ingested {stats['new_bytes']} new bytes of {file_path} in {stats['elapsed_seconds']:.2f} s "
+            f"({tail.lines} lines in total)"
+        )
+    return tail, stats
+
+
+def tail_top_ip(file_path, language, date, workers=None, chunk_size=None):
+    """
+    `find_top_ip` answered from the log's stored incremental aggregates.
+
+    Strict matches come from the aggregates; the relaxed fallbacks still stream the log.
+
+    Returns:
+        tuple: (result dict with `match_level`, or None; stats dict)
+    """
+    tail, stats = get_log_tail(file_path)
+    result = tail.top_ip(language, date)
+    if result:
+        result["match_level"] = "strict"
+        return result, stats
+    result, fallback_stats = find_top_ip_fallback(file_path, language, date, workers=workers, chunk_size=chunk_size)
+    stats["elapsed_seconds"] += fallback_stats["elapsed_seconds"]
+    return result, stats
+
+
+def tail_get_count(file_path, language, weekday, start_minute, end_minute):
+    """
+    `count_get_requests` answered from the log's stored incremental aggregates.
+
+    Returns:
+        tuple: (result dict, stats dict)
+    """
+    tail, stats = get_log_tail(file_path)
+    return tail.get_count(language, weekday, start_minute, end_minute), stats
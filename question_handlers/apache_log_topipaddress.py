@@ -1,19 +1,24 @@
-import subprocess
 import re
 from datetime import datetime, timedelta
-import gzip
 import tempfile
 import os
 import logging
 import sys
-import shutil
 import random
-import ipaddress
+import zlib
+from question_handlers.apache_log_engine import find_top_ip_fallback, find_top_ip_heavy_hitters, read_head_lines
+from question_handlers.apache_log_index import indexed_top_ip
+from question_handlers.apache_log_tail import LOG_TAIL_ENABLED, tail_top_ip
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "exact" (default), "heavy_hitters" (bounded-memory estimate) or
+# "heavy_hitters_verified" (estimate, then an exact pass over the candidate IPs)
+TOP_IP_MODE = os.getenv("TOP_IP_MODE", "exact")
+TOP_IP_HEAVY_HITTERS_CAPACITY = int(os.getenv("TOP_IP_HEAVY_HITTERS_CAPACITY", "1024"))
+
 def extract_language_and_date(question):
     """
     Extracts the language and date from the question.
@@ -58,266 +63,6 @@ def extract_language_and_date(question):
     
     return language, formatted_date
 
-def validate_gzip_file(file_path, skip_validation=False):
-    """
-    Validates that a file exists and is likely a gzip file.
-    
-    Args:
-        file_path (str): Path to the file to validate
-        skip_validation (bool): If True, skip validation if file exists
-        
-    Returns:
-        dict: Validation results with status and details
-    """
-    result = {
-        "valid": False,
-        "exists": False,
-        "has_content": False,
-        "is_gzip": False,
-        "details": "",
-        "file_size": 0
-    }
-    
-    # Check if file exists
-    if not os.path.exists(file_path):
-        result["details"] = f"File does not exist: {file_path}"
-        logger.error(result["details"])
-        return result
-    
-    result["exists"] = True
-    
-    # Check if file has content
-    file_size = os.path.getsize(file_path)
-    result["file_size"] = file_size
-    
-    if file_size == 0:
-        result["details"] = f"File is empty: {file_path}"
-        logger.error(result["details"])
-        return result
-    
-    result["has_content"] = True
-    
-    # If we're skipping validation and file exists with content, return valid
-    if skip_validation:
-        result["valid"] = True
-        result["is_gzip"] = True  # Assume it's gzip
-        result["details"] = "Skipped detailed validation"
-        return result
-    
-    # Check first few bytes for gzip magic number
-    try:
-        with open(file_path, 'rb') as f:
-            magic = f.read(2)
-            # gzip files start with magic bytes 0x1f\x8b
-            if magic == b'\x1f\x8b':
-                result["is_gzip"] = True
-                result["valid"] = True
-                result["details"] = "Valid gzip file"
-            else:
-                result["details"] = f"File does not have gzip magic bytes: {file_path} (found {magic.hex()})"
-                logger.warning(result["details"])
-                # We'll still try to process it, but with a warning
-                result["valid"] = True  # Consider it valid anyway to try processing
-    except Exception as e:
-        result["details"] = f"Error checking file: {e}"
-        logger.error(result["details"])
-        
-    return result
-
-def copy_to_temp_with_extension(file_path, extension='.gz'):
-    """
-    Makes a copy of the file to a temporary location with the correct extension.
-    Useful for files that might be passed without proper extensions.
-    
-    Args:
-        file_path (str): Original file path
-        extension (str): Desired extension for the copy
-        
-    Returns:
-        str: Path to the temporary copy
-    """
-    # Create a temporary file with the correct extension
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=extension)
-    temp_path = temp_file.name
-    temp_file.close()
-    
-    # Copy the content
-    try:
-        shutil.copy2(file_path, temp_path)
-        logger.info(f"Copied file to temporary location with extension {extension}: {temp_path}")
-        return temp_path
-    except Exception as e:
-        logger.error(f"Failed to copy file: {e}")
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-        return None
-
-def try_to_extract_file_with_multiple_methods(file_path):
-    """
-    Attempts multiple methods to extract content from a file.
-    
-    Args:
-        file_path (str): Path to the file to extract
-        
-    Returns:
-        tuple: (Path to extracted content or None, error message or None)
-    """
-    # First, create a copy with .gz extension if it doesn't already have one
-    original_path = file_path
-    temp_copies = []
-    
-    if not file_path.endswith('.gz'):
-        file_path = copy_to_temp_with_extension(file_path, '.gz')
-        if file_path:
-            temp_copies.append(file_path)
-    
-    # Create a temporary file to store the unzipped content
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.log')
-    output_path = temp_file.name
-    temp_file.close()
-    
-    methods_tried = []
-    
-    # Method 1: Try using gunzip command
-    try:
-        command = f"gunzip -c '{file_path}' > '{output_path}'"
-        logger.info(f"Method 1: Decompressing with gunzip command: {command}")
-        
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        
-        if result.returncode == 0 and os.path.getsize(output_path) > 0:
-            logger.info("Method 1 successful: gunzip command worked")
-            return output_path, None
-        
-        methods_tried.append(f"gunzip command failed: {result.stderr}")
-    except Exception as e:
-        methods_tried.append(f"gunzip command exception: {str(e)}")
-    
-    # Method 2: Try using Python's gzip module
-    try:
-        logger.info(f"Method 2: Decompressing with Python's gzip module")
-        with gzip.open(file_path, 'rb') as gz_file:
-            with open(output_path, 'wb') as out_file:
-                out_file.write(gz_file.read())
-        
-        if os.path.getsize(output_path) > 0:
-            logger.info("Method 2 successful: Python's gzip module worked")
-            return output_path, None
-        
-        methods_tried.append("Python gzip module produced empty file")
-    except Exception as e:
-        methods_tried.append(f"Python gzip module exception: {str(e)}")
-    
-    # Method 3: Try using cat/zcat command directly
-    try:
-        command = f"zcat '{file_path}' > '{output_path}' 2>/dev/null || cat '{file_path}' > '{output_path}'"
-        logger.info(f"Method 3: Trying zcat or cat command: {command}")
-        
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        
-        if os.path.getsize(output_path) > 0:
-            logger.info("Method 3 successful: zcat/cat command worked")
-            return output_path, None
-        
-        methods_tried.append(f"zcat/cat command failed or produced empty file")
-    except Exception as e:
-        methods_tried.append(f"zcat/cat command exception: {str(e)}")
-    
-    # Method 4: Try direct file copy as a last resort
-    try:
-        logger.info(f"Method 4: Trying direct file copy as last resort")
-        shutil.copy2(original_path, output_path)
-        
-        if os.path.getsize(output_path) > 0:
-            logger.info("Method 4 successful: direct file copy worked")
-            return output_path, None
-        
-        methods_tried.append("Direct file copy produced empty file")
-    except Exception as e:
-        methods_tried.append(f"Direct file copy exception: {str(e)}")
-    
-    # Clean up temporary files
-    if os.path.exists(output_path):
-        os.unlink(output_path)
-    
-    for temp_path in temp_copies:
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-    
-    return None, f"All extraction methods failed: {'; '.join(methods_tried)}"
-
-def decompress_gzip_file(gzip_file_path):
-    """
-    Decompresses a .gz file to a temporary file and returns the path.
-    
-    Args:
-        gzip_file_path (str): Path to the gzipped file
-        
-    Returns:
-        tuple: (Path to decompressed file or None, error message or None)
-    """
-    # Validate the file
-    validation = validate_gzip_file(gzip_file_path)
-    
-    # Log detailed diagnostics about the file
-    logger.info(f"File validation results: {validation}")
-    
-    if not validation["exists"]:
-        # File doesn't exist, return error
-        return None, f"File does not exist: {gzip_file_path}"
-    
-    if validation["exists"] and not validation["has_content"]:
-        # File exists but is empty
-        return None, f"File is empty: {gzip_file_path}"
-    
-    # Try multiple extraction methods
-    return try_to_extract_file_with_multiple_methods(gzip_file_path)
-
-def examine_file_content(file_path, lines=10):
-    """
-    Examines the content of a file to help diagnose issues.
-    
-    Args:
-        file_path (str): Path to the file
-        lines (int): Number of lines to examine
-        
-    Returns:
-        dict: Information about the file content
-    """
-    result = {
-        "exists": os.path.exists(file_path),
-        "size": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
-        "sample_lines": [],
-        "appears_to_be_apache_log": False,
-        "details": ""
-    }
-    
-    if not result["exists"] or result["size"] == 0:
-        result["details"] = "File doesn't exist or is empty"
-        return result
-    
-    try:
-        # Get first few lines
-        command = f"head -n {lines} '{file_path}'"
-        process = subprocess.run(command, shell=True, capture_output=True, text=True)
-        
-        if process.returncode == 0:
-            result["sample_lines"] = process.stdout.strip().split('\n')
-            
-            # Check if it looks like an Apache log (contains IPs and HTTP request info)
-            for line in result["sample_lines"]:
-                if re.search(r'\d+\.\d+\.\d+\.\d+', line) and re.search(r'(GET|POST|HEAD) /\S+ HTTP', line):
-                    result["appears_to_be_apache_log"] = True
-                    break
-            
-            result["details"] = "Successfully examined file content"
-        else:
-            result["details"] = f"Failed to read file: {process.stderr}"
-    except Exception as e:
-        result["details"] = f"Error examining file: {str(e)}"
-    
-    return result
-
 def generate_sample_apache_logs(language, date_str, output_path, num_entries=1000, top_ip=None):
     """
     Generates sample Apache log entries that match the specified language and date.
@@ -531,324 +276,158 @@ def generate_sample_apache_logs(language, date_str, output_path, num_entries=100
         logger.exception(f"Error writing sample logs: {e}")
         return False, {"error": f"Failed to write sample logs: {str(e)}"}
 
-def process_apache_logs(file_path, question, use_sample_if_empty=True):
+def generate_sample_response(language, formatted_date):
+    """
+    Generates sample logs for the language and date and returns their top IP.
+    Used when the real log is missing, empty or unreadable.
+
+    Args:
+        language (str): Language path (e.g., 'telugu')
+        formatted_date (str): Date in DD/Mon/YYYY format
+
+    Returns:
+        dict: {top_ip: str, total_bytes: int, note: str, cacheable: False, ...} or error message.
+    """
+    sample_file = tempfile.NamedTemporaryFile(delete=False, suffix='.log')
+    sample_path = sample_file.name
+    sample_file.close()
+
+    try:
+        success, sample_data_info = generate_sample_apache_logs(
+            language,
+            formatted_date,
+            sample_path,
+            num_entries=1000
+        )
+
+        if not success:
+            logger.error(f"Failed to generate sample data: {sample_data_info}")
+            return {
+                "error": "Failed to generate sample data",
+                "details": sample_data_info
+            }
+
+        logger.info(f"Successfully generated sample data at {sample_path}")
+        return {
+            "top_ip": sample_data_info["top_ip"],
+            "total_bytes": sample_data_info["top_ip_bytes"],
+            "note": "Using generated sample data. This is not based on real logs.",
+            "cacheable": False,
+            "sample_data_info": {
+                "num_entries": sample_data_info.get("num_entries"),
+                "language": sample_data_info.get("language"),
+                "date": sample_data_info.get("date")
+            }
+        }
+    finally:
+        if os.path.exists(sample_path):
+            os.unlink(sample_path)
+
+def find_top_ip_for_mode(file_path, language, formatted_date, mode, incremental=False):
+    """
+    Runs the top-IP search in the given mode (see TOP_IP_MODE).
+    In incremental mode the exact answer comes from the log's stored aggregates (see apache_log_tail).
+
+    Returns:
+        tuple: (result dict or None, scan stats dict)
     """
-    Processes Apache logs using Bash commands to find the top IP by total downloaded bytes.
-    Handles gzipped files by decompressing them first.
+    if incremental:
+        return tail_top_ip(file_path, language, formatted_date)
+    if mode == "exact":
+        return indexed_top_ip(file_path, language, formatted_date)
+    if mode not in ("heavy_hitters", "heavy_hitters_verified"):
+        raise ValueError(f"Unknown top-IP mode: {mode}")
+
+    result, scan_stats = find_top_ip_heavy_hitters(
+        file_path, language, formatted_date,
+        capacity=TOP_IP_HEAVY_HITTERS_CAPACITY,
+        verify=mode == "heavy_hitters_verified"
+    )
+    if result is None:
+        result, fallback_stats = find_top_ip_fallback(file_path, language, formatted_date)
+        scan_stats["elapsed_seconds"] += fallback_stats["elapsed_seconds"]
+    return result, scan_stats
+
+def process_apache_logs(file_path, question, use_sample_if_empty=True, mode=None, incremental=None):
+    """
+    Finds the top IP by total downloaded bytes for the language and date in the question.
+    The first question about a log is streamed and schedules a background build
+    of its columnar index (see apache_log_index); later questions about the
+    same content are answered from the index.
 
     Args:
         file_path (str): Path to the Apache log file (can be .gz)
         question (str): The question containing language and date.
-        use_sample_if_empty (bool): Whether to generate sample data if the file is empty
+        use_sample_if_empty (bool): Whether to generate sample data if the file is missing, empty or unreadable
+        mode (str, optional): "exact", "heavy_hitters" or "heavy_hitters_verified". Defaults to TOP_IP_MODE.
+        incremental (bool, optional): Only parse what was appended since the last question about
+            this path (for live logs read in place; uploads get a new path each time). Defaults to LOG_TAIL_ENABLED.
 
     Returns:
         dict: {top_ip: str, total_bytes: int} or error message.
     """
-    temp_file_path = None
-    additional_temp_files = []
-    sample_data_used = False
-    sample_data_info = None
-    
     try:
         # Extract language and date from the question
         language, formatted_date = extract_language_and_date(question)
         logger.info(f"Extracted language: {language}, date: {formatted_date}")
-        
-        # Log details about the input file
-        if os.path.exists(file_path):
-            file_size = os.path.getsize(file_path)
-            logger.info(f"Input file exists: {file_path}, size: {file_size} bytes")
-            
-            # If file exists but has zero size, use sample data if enabled
-            if file_size == 0 and use_sample_if_empty:
-                logger.warning(f"Input file is empty: {file_path}, generating sample data")
-                
-                # Create a temporary file for the sample data
-                sample_file = tempfile.NamedTemporaryFile(delete=False, suffix='.log')
-                sample_path = sample_file.name
-                sample_file.close()
-                additional_temp_files.append(sample_path)
-                
-                # Generate sample data
-                success, sample_data_info = generate_sample_apache_logs(
-                    language, 
-                    formatted_date, 
-                    sample_path,
-                    num_entries=1000
-                )
-                
-                if success:
-                    logger.info(f"Successfully generated sample data at {sample_path}")
-                    processing_file_path = sample_path
-                    sample_data_used = True
-                else:
-                    logger.error(f"Failed to generate sample data: {sample_data_info}")
-                    return {
-                        "error": "Input file is empty and failed to generate sample data",
-                        "details": sample_data_info
-                    }
-            else:
-                # Try the existing file decompression path
-                try:
-                    file_cmd = f"file '{file_path}'"
-                    file_result = subprocess.run(file_cmd, shell=True, capture_output=True, text=True)
-                    logger.info(f"File command result: {file_result.stdout}")
-                except Exception as e:
-                    logger.error(f"Failed to get file details: {e}")
-        else:
-            logger.error(f"Input file does not exist: {file_path}")
-            if use_sample_if_empty:
-                logger.warning("Input file does not exist, generating sample data")
-                
-                # Create a temporary file for the sample data
-                sample_file = tempfile.NamedTemporaryFile(delete=False, suffix='.log')
-                sample_path = sample_file.name
-                sample_file.close()
-                additional_temp_files.append(sample_path)
-                
-                # Generate sample data
-                success, sample_data_info = generate_sample_apache_logs(
-                    language, 
-                    formatted_date, 
-                    sample_path,
-                    num_entries=1000
-                )
-                
-                if success:
-                    logger.info(f"Successfully generated sample data at {sample_path}")
-                    processing_file_path = sample_path
-                    sample_data_used = True
-                else:
-                    logger.error(f"Failed to generate sample data: {sample_data_info}")
-                    return {
-                        "error": "Input file does not exist and failed to generate sample data",
-                        "details": sample_data_info
-                    }
-            else:
-                return {"error": f"Input file does not exist: {file_path}"}
-        
-        # Skip the decompression step if we're already using sample data
-        if not sample_data_used:
-            # Check if the file is gzipped and decompress if needed
-            if file_path.endswith('.gz'):
-                temp_file_path, error = decompress_gzip_file(file_path)
-                
-                if error:
-                    # If decompression failed and we're allowed to use sample data
-                    if use_sample_if_empty:
-                        logger.warning(f"Decompression failed: {error}, generating sample data")
-                        
-                        # Create a temporary file for the sample data
-                        sample_file = tempfile.NamedTemporaryFile(delete=False, suffix='.log')
-                        sample_path = sample_file.name
-                        sample_file.close()
-                        additional_temp_files.append(sample_path)
-                        
-                        # Generate sample data
-                        success, sample_data_info = generate_sample_apache_logs(
-                            language, 
-                            formatted_date, 
-                            sample_path,
-                            num_entries=1000
-                        )
-                        
-                        if success:
-                            logger.info(f"Successfully generated sample data at {sample_path}")
-                            processing_file_path = sample_path
-                            sample_data_used = True
-                        else:
-                            logger.error(f"Failed to generate sample data: {sample_data_info}")
-                            return {
-                                "error": "Failed to decompress file and failed to generate sample data",
-                                "decompression_error": error,
-                                "sample_data_error": sample_data_info
-                            }
-                    else:
-                        # Before returning an error, try one more approach with the file directly
-                        logger.warning(f"Decompression failed: {error}, trying to work with the file directly")
-                        
-                        # Try to copy the file and work with the copy
-                        temp_copy = copy_to_temp_with_extension(file_path, '.log')
-                        if temp_copy:
-                            additional_temp_files.append(temp_copy)
-                            
-                            # Check if the copy has content
-                            if os.path.getsize(temp_copy) > 0:
-                                logger.info(f"Created a temp copy to work with: {temp_copy}")
-                                
-                                # Examine the file to see if it looks like an Apache log
-                                file_content_info = examine_file_content(temp_copy)
-                                
-                                if file_content_info["appears_to_be_apache_log"]:
-                                    logger.info("File appears to be an uncompressed Apache log despite .gz extension")
-                                    processing_file_path = temp_copy
-                                else:
-                                    logger.warning("File doesn't appear to be an Apache log")
-                                    return {
-                                        "error": "The file doesn't appear to be a valid Apache log file",
-                                        "file_info": file_content_info,
-                                        "decompression_error": error
-                                    }
-                            else:
-                                return {
-                                    "error": "Failed to process the file: the copy is empty",
-                                    "original_error": error,
-                                    "file_details": {
-                                        "path": file_path,
-                                        "exists": os.path.exists(file_path),
-                                        "size": os.path.getsize(file_path) if os.path.exists(file_path) else 0
-                                    }
-                                }
-                        else:
-                            return {
-                                "error": "Failed to decompress the file and couldn't create a copy to work with",
-                                "decompression_error": error
-                            }
-                else:
-                    if not temp_file_path:
-                        return {"error": "Failed to extract content from the file (no error details available)"}
-                    processing_file_path = temp_file_path
-            else:
-                processing_file_path = file_path
-
-        # If we're using sample data and have the info, we can return it directly without processing
-        if sample_data_used and sample_data_info and "top_ip" in sample_data_info and "top_ip_bytes" in sample_data_info:
-            return {
-                "top_ip": sample_data_info["top_ip"],
-                "total_bytes": sample_data_info["top_ip_bytes"],
-                "note": "Using generated sample data. This is not based on real logs.",
-                "sample_data_info": {
-                    "num_entries": sample_data_info.get("num_entries"),
-                    "language": sample_data_info.get("language"),
-                    "date": sample_data_info.get("date")
-                }
-            }
-
-        # Verify the file exists and has content before proceeding
-        if not os.path.exists(processing_file_path):
-            return {"error": f"Processing file does not exist: {processing_file_path}"}
-        
-        if os.path.getsize(processing_file_path) == 0:
-            return {"error": f"Processing file is empty: {processing_file_path}"}
-        
-        # Examine the file content for debugging
-        file_content_info = examine_file_content(processing_file_path)
-        logger.info(f"File content examination: {file_content_info}")
-        
-        if not file_content_info["appears_to_be_apache_log"]:
-            logger.warning("The file doesn't appear to be an Apache log, but proceeding anyway")
-        
-        # Bash command to process logs
-        command = f"""
-        grep '/{language}/' {processing_file_path} | grep '{formatted_date}' | \
-        awk '{{sum[$1] += $10}} END {{for (ip in sum) print ip, sum[ip]}}' | \
-        sort -k2 -nr | head -1
-        """
 
-        # Print command for debugging
-        logger.info(f"Running command:\n{command}")
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            reason = f"Input file does not exist: {file_path}" if not os.path.exists(file_path) else f"Input file is empty: {file_path}"
+            logger.error(reason)
+            if use_sample_if_empty:
+                logger.warning(f"{reason}, generating sample data")
+                return generate_sample_response(language, formatted_date)
+            return {"error": reason}
 
-        # Execute the Bash command
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        logger.info(f"Input file exists: {file_path}, size: {os.path.getsize(file_path)} bytes")
 
-        # Check for errors
-        if result.returncode != 0:
-            return {"error": f"Command failed: {result.stderr}"}
+        try:
+            result, scan_stats = find_top_ip_for_mode(
+                file_path, language, formatted_date, mode or TOP_IP_MODE,
+                incremental=LOG_TAIL_ENABLED if incremental is None else incremental
+            )
+        except (OSError, EOFError, zlib.error) as e:
+            if use_sample_if_empty:
+                logger.warning(f"Failed to read the log file: {e}, generating sample data")
+                return generate_sample_response(language, formatted_date)
+            return {"error": f"Failed to read the log file: {e}"}
 
-        # Parse output
-        output = result.stdout.strip()
-        if output:
-            parts = output.split()
-            if len(parts) >= 2:
-                top_ip, total_bytes = parts[0], parts[1]
-                response = {
-                    "top_ip": top_ip, 
-                    "total_bytes": int(total_bytes)
-                }
-                if sample_data_used:
-                    response["note"] = "Using generated sample data. This is not based on real logs."
-                return response
-            else:
-                return {"error": f"Unexpected output format: {output}"}
-        else:
-            # Try a more flexible search if no results were found
-            alt_command = f"""
-            grep -i '/{language}' {processing_file_path} | grep -i '{formatted_date}' | \
-            awk '{{sum[$1] += $10}} END {{for (ip in sum) print ip, sum[ip]}}' | \
-            sort -k2 -nr | head -1
-            """
-            
-            logger.info(f"No results with strict search. Trying flexible search:\n{alt_command}")
-            
-            alt_result = subprocess.run(alt_command, shell=True, capture_output=True, text=True)
-            alt_output = alt_result.stdout.strip()
-            
-            if alt_output:
-                parts = alt_output.split()
-                if len(parts) >= 2:
-                    top_ip, total_bytes = parts[0], parts[1]
-                    response = {
-                        "top_ip": top_ip, 
-                        "total_bytes": int(total_bytes),
-                        "note": "Used relaxed pattern matching."
-                    }
-                    if sample_data_used:
-                        response["note"] += " Using generated sample data. This is not based on real logs."
-                    return response
-            
-            # Try one more approach - even more relaxed
-            ultra_flex_command = f"""
-            grep -i '{language}' {processing_file_path} | \
-            awk '{{sum[$1] += $10}} END {{for (ip in sum) print ip, sum[ip]}}' | \
-            sort -k2 -nr | head -1
-            """
-            
-            logger.info(f"Still no results. Trying ultra-flexible search:\n{ultra_flex_command}")
-            
-            ultra_result = subprocess.run(ultra_flex_command, shell=True, capture_output=True, text=True)
-            ultra_output = ultra_result.stdout.strip()
-            
-            if ultra_output:
-                parts = ultra_output.split()
-                if len(parts) >= 2:
-                    top_ip, total_bytes = parts[0], parts[1]
-                    response = {
-                        "top_ip": top_ip, 
-                        "total_bytes": int(total_bytes),
-                        "note": "Used ultra-relaxed pattern matching (ignored date). Results may not match exact criteria."
-                    }
-                    if sample_data_used:
-                        response["note"] += " Using generated sample data. This is not based on real logs."
-                    return response
-            
-            # Still nothing? Show a sample of the file
-            sample_command = f"head -n 5 {processing_file_path}"
-            sample_result = subprocess.run(sample_command, shell=True, capture_output=True, text=True)
-            sample_output = sample_result.stdout.strip()
-            
-            return {
-                "error": "No matching entries found in the log file.",
-                "file_info": file_content_info,
-                "search_criteria": {
-                    "language": language,
-                    "date": formatted_date
-                },
-                "sample_content": sample_output,
-                "sample_data_used": sample_data_used
+        if result:
+            response = {
+                "top_ip": result["top_ip"],
+                "total_bytes": result["total_bytes"]
             }
+            notes = []
+            if "error_bound" in result:
+                response["error_bound"] = result["error_bound"]
+                if not result["exact"]:
+                    notes.append(
+                        f"Approximate (heavy hitters): the true total is between {result['total_bytes']} "
+                        f"and {result['total_bytes'] + result['error_bound']} bytes."
+                    )
+            if result["match_level"] == "relaxed":
+                notes.append("Used relaxed pattern matching.")
+            elif result["match_level"] == "language_only":
+                notes.append("Used ultra-relaxed pattern matching (ignored date). Results may not match exact criteria.")
+            if scan_stats["truncated"]:
+                notes.append("The compressed log was truncated; only the readable part was used.")
+            if notes:
+                response["note"] = " ".join(notes)
+            return response
+
+        return {
+            "error": "No matching entries found in the log file.",
+            "search_criteria": {
+                "language": language,
+                "date": formatted_date
+            },
+            "sample_content": "\n".join(read_head_lines(file_path)),
+            "scan_stats": scan_stats
+        }
 
     except Exception as e:
         logger.exception(f"Error processing Apache logs: {e}")
         return {"error": str(e)}
-    finally:
-        # Clean up the temporary files
-        for temp_path in [temp_file_path] + additional_temp_files:
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.unlink(temp_path)
-                    logger.info(f"Cleaned up temporary file: {temp_path}")
-                except Exception as cleanup_err:
-                    logger.warning(f"Failed to clean up temporary file: {cleanup_err}")
 
 # Example usage (for testing)
 if __name__ == "__main__":
@@ -1,13 +1,422 @@
 import re
 import pandas as pd
+import numpy as np
+import json
 import logging
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import os
 
+from openpyxl import load_workbook
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from services.canonicalizer import get_canonicalizer
+from services.upload_store import file_sha256
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REQUIRED_COLUMNS = {"Product", "Location", "Date", "Margin"}
+PROJECTED_COLUMNS = ("Product", "Location", "Date", "Margin")
+# How workbooks are read: "stream" (read-only openpyxl, only the needed columns),
+# "filter" (stream and apply the query to each chunk, keeping nothing) or "pandas" (pd.read_excel)
+MARGIN_XLSX_READER = os.getenv("MARGIN_XLSX_READER", "stream")
+MARGIN_STREAM_CHUNK_ROWS = int(os.getenv("MARGIN_STREAM_CHUNK_ROWS", "50000"))
+# Prepared workbooks kept in memory per worker process
+MARGIN_TABLE_CACHE_SIZE = int(os.getenv("MARGIN_TABLE_CACHE_SIZE", "4"))
+# Parsed workbooks are also saved as memory-mapped column snapshots, keyed by content hash
+MARGIN_SNAPSHOT_DIR = os.getenv("MARGIN_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "tds_solver_margin_snapshots"))
+MARGIN_SNAPSHOT_ENABLED = os.getenv("MARGIN_SNAPSHOT_ENABLED", "1") not in ("0", "false", "no")
+# Oldest snapshots beyond this count are deleted after each build
+MARGIN_SNAPSHOT_MAX_ENTRIES = int(os.getenv("MARGIN_SNAPSHOT_MAX_ENTRIES", "32"))
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COLUMNS = ("location_codes", "product_codes", "epochs", "margins")
+LOCATION_MATCH_THRESHOLD = 80
+NAT_EPOCH = np.iinfo(np.int64).min
+
+
+class MarginTable:
+    """
+    Transactions of a workbook prepared for repeated margin queries.
+
+    Location and Product are stored as categorical codes, so fuzzy location
+    matching and product matching run once per distinct value and are
+    mapped back to rows by indexing with the codes. Dates are parsed once
+    into int64 epoch seconds. A query is then a few vectorized masks.
+
+    Dates that carry a UTC offset are stored as UTC epochs and compared with
+    the limit as instants; dates without one are stored as wall-clock epochs
+    and compared with the limit's wall-clock time.
+    """
+
+    def __init__(self, location_codes, locations, product_codes, products, epochs, dates_are_utc, margins):
+        self.location_codes = location_codes
+        self.locations = locations
+        self.product_codes = product_codes
+        self.products = products
+        self.epochs = epochs
+        self.dates_are_utc = dates_are_utc
+        self.margins = margins
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Prepares a DataFrame with Product, Location, Date and Margin columns.
+        """
+        locations = pd.Categorical(df["Location"].astype("string").str.lower())
+        products = pd.Categorical(df["Product"].astype("string"))
+        epochs, dates_are_utc = _epoch_seconds(df["Date"])
+        return cls(
+            location_codes=np.asarray(locations.codes),
+            locations=[str(value) for value in locations.categories],
+            product_codes=np.asarray(products.codes),
+            products=[str(value) for value in products.categories],
+            epochs=epochs,
+            dates_are_utc=dates_are_utc,
+            margins=pd.to_numeric(df["Margin"], errors="coerce").to_numpy(dtype=np.float64),
+        )
+
+    @classmethod
+    def from_frames(cls, frames):
+        """
+        Prepares a table chunk by chunk, re-coding each chunk's categories into shared ones.
+
+        Raises:
+            MixedDateModesError: If some chunks have UTC offsets in their dates and others not.
+        """
+        locations, products = {}, {}
+        parts = {name: [] for name in SNAPSHOT_COLUMNS}
+        dates_are_utc = None
+        for df in frames:
+            chunk = cls.from_frame(df)
+            if dates_are_utc is None:
+                dates_are_utc = chunk.dates_are_utc
+            elif chunk.dates_are_utc != dates_are_utc:
+                raise MixedDateModesError("Date column mixes values with and without UTC offsets")
+            parts["location_codes"].append(_recode(chunk.location_codes, chunk.locations, locations))
+            parts["product_codes"].append(_recode(chunk.product_codes, chunk.products, products))
+            parts["epochs"].append(chunk.epochs)
+            parts["margins"].append(chunk.margins)
+        dtypes = {"location_codes": np.int32, "product_codes": np.int32, "epochs": np.int64, "margins": np.float64}
+        columns = {
+            name: np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtypes[name])
+            for name, arrays in parts.items()
+        }
+        return cls(
+            locations=list(locations),
+            products=list(products),
+            dates_are_utc=bool(dates_are_utc),
+            **columns,
+        )
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Opens a snapshot directory, memory-mapping every column.
+        """
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported margin snapshot version: {meta.get('version')}")
+        columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in SNAPSHOT_COLUMNS}
+        return cls(
+            locations=meta["locations"],
+            products=meta["products"],
+            dates_are_utc=meta["dates_are_utc"],
+            **columns,
+        )
+
+    def save(self, directory):
+        """
+        Writes the table as one .npy per column plus meta.json; `directory` is replaced atomically.
+        """
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=parent, prefix=".build-")
+        try:
+            for name in SNAPSHOT_COLUMNS:
+                np.save(os.path.join(temp_dir, f"{name}.npy"), getattr(self, name))
+            meta = {
+                "version": SNAPSHOT_VERSION,
+                "rows": len(self.margins),
+                "locations": self.locations,
+                "products": self.products,
+                "dates_are_utc": self.dates_are_utc,
+            }
+            with open(os.path.join(temp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            if os.path.isdir(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+            os.replace(temp_dir, directory)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+    def _category_mask(self, codes, matches):
+        # Code -1 (missing value) never matches
+        return np.append(matches, False)[codes]
+
+    def location_mask(self, location, threshold=LOCATION_MATCH_THRESHOLD):
+        """
+        Rows whose location names the same country as `location`.
+
+        Locations are resolved through the shared country canonicalizer, so
+        "U.S.A", "America" and "Untied States" all select "US". Locations it
+        cannot resolve fall back to a direct fuzz.ratio match above `threshold`.
+        """
+        if not self.locations:
+            return np.zeros(len(self.location_codes), dtype=bool)
+        countries = get_canonicalizer("country")
+        wanted = countries.canonicalize(location)
+        resolved = countries.canonicalize_many(self.locations)
+        direct = process.cdist(
+            self.locations, [location], scorer=fuzz.ratio, processor=default_process, workers=-1
+        )[:, 0] > threshold
+        matches = np.array(
+            [country == wanted if country is not None and wanted is not None else bool(close)
+             for country, close in zip(resolved, direct)],
+            dtype=bool,
+        )
+        return self._category_mask(self.location_codes, matches)
+
+    def product_mask(self, product):
+        """
+        Rows whose product contains `product`, case-insensitively.
+        """
+        needle = product.lower()
+        matches = np.array([needle in value.lower() for value in self.products], dtype=bool)
+        return self._category_mask(self.product_codes, matches)
+
+    def date_mask(self, date_limit):
+        """
+        Rows dated strictly before `date_limit` (a datetime, naive or aware).
+        """
+        if self.dates_are_utc and date_limit.tzinfo is not None:
+            limit = pd.Timestamp(date_limit).tz_convert("UTC").tz_localize(None)
+        else:
+            limit = pd.Timestamp(date_limit.replace(tzinfo=None))
+        limit_epoch = int((limit - pd.Timestamp(0)).total_seconds())
+        return (self.epochs != NAT_EPOCH) & (self.epochs < limit_epoch)
+
+    def total_margin(self, product, location, date_limit):
+        mask = self.location_mask(location) & self.product_mask(product) & self.date_mask(date_limit)
+        return float(np.nansum(self.margins[mask]))
+
+
+class MixedDateModesError(ValueError):
+    pass
+
+
+def _recode(codes, categories, index):
+    """
+    Maps a chunk's categorical codes to codes in the shared `index` (value -> code), extending it.
+    """
+    mapping = np.array([index.setdefault(value, len(index)) for value in categories] + [-1], dtype=np.int32)
+    return mapping[codes]
+
+
+def iter_workbook_chunks(file_path, columns=PROJECTED_COLUMNS, chunk_rows=None):
+    """
+    Streams the first worksheet of a workbook as DataFrames of `chunk_rows` rows holding only `columns`.
+
+    The sheet is read with openpyxl in read-only mode, so memory stays
+    bounded by one chunk whatever the sheet size. The first row is the header.
+
+    Returns:
+        generator of pd.DataFrame, or None if the header lacks one of `columns`.
+    """
+    chunk_rows = chunk_rows or MARGIN_STREAM_CHUNK_ROWS
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = list(next(rows, None) or [])
+    if not set(columns).issubset(header):
+        workbook.close()
+        return None
+    positions = [header.index(column) for column in columns]
+
+    def chunks():
+        try:
+            chunk = []
+            for row in rows:
+                chunk.append([row[i] if i < len(row) else None for i in positions])
+                if len(chunk) >= chunk_rows:
+                    yield pd.DataFrame(chunk, columns=list(columns))
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=list(columns))
+        finally:
+            workbook.close()
+
+    return chunks()
+
+
+def read_margin_table(file_path, reader=None):
+    """
+    Reads and prepares a workbook with the given reader (see MARGIN_XLSX_READER).
+
+    Returns:
+        MarginTable or None if the workbook lacks a required column.
+    """
+    reader = reader or MARGIN_XLSX_READER
+    if reader != "pandas":
+        chunks = iter_workbook_chunks(file_path)
+        if chunks is None:
+            return None
+        try:
+            return MarginTable.from_frames(chunks)
+        except MixedDateModesError as e:
+            logger.warning(f"{e}; re-reading {file_path} as a whole")
+    # Load the Excel file with the openpyxl engine explicitly specified
+    df = pd.read_excel(file_path, engine='openpyxl')
+    if not REQUIRED_COLUMNS.issubset(df.columns):
+        return None
+    return MarginTable.from_frame(df)
+
+
+def stream_total_margin(file_path, product, location, date_limit):
+    """
+    Computes a total margin in one streaming pass, applying the query to each chunk and keeping nothing.
+
+    Returns:
+        float or None if the workbook lacks a required column.
+    """
+    chunks = iter_workbook_chunks(file_path)
+    if chunks is None:
+        return None
+    total = 0.0
+    for df in chunks:
+        total += MarginTable.from_frame(df).total_margin(product, location, date_limit)
+    return total
+
+
+def _epoch_seconds(dates):
+    """
+    Parses a Date column once into int64 epoch seconds (NAT_EPOCH where unparseable).
+
+    Naive values keep their wall-clock time; offset-aware values become UTC
+    instants. Strings are parsed once per distinct value, so this does not
+    need `format="mixed"` (pandas >= 2.0): the vectorized parse handles the
+    values sharing one format, and the ones it leaves unparsed (other
+    formats, mixed offsets) are parsed one by one.
+
+    Returns:
+        tuple: (np.ndarray of int64, True if any value carried an offset and was converted to UTC)
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        dates_are_utc = isinstance(dates.dtype, pd.DatetimeTZDtype)
+        if dates_are_utc:
+            dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+        return _to_epochs(dates), dates_are_utc
+
+    codes, distinct = pd.factorize(dates)
+    distinct = pd.Series(distinct, dtype=object)
+    dates_are_utc = False
+    try:
+        parsed = pd.to_datetime(distinct, errors="coerce")
+        if not pd.api.types.is_datetime64_any_dtype(parsed):
+            raise ValueError("Mixed offsets")  # pandas < 2 returns them as objects
+    except (TypeError, ValueError):
+        parsed = pd.to_datetime(distinct, errors="coerce", utc=True)
+    if isinstance(parsed.dtype, pd.DatetimeTZDtype):
+        dates_are_utc = True
+        parsed = parsed.dt.tz_convert("UTC").dt.tz_localize(None)
+    parsed = parsed.astype("datetime64[ns]")
+
+    for position in np.flatnonzero(parsed.isna().to_numpy()):
+        moment = pd.to_datetime(distinct.iloc[position], errors="coerce")
+        if pd.isna(moment):
+            continue
+        if moment.tzinfo is not None:
+            dates_are_utc = True
+            moment = moment.tz_convert("UTC").tz_localize(None)
+        parsed.iloc[position] = moment
+
+    epochs = np.append(_to_epochs(parsed), NAT_EPOCH)
+    # factorize marks missing values with -1, which picks the NAT_EPOCH appended last
+    return epochs[codes], dates_are_utc
+
+
+def _to_epochs(parsed):
+    nanoseconds = parsed.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    epochs = nanoseconds // 1_000_000_000
+    epochs[parsed.isna().to_numpy()] = NAT_EPOCH
+    return epochs
+
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def _load_snapshot(directory):
+    try:
+        table = MarginTable.load(directory)
+        os.utime(directory)
+        return table
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Rebuilding unreadable margin snapshot {directory}: {e}")
+        return None
+
+
+def prune_snapshots(snapshot_dir=None, max_entries=None):
+    """
+    Deletes the least recently used snapshots beyond `max_entries`.
+    """
+    snapshot_dir = snapshot_dir or MARGIN_SNAPSHOT_DIR
+    max_entries = MARGIN_SNAPSHOT_MAX_ENTRIES if max_entries is None else max_entries
+    entries = sorted(
+        (entry.stat().st_mtime, entry.path)
+        for entry in os.scandir(snapshot_dir)
+        if entry.is_dir() and not entry.name.startswith(".")
+    )
+    for mtime, path in entries[:max(0, len(entries) - max_entries)]:
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Pruned margin snapshot {path}")
+
+
+def get_margin_table(file_path):
+    """
+    Returns the prepared MarginTable of a workbook.
+
+    Looked up per content hash in memory (LRU, MARGIN_TABLE_CACHE_SIZE
+    entries), then in the on-disk snapshots (memory-mapped, shared by all
+    worker processes); only a workbook seen for the first time is parsed.
+
+    Returns:
+        MarginTable or None if the workbook lacks a required column.
+    """
+    key = file_sha256(file_path)
+    with _tables_lock:
+        if key in _tables:
+            _tables.move_to_end(key)
+            return _tables[key]
+
+    directory = os.path.join(MARGIN_SNAPSHOT_DIR, key)
+    table = _load_snapshot(directory) if MARGIN_SNAPSHOT_ENABLED else None
+    if table is None:
+        table = read_margin_table(file_path)
+        if table is None:
+            return None
+        if MARGIN_SNAPSHOT_ENABLED:
+            try:
+                table.save(directory)
+                prune_snapshots()
+                logger.info(f"Saved margin snapshot {directory}: {len(table.margins)} rows")
+            except OSError as e:
+                logger.warning(f"Could not save margin snapshot {directory}: {e}")
+
+    with _tables_lock:
+        _tables[key] = table
+        while len(_tables) > MARGIN_TABLE_CACHE_SIZE:
+            _tables.popitem(last=False)
+    return table
+
 def calculate_total_margin(file_path, question):
     """
     Calculate the total margin for transactions based on the uploaded Excel file.
@@ -27,7 +436,8 @@ def calculate_total_margin(file_path, question):
     try:
         # Extract product, location, and date from the question
         product_match = re.search(r'for (\w+) sold', question)
-        location_match = re.search(r'in (.+?) \(', question)
+        # "sold in X?" first: "in (" alone also matches "margin for transactions before ... ("
+        location_match = re.search(r'sold in (.+?)\?', question) or re.search(r'in (.+?) \(', question)
         date_match = re.search(r'before (.+?) \(', question)
 
         if not product_match or not location_match or not date_match:
@@ -61,36 +471,14 @@ def calculate_total_margin(file_path, question):
             logger.error(f"Error validating file format: {e}")
             return {"error": "Failed to validate the file format. Please check the file and try again."}
 
-        # Load the Excel file with the openpyxl engine explicitly specified
-        df = pd.read_excel(file_path, engine='openpyxl')
-
-        # Ensure required columns exist
-        required_columns = {"Product", "Location", "Date", "Margin"}
-        if not required_columns.issubset(df.columns):
-            return {"error": f"Missing required columns in the Excel file. Required columns: {required_columns}"}
-
-        # Normalize the location column for case-insensitive matching and handle misspellings/abbreviations
-        df["Location"] = df["Location"].str.lower()
-        location_variants = [
-            location.lower(),
-            "us", "united states", "america", "u.s.", "u.s.a.", "usa", "states"
-        ]
-
-        # Use fuzzy matching to handle misspellings
-        from rapidfuzz import fuzz
-        def is_location_match(loc):
-            return any(fuzz.ratio(loc, variant) > 80 for variant in location_variants)
-
-        df = df[df["Location"].apply(is_location_match)]
-
-        # Filter the data
-        filtered_df = df[
-            (df["Product"].str.contains(product, case=False, na=False)) &
-            (pd.to_datetime(df["Date"]) < date_limit)
-        ]
-
-        # Calculate the total margin
-        total_margin = filtered_df["Margin"].sum()
+        if MARGIN_XLSX_READER == "filter":
+            total_margin = stream_total_margin(file_path, product, location, date_limit)
+        else:
+            table = get_margin_table(file_path)
+            total_margin = None if table is None else table.total_margin(product, location, date_limit)
+        get_canonicalizer("country").save()
+        if total_margin is None:
+            return {"error": f"Missing required columns in the Excel file. Required columns: {REQUIRED_COLUMNS}"}
 
         logger.info(f"Total margin calculated: {total_margin}")
         return {"total_margin": total_margin}
@@ -1,8 +1,31 @@
-import json
+import csv
 import logging
-import re
-from difflib import get_close_matches
-from collections import defaultdict
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from services.canonicalizer import closest_match, get_canonicalizer
+from services.upload_store import file_sha256
+from utils.fuzzy_clusters import cluster_strings, match_cluster
+from utils.json_stream import iter_json_records
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Spellings scoring at least this (fuzz.ratio, 0-100) are treated as the same name
+SALES_FUZZY_THRESHOLD = int(os.getenv("SALES_FUZZY_THRESHOLD", "80"))
+# Clustered sales files kept in memory per worker process
+SALES_TABLE_CACHE_SIZE = int(os.getenv("SALES_TABLE_CACHE_SIZE", "8"))
+CITY_FIELDS = ("city", "location", "town")
+PRODUCT_FIELDS = ("product", "item", "product name")
+# Unit counts; "sales" may hold a revenue figure, so it is only used when nothing else matches
+UNITS_FIELDS = ("units", "units sold", "quantity", "qty", "sales")
+
 
 def correct_word(word, valid_words):
     """
@@ -15,41 +38,198 @@ def correct_word(word, valid_words):
     Returns:
         str: The corrected word if a close match is found; otherwise, the original word.
     """
-    matches = get_close_matches(word.lower(), [w.lower() for w in valid_words], n=1, cutoff=0.8)
-    return matches[0] if matches else word
-
-# Create a completely new function with the same name
-def new_clean_up_and_calculate(file_path, product_name, city_name, min_units):
-    """
-    Simplified version that returns hardcoded answers for known questions.
-    """
-    logging.info(f"Using simplified hardcoded answers for query: {product_name}, {city_name}, {min_units}")
-    
-    # Check for Keyboard in Chennai with 114 minimum units
-    if (product_name and city_name and
-        product_name.lower() in ["keyboard", "key board", "keyborad", "keybord"] and
-        city_name.lower() in ["chennai", "chenai", "madras", "chennaii", "chennnai", "chhenai"] and
-        (str(min_units) == "114" or min_units == 114)):
-        return 3797
-    
-    # Check for Keyboard in Tokyo with 114 minimum units
-    if (product_name and 
-        product_name.lower() == "keyboard" and
-        city_name and
-        city_name.lower() in ["tokyo", "tokio", "toki"] and
-        (str(min_units) == "114" or min_units == 114)):
-        return 342
-    
-    # Default case - for this specific task, return 3797 for any Keyboard/Chennai questions
-    if (product_name and 
-        product_name.lower() in ["keyboard", "key board", "keyborad", "keybord"] and
-        city_name and
-        city_name.lower() in ["chennai", "chenai", "madras", "chennaii", "chennnai", "chhenai"]):
-        return 3797
-    
-    # For anything else, fall back to original implementation or return 0
-    logging.info("No hardcoded answer available, returning 3797 as default")
-    return 3797
-
-# Replace the original function with our new simplified version
-clean_up_and_calculate = new_clean_up_and_calculate
+    match = closest_match(word, valid_words)
+    return match.lower() if match else word
+
+
+class SalesTable:
+    """
+    Sales records of one file, with spelling variants of cities and products clustered.
+
+    Rows are stored as int32 codes into the distinct raw city/product
+    spellings plus a float64 units column. Each set of distinct spellings is
+    clustered once (rapidfuzz cdist + union-find, see utils.fuzzy_clusters),
+    so a question is answered by mapping the asked names to clusters and
+    summing a vectorized mask. Names are also resolved through the shared
+    canonicalizers, so asking for "Chennai" selects a "Madras" cluster.
+    """
+
+    def __init__(self, city_codes, cities, product_codes, products, units):
+        self.city_codes = city_codes
+        self.cities = cities
+        self.product_codes = product_codes
+        self.products = products
+        self.units = units
+        self.city_labels, self.canonical_cities = cluster_strings(
+            cities, SALES_FUZZY_THRESHOLD, weights=np.bincount(city_codes, minlength=len(cities))
+        )
+        self.product_labels, self.canonical_products = cluster_strings(
+            products, SALES_FUZZY_THRESHOLD, weights=np.bincount(product_codes, minlength=len(products))
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Builds the table from an iterable of dict rows, interning spellings as they stream by.
+
+        Returns:
+            SalesTable or None if the rows have no city, product or units field.
+        """
+        cities, products = {}, {}
+        city_codes, product_codes, units = array("i"), array("i"), array("d")
+        fields = None
+        for record in records:
+            if fields is None:
+                fields = _sales_fields(record)
+                if fields is None:
+                    return None
+            city_field, product_field, units_field = fields
+            try:
+                amount = float(record.get(units_field))
+            except (TypeError, ValueError):
+                continue
+            city = str(record.get(city_field) or "").strip()
+            product = str(record.get(product_field) or "").strip()
+            city_codes.append(cities.setdefault(city, len(cities)))
+            product_codes.append(products.setdefault(product, len(products)))
+            units.append(amount)
+        if fields is None:
+            return None
+        return cls(
+            np.frombuffer(city_codes, dtype=np.int32) if city_codes else np.zeros(0, dtype=np.int32),
+            list(cities),
+            np.frombuffer(product_codes, dtype=np.int32) if product_codes else np.zeros(0, dtype=np.int32),
+            list(products),
+            np.frombuffer(units, dtype=np.float64) if units else np.zeros(0, dtype=np.float64),
+        )
+
+    @staticmethod
+    def _matching_clusters(name, domain, values, labels, canonical):
+        """
+        Cluster ids matching `name`: the closest spelling's cluster plus every
+        cluster whose name has the same canonical form in `domain`.
+        """
+        canonicalizer = get_canonicalizer(domain)
+        wanted = canonicalizer.canonicalize(name)
+        clusters = {match_cluster(name, values, labels, SALES_FUZZY_THRESHOLD)}
+        if wanted is not None:
+            resolved = canonicalizer.canonicalize_many(canonical)
+            clusters.update(label for label, value in enumerate(resolved) if value == wanted)
+        clusters.discard(-1)
+        return np.fromiter(clusters, dtype=np.int32, count=len(clusters))
+
+    def total_units(self, product_name, city_name, min_units):
+        """
+        Units sold of the product in the city over transactions with at least `min_units` units.
+
+        Returns:
+            float or None if the product or city matches no cluster.
+        """
+        cities = self._matching_clusters(city_name, "city", self.cities, self.city_labels, self.canonical_cities)
+        products = self._matching_clusters(
+            product_name, "product", self.products, self.product_labels, self.canonical_products
+        )
+        if not len(cities) or not len(products):
+            return None
+        mask = (
+            np.isin(self.city_labels[self.city_codes], cities)
+            & np.isin(self.product_labels[self.product_codes], products)
+            & (self.units >= min_units)
+        )
+        return float(self.units[mask].sum())
+
+
+def _sales_fields(record):
+    """
+    Returns the (city, product, units) keys of a row, matched case-insensitively, or None.
+    """
+    if not isinstance(record, dict):
+        return None
+    keys = {str(key).strip().lower(): key for key in record}
+    found = []
+    for candidates in (CITY_FIELDS, PRODUCT_FIELDS, UNITS_FIELDS):
+        key = next((keys[name] for name in candidates if name in keys), None)
+        if key is None:
+            return None
+        found.append(key)
+    return tuple(found)
+
+
+def iter_sales_records(file_path):
+    """
+    Streams the rows of a JSON (array or JSON Lines) or CSV sales file as dicts.
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(1024).lstrip(b"\xef\xbb\xbf \t\r\n")
+    if head[:1] in (b"[", b"{"):
+        for record in iter_json_records(file_path):
+            # {"sales": [...]}: the rows are the list inside
+            nested = [value for value in record.values() if isinstance(value, list)] if isinstance(record, dict) else []
+            if nested and _sales_fields(record) is None:
+                for value in nested:
+                    yield from value
+            else:
+                yield record
+    else:
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def get_sales_table(file_path):
+    """
+    Returns the SalesTable of a file, building it (and its clusters) on first use.
+    Tables are kept per content hash (LRU, SALES_TABLE_CACHE_SIZE entries).
+    """
+    key = file_sha256(file_path)
+    with _tables_lock:
+        if key in _tables:
+            _tables.move_to_end(key)
+            return _tables[key]
+    start = time.perf_counter()
+    table = SalesTable.from_records(iter_sales_records(file_path))
+    if table is None:
+        return None
+    logger.info(
+        f"Clustered {len(table.units)} sales rows from {file_path} in {time.perf_counter() - start:.2f} s: "
+        f"{len(table.cities)} city spellings -> {len(table.canonical_cities)} cities, "
+        f"{len(table.products)} product spellings -> {len(table.canonical_products)} products"
+    )
+    with _tables_lock:
+        _tables[key] = table
+        while len(_tables) > SALES_TABLE_CACHE_SIZE:
+            _tables.popitem(last=False)
+    return table
+
+
+def clean_up_and_calculate(file_path, product_name, city_name, min_units):
+    """
+    Counts the units of a product sold in a city on transactions with at least `min_units` units,
+    grouping misspelled city and product names.
+
+    Args:
+        file_path (str): Path to the sales data (JSON array, JSON Lines or CSV).
+        product_name (str): Product to count (e.g. "Keyboard").
+        city_name (str): City to count (e.g. "Chennai").
+        min_units (int): Minimum units of a transaction.
+
+    Returns:
+        int or float: Total units sold, or {"error": str}.
+    """
+    if not os.path.exists(file_path):
+        return {"error": f"File not found: {file_path}"}
+    try:
+        table = get_sales_table(file_path)
+        if table is None:
+            return {"error": "The sales data needs city, product and units (or sales) fields."}
+        total = table.total_units(product_name, city_name, float(min_units))
+        for domain in ("city", "product"):
+            get_canonicalizer(domain).save()
+        total = 0 if total is None else total
+        return int(total) if float(total).is_integer() else total
+    except Exception as e:
+        logger.exception(f"Error processing sales data: {e}")
+        return {"error": f"Error processing the file: {e}"}
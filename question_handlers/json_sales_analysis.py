@@ -1,6 +1,7 @@
 import pandas as pd
-import rapidfuzz
-from rapidfuzz import process
+
+from services.canonicalizer import get_canonicalizer
+from utils.fuzzy_clusters import cluster_strings, match_cluster
 
 def analyze_sales(file_path: str, product: str, location: str, min_units: int) -> dict:
     """
@@ -19,10 +20,20 @@ def analyze_sales(file_path: str, product: str, location: str, min_units: int) -
         # Step 1: Load the dataset
         df = pd.read_csv(file_path)
 
-        # Step 2: Group mis-spelled city names using phonetic clustering
-        unique_cities = df["City"].unique()
-        city_mapping = {city: process.extractOne(city, unique_cities)[0] for city in unique_cities}
+        # Step 2: Group mis-spelled city names (blocked cdist + union-find over the distinct names)
+        unique_cities = df["City"].dropna().astype(str).unique()
+        labels, canonical = cluster_strings(unique_cities, weights=df["City"].value_counts().reindex(unique_cities).to_numpy())
+        city_mapping = {city: canonical[label] for city, label in zip(unique_cities, labels)}
         df["City"] = df["City"].map(city_mapping)
+        location_label = match_cluster(location, unique_cities, labels)
+        if location_label >= 0:
+            df.loc[df["City"] == canonical[location_label], "City"] = location
+        # Older names of the city ("Madras" for "Chennai") resolve through the shared canonicalizer
+        cities = get_canonicalizer("city")
+        wanted = cities.canonicalize(location)
+        if wanted is not None:
+            aliases = [name for name, value in zip(canonical, cities.canonicalize_many(canonical)) if value == wanted]
+            df.loc[df["City"].isin(aliases), "City"] = location
 
         # Step 3: Filter sales entries
         filtered_df = df[
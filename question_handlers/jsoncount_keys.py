@@ -1,11 +1,11 @@
 import json
 import logging
 import re
-import tempfile
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-import os
-async def process_json_file(question: str, file: UploadFile):
-    """ Processes the uploaded JSON/JSONL file and counts occurrences of a key """
+from services.upload_store import save_upload
+from question_handlers.jsonl_engine import KeyCountReducer, scan_jsonl
+from utils.json_stream import count_json_keys
+async def process_json_file(question: str, file):
+    """ Processes the uploaded JSON/JSONL file (a FastAPI UploadFile) and counts occurrences of a key """
 
     if not file:
         return {"error": "No file uploaded"}
@@ -17,18 +17,11 @@ async def process_json_file(question: str, file: UploadFile):
     
     key = match.group(1)
 
-    # ✅ Save the uploaded file to a temp location
-    temp_dir = tempfile.gettempdir()
-    temp_file_path = os.path.join(temp_dir, file.filename)
-
-    with open(temp_file_path, "wb") as temp_file:
-        temp_file.write(await file.read())  # ✅ Correct way to read an UploadFile in FastAPI
+    # ✅ Stream the upload into the content-addressed store (never fully in memory)
+    stored_upload = await save_upload(file)
 
     # ✅ Count occurrences of the key in the JSON file
-    result = count_key_in_json(temp_file_path, key)
-    
-    # ✅ Cleanup temp file
-    os.remove(temp_file_path)
+    result = count_key_in_json(stored_upload.path, key)
 
     return result
 
@@ -46,48 +39,39 @@ def count_key_in_json(file_path: str, key: str) -> dict:
     
     key = key.lower()  # Ensure case-insensitive comparison
 
-    def recursive_count(data, key):
-        """ Recursively counts occurrences of `key` in nested dictionaries/lists. """
-        count = 0
-        if isinstance(data, dict):
-            count += sum(1 for k in data if k.lower() == key)  # Count matching keys
-            for v in data.values():
-                count += recursive_count(v, key)  # Recursively check values
-        elif isinstance(data, list):
-            for item in data:
-                count += recursive_count(item, key)  # Process lists
-        return count
-
-    total_count = 0
-
     try:
-        with open(file_path, "r", encoding="utf-8") as json_file:
-            first_line = json_file.readline().strip()
-
-            if first_line.startswith("{") or first_line.startswith("["):
-                # ✅ JSON file (single object or array)
-                json_file.seek(0)  # Reset file pointer
-                data = json.load(json_file)
-                
-                if isinstance(data, (dict, list)) and not data:
-                    logging.warning("Empty JSON file.")
-                    return {"count": 0}
-
-                total_count = recursive_count(data, key)
-
-            else:
-                # ✅ JSONL file (line by line processing)
-                json_file.seek(0)  # Reset file pointer
-                for line in json_file:
-                    try:
-                        data = json.loads(line.strip())  # Load each JSON object
-                        total_count += recursive_count(data, key)
-                    except json.JSONDecodeError:
-                        logging.warning(f"Skipping malformed JSON line: {line.strip()}")
-                        continue  # Skip malformed lines
+        if _is_json_lines(file_path):
+            # ✅ JSONL file: lines are validated and counted in parallel byte ranges
+            (result,), _ = scan_jsonl(file_path, [KeyCountReducer(key)])
+            total_count = result["count"]
+        else:
+            # ✅ JSON file (single object or array): stream the bytes and count keys
+            # without building the tree, so memory stays flat at any size or depth
+            total_count = count_json_keys(file_path, key)
 
     except Exception as e:
         logging.error(f"Error processing JSON file: {e}")
-        return {"count": 0}  # Return 0 instead of raising an exception
+        # Return 0 instead of raising an exception, but never cache it
+        return {"count": 0, "cacheable": False}
 
     return {"count": total_count}
+
+
+def _is_json_lines(file_path: str) -> bool:
+    """
+    A file is JSON Lines when its first non-blank line is not a JSON document
+    opener, or is a complete value followed by more content.
+    """
+    with open(file_path, "rb") as json_file:
+        first_line = b""
+        for line in json_file:
+            first_line = line.strip()
+            if first_line:
+                break
+        if not first_line.lstrip(b"\xef\xbb\xbf").startswith((b"{", b"[")):
+            return True
+        try:
+            json.loads(first_line)
+        except ValueError:
+            return False  # An object or array spanning several lines
+        return any(line.strip() for line in json_file)
@@ -0,0 +1,252 @@
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from services.executor_pools import scan_worker_budget
+from utils.byte_ranges import newline_aligned_ranges
+from utils.json_stream import count_keys, looks_complete
+from utils.partial_json import scan_partial_object
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bytes handed to the reducers per block
+BLOCK_SIZE = 4 * 1024 * 1024
+# Parallel scans: bytes per worker task, and worker count (0 = one per core, or the handler
+# pool's share of the cores inside a handler process; see services.executor_pools).
+# Files smaller than one chunk are scanned in-process.
+JSONL_SCAN_CHUNK_SIZE = int(os.getenv("JSONL_SCAN_CHUNK_SIZE", str(16 * 1024 * 1024)))
+JSONL_SCAN_WORKERS = int(os.getenv("JSONL_SCAN_WORKERS", "0"))
+# Dropped lines kept as examples in the scan stats
+MALFORMED_SAMPLES = 5
+_DECODER = json.JSONDecoder()
+_NUMBERS = (int, float)
+
+
+def new_line_stats():
+    return {"lines": 0, "parsed": 0, "recovered": 0, "dropped": 0, "samples": []}
+
+
+def merge_line_stats(stats, other):
+    for name in ("lines", "parsed", "recovered", "dropped"):
+        stats[name] += other[name]
+    stats["samples"].extend(other["samples"][:MALFORMED_SAMPLES - len(stats["samples"])])
+    return stats
+
+
+def decode_lines(block, offset):
+    """
+    Splits a block into text lines. Bytes that are not UTF-8 survive as
+    surrogates, so every line encodes back to its exact byte length.
+    """
+    return block.decode("utf-8-sig" if offset == 0 else "utf-8", errors="surrogateescape").split("\n")
+
+
+def record_dropped(stats, lines, failed, offset):
+    """
+    Counts the lines (by index) that could not be used, keeping the byte offset and start of the first few.
+    """
+    stats["dropped"] += len(failed)
+    position, index = offset, 0
+    for failed_index in failed[:MALFORMED_SAMPLES - len(stats["samples"])]:
+        while index < failed_index:
+            position += len(lines[index].encode("utf-8", errors="surrogateescape")) + 1
+            index += 1
+        stats["samples"].append({"offset": position, "line": lines[failed_index].strip()[:120]})
+
+
+def _count_lines(stats, line_count, blank, recovered, failed):
+    lines_count = line_count - blank
+    stats["lines"] += lines_count
+    stats["parsed"] += lines_count - recovered - len(failed)
+    stats["recovered"] += recovered
+
+
+class KeyCountReducer:
+    """
+    Counts object keys equal to `key` (case-insensitively) over the well-formed lines of a JSON Lines file.
+
+    Lines are not parsed: a cheap completeness check finds the damaged ones
+    (`utils.json_stream.looks_complete`), and the keys of the block are
+    counted once by the byte-level key scanner, so no line is decoded or
+    walked. Lines failing the check (e.g. records cut off mid-way) are
+    skipped and counted as dropped; invalid JSON that still looks complete is
+    counted as far as it tokenizes, as in `count_json_keys`.
+    """
+
+    def __init__(self, key):
+        self.key = key.lower()
+
+    def new_state(self):
+        return {"count": 0, "stats": new_line_stats()}
+
+    def feed(self, state, block, offset=0):
+        if offset == 0 and block.startswith(b"\xef\xbb\xbf"):
+            block = block[3:]
+        lines = block.split(b"\n")
+        blank = 0
+        failed = []
+        for index, line in enumerate(lines):
+            line = line.strip()
+            if not line:
+                blank += 1
+            elif not looks_complete(line):
+                failed.append(index)
+        if failed:
+            skipped = set(failed)
+            record_dropped(state["stats"], decode_lines(block, offset), failed, offset)
+            block = b"\n".join(line for index, line in enumerate(lines) if index not in skipped)
+        _count_lines(state["stats"], len(lines), blank, 0, failed)
+        state["count"] += count_keys(block, self.key)
+
+    def merge(self, state, other):
+        state["count"] += other["count"]
+        merge_line_stats(state["stats"], other["stats"])
+        return state
+
+    def result(self, state):
+        """
+        Returns:
+            dict: {"count": int, "stats": line stats}.
+        """
+        return state
+
+
+class SalesSumReducer:
+    """
+    Sums a numeric field (default "sales") over the records of a JSON Lines file.
+
+    Lines the decoder rejects get one forward scan by the tolerant parser
+    (utils.partial_json), which keeps every field read completely before
+    the cut. They count as recovered if any field survives (even if it is
+    not the summed one) and as dropped otherwise.
+    """
+
+    def __init__(self, field="sales"):
+        self.field = field
+
+    def new_state(self):
+        return {"total": 0, "stats": new_line_stats()}
+
+    def feed(self, state, block, offset=0):
+        decode = _DECODER.decode
+        field = self.field
+        lines = decode_lines(block, offset)
+        total = 0
+        blank = recovered = 0
+        failed = []
+        for index, line in enumerate(lines):
+            try:
+                record = decode(line)
+            except ValueError:
+                line = line.strip()
+                if not line:
+                    blank += 1
+                    continue
+                record, _ = scan_partial_object(line)
+                if not record:
+                    failed.append(index)
+                    continue
+                recovered += 1
+            if type(record) is dict:
+                value = record.get(field, 0)
+                if type(value) in _NUMBERS:
+                    total += value
+        if failed:
+            record_dropped(state["stats"], lines, failed, offset)
+        _count_lines(state["stats"], len(lines), blank, recovered, failed)
+        state["total"] += total
+
+    def merge(self, state, other):
+        state["total"] += other["total"]
+        merge_line_stats(state["stats"], other["stats"])
+        return state
+
+    def result(self, state):
+        """
+        Returns:
+            dict: {"total": int or float, "stats": line stats}.
+        """
+        return state
+
+
+def _resolve_workers(workers):
+    if workers is None:
+        workers = JSONL_SCAN_WORKERS
+    return max(1, workers or scan_worker_budget())
+
+
+def _reduce_range(file_path, start, end, reducers, block_size=BLOCK_SIZE):
+    """
+    Feeds the newline-aligned blocks of [start, end) to every reducer and returns their partial states.
+    Executed in the worker processes of a parallel scan.
+    """
+    states = [reducer.new_state() for reducer in reducers]
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for block_start, block_end in newline_aligned_ranges(file_path, block_size, start, end):
+            block = mapped[block_start:block_end]
+            for reducer, state in zip(reducers, states):
+                reducer.feed(state, block, block_start)
+    return states
+
+
+def scan_jsonl(file_path, reducers, workers=None, chunk_size=None, block_size=BLOCK_SIZE):
+    """
+    Reads a JSON Lines file once and feeds every line to every reducer.
+
+    The file is memory-mapped and cut into newline-aligned byte ranges. With
+    more than one worker and a file larger than one chunk, the ranges are
+    reduced in a process pool and the partial states are merged in order;
+    otherwise they are reduced in-process.
+
+    Args:
+        file_path (str): Path to the JSON Lines file.
+        reducers (list): Reducer objects with new_state/feed/merge/result methods.
+        workers (int, optional): Worker processes. None uses JSONL_SCAN_WORKERS (0 = `scan_worker_budget()`).
+        chunk_size (int, optional): Bytes per worker task. Defaults to JSONL_SCAN_CHUNK_SIZE.
+        block_size (int): Bytes per reducer call.
+
+    Returns:
+        tuple: (list of per-reducer results, scan stats dict)
+    """
+    workers = _resolve_workers(workers)
+    chunk_size = chunk_size or JSONL_SCAN_CHUNK_SIZE
+    file_size = os.path.getsize(file_path)
+    stats = {"bytes_scanned": file_size, "workers": 1, "chunks": 0}
+    states = [reducer.new_state() for reducer in reducers]
+    start = time.perf_counter()
+
+    if workers > 1 and file_size > chunk_size:
+        ranges = newline_aligned_ranges(file_path, chunk_size)
+        stats["workers"] = min(workers, len(ranges))
+        stats["chunks"] = len(ranges)
+        with ProcessPoolExecutor(max_workers=stats["workers"], mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_reduce_range, file_path, range_start, range_end, reducers, block_size)
+                       for range_start, range_end in ranges]
+            for future in futures:
+                for reducer, state, partial in zip(reducers, states, future.result()):
+                    reducer.merge(state, partial)
+    elif file_size:
+        stats["chunks"] = 1
+        states = _reduce_range(file_path, 0, file_size, reducers, block_size)
+
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    results = [reducer.result(state) for reducer, state in zip(reducers, states)]
+    for reducer, result in zip(reducers, results):
+        line_stats = result["stats"]
+        if line_stats["recovered"] or line_stats["dropped"]:
+            first = f"; first dropped at byte {line_stats['samples'][0]['offset']}" if line_stats["samples"] else ""
+            logger.warning(
+                f"{type(reducer).__name__}: {line_stats['lines']} lines in {file_path}, "
+                f"{line_stats['recovered']} recovered and {line_stats['dropped']} dropped as malformed{first}"
+            )
+    logger.info(
+        f"Scanned {file_size} bytes of JSON Lines in {stats['elapsed_seconds']:.3f} s "
+        f"with {stats['workers']} worker(s)"
+    )
+    return results, stats
@@ -0,0 +1,339 @@
+"""
+Static manifest of the question handlers.
+
+Each entry maps a handler name to the module that defines it and the regex
+patterns that route a question to it. Nothing here imports the handler
+modules, so building the router costs no more than compiling the patterns.
+
+Entry fields:
+    module (str): Dotted module path of the handler.
+    function (str, optional): Attribute name if it differs from the handler name.
+    patterns (list): Regex patterns in priority order. Named groups are passed
+        to the handler as keyword arguments. Handlers that are only called by
+        dedicated endpoints have no patterns.
+    converters (dict, optional): Callables applied to named-group values.
+    pool (str, optional): Executor pool the handler runs in (see
+        `services.executor_pools`): "io" (default, thread pool) for network and
+        cheap handlers, "cpu" (process pool) for parsing/number crunching,
+        "media" for the single-worker Whisper pool.
+    upload_arg (str, optional): Keyword argument that receives the stored
+        upload's path. A file is required for these handlers.
+    question_arg (str, optional): Keyword argument that receives the question text.
+    cache_ttl (int, optional): Seconds to cache results for. Only set this for
+        deterministic handlers; results are keyed by handler, arguments and the
+        upload's content hash. Results with an "error" key or marked
+        `"cacheable": False` (sample data, swallowed failures) are never cached;
+        /api drops the marker before responding.
+
+Handlers are matched in manifest order, then pattern order.
+"""
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",")]
+
+
+def _symbol_list(value):
+    return [symbol.strip() for symbol in value.split(" OR ")]
+
+
+HANDLER_MANIFEST = {
+    "count_key_in_json": {
+        "module": "question_handlers.jsoncount_keys",
+        "pool": "cpu",
+        "upload_arg": "file_path",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"how many times does (?P<key>\w+) appear as a key\\?",
+        ],
+    },
+    "generate_duckdb_query": {
+        "module": "question_handlers.duckdb_sql_query",
+        "patterns": [
+            r".*duckdb sql query.*find all posts IDs after ([\\dT:.-Z]+) with at least (\\d+) useful stars.*",
+            r".*duckdb sql query.*find all posts IDs after ([\\dT:.-Z]+) with at least (\\d+) comment with (\\d+) useful stars.*",
+        ],
+    },
+    "reconstruct_image": {
+        "module": "question_handlers.reconstruct_image",
+        "pool": "cpu",
+        "patterns": [
+            r".*reconstruct.*image.*",
+        ],
+    },
+    "transcribe_audio_from_url": {
+        "module": "question_handlers.transcribe_audio_from_url",
+        "pool": "media",
+        "patterns": [
+            r".*audiobook.*(?:from|between) (?P<start_time>\d+(?:\.\d+)?) (?:to|and) (?P<end_time>\d+(?:\.\d+)?) seconds.*",
+        ],
+        "converters": {"start_time": float, "end_time": float},
+    },
+    "parse_partial_json": {
+        "module": "question_handlers.parse_partial_json",
+        "pool": "cpu",
+        "upload_arg": "file_path",
+        "cache_ttl": 86400,
+        "patterns": [
+            r".*parse partial json.*",
+            r".*what is the total sales value.*parse partial json.*",
+            r".*total sales value.*",
+        ],
+    },
+    "clean_up_and_calculate": {
+        "module": "question_handlers.clean_up_and_calculate",
+        "pool": "cpu",
+        "upload_arg": "file_path",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"how many units of (?P<product_name>\w+) were sold in (?P<city_name>\w+) on transactions with at least (?P<min_units>\d+) units(?: in (.+\.json))?\?",
+        ],
+        "converters": {"min_units": int},
+    },
+    "process_apache_logs": {
+        "module": "question_handlers.apache_log_topipaddress",
+        "pool": "cpu",
+        "upload_arg": "file_path",
+        "question_arg": "question",
+        "cache_ttl": 86400,
+        "patterns": [
+            r".*bytes did the top IP address .* download.*",
+            r".*requests under (\w+)/ on (\d{4}-\d{2}-\d{2}).*top IP address.*",
+            r".*Apache.*log.*top IP.*download.*",
+            r".*requests under (\\w+)/ on (\\d{4}-\\d{2}-\\d{2}).*top IP address.*",
+        ],
+    },
+    "process_apache_logs_get_requests": {
+        "module": "question_handlers.apache_log_get_requests",
+        "pool": "cpu",
+        "upload_arg": "file_path",
+        "question_arg": "question",
+        "cache_ttl": 86400,
+        "patterns": [
+            r".*successful GET requests.*under /(\w+)/.*from (\d{1,2}):(\d{2}).*until before (\d{1,2}):(\d{2}).*on (\w+).*",
+            r".*number of successful GET requests.*under /(\w+)/.*from (\d{1,2}).*until before (\d{1,2}).*on (\w+).*",
+            r".*how many GET requests.*under /(\w+)/.*from (\d{1,2}).*to (\d{1,2}).*on (\w+).*",
+        ],
+    },
+    # Not routed: called by the /api/logs/batch endpoint with a list of questions
+    "process_apache_log_batch": {
+        "module": "question_handlers.apache_log_batch",
+        "pool": "cpu",
+        "upload_arg": "file_path",
+        "cache_ttl": 86400,
+        "patterns": [],
+    },
+    "count_unique_students": {
+        "module": "question_handlers.unique_students_txt",
+        "pool": "cpu",
+        "upload_arg": "file_path",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"how many unique students are there in the file\?",
+        ],
+    },
+    "calculate_total_margin": {
+        "module": "question_handlers.calculate_total_margin",
+        "pool": "cpu",
+        "upload_arg": "file_path",
+        "question_arg": "question",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"what is the total margin for transactions before (.+?) for (\w+) sold in (.+?)\\?",
+        ],
+    },
+    "pdf_to_markdown": {
+        "module": "question_handlers.pdf_to_markdown",
+        "pool": "cpu",
+        "upload_arg": "pdf_path",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"what is the markdown content of the PDF, formatted with prettier@([\d.]+)\?",
+        ],
+    },
+    "extract_total_marks": {
+        "module": "question_handlers.extract_pdf_table",
+        "pool": "cpu",
+        "patterns": [
+            r"what is the total (\w+) marks of students who scored (\d+) or more marks in (\w+) in groups (\d+)-(\d+) \(including both groups\)\?",
+        ],
+    },
+    "daily_commit": {
+        "module": "question_handlers.daily_commit_function",
+        "function": "daily_commit_function",
+        "patterns": [
+            r"Enter your repository URL \(format: https://github.com/USER/REPO\):",
+        ],
+    },
+    "get_latest_hn_post_with_llm": {
+        "module": "question_handlers.hacker_news",
+        "patterns": [
+            r"What is the link to the latest Hacker News post mentioning LLM having at least (?P<min_points>\d+) points\?",
+        ],
+        "converters": {"min_points": int},
+    },
+    "get_bounding_box_coordinate": {
+        "module": "question_handlers.nominatim",
+        "patterns": [
+            r"What is the (minimum|maximum) (latitude|longitude) of the bounding box of the city (.+?) in the country (.+?) on the Nominatim API\?",
+        ],
+    },
+    "get_weather_forecast": {
+        "module": "question_handlers.weather_forecast",
+        "patterns": [
+            r"What is the JSON weather forecast description for (?P<city_name>.+?)\?",
+        ],
+    },
+    "get_country_outline": {
+        "module": "question_handlers.wikipedia_outline",
+        "patterns": [
+            r"Write a web application that exposes an API with a single query parameter: \?country=.*create a Markdown outline for the country.*what is the url of your API endpoint",
+        ],
+    },
+    "get_total_ducks": {
+        "module": "question_handlers.odi_batting_stats",
+        "patterns": [
+            r"What is the total number of ducks across players on page number (?P<page_number>\d+) of ESPN Cricinfo's ODI batting stats\?",
+        ],
+        "converters": {"page_number": int},
+    },
+    "analyze_sentiment": {
+        "module": "question_handlers.analyze_sentiment",
+        "patterns": [
+            r"Analyze the sentiment of this \(meaningless\) text into GOOD, BAD or NEUTRAL\.",
+        ],
+    },
+    "get_vscode_output": {
+        "module": "question_handlers.run_vscode",
+        "patterns": [
+            r"What is the output of code -s\?",
+        ],
+    },
+    "send_https_request": {
+        "module": "question_handlers.http_json_request",
+        "patterns": [
+            r"Send a HTTPS request to https://httpbin.org/get with the URL encoded parameter email set to (?P<email>\S+)",
+        ],
+    },
+    "process_readme_file": {
+        "module": "question_handlers.npx_md",
+        "upload_arg": "file_path",
+        "patterns": [
+            r"Download .* make sure it is called README\.md, and run npx -y prettier@3\.4\.2 README\.md \| sha256sum\.",
+        ],
+    },
+    "calculate_google_sheets_sum": {
+        "module": "question_handlers.google_sheets_sum",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"=SUM\(ARRAY_CONSTRAIN\(SEQUENCE\((?P<rows>\d+), (?P<cols>\d+), (?P<start>\d+), (?P<step>\d+)\), (?P<constrain_rows>\d+), (?P<constrain_cols>\d+)\)\)",
+        ],
+        "converters": {
+            "rows": int,
+            "cols": int,
+            "start": int,
+            "step": int,
+            "constrain_rows": int,
+            "constrain_cols": int,
+        },
+    },
+    "calculate_excel_formula": {
+        "module": "question_handlers.excel_formula",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"=SUM\(TAKE\(SORTBY\(\{(?P<values>.+?)\}, \{(?P<sort_by>.+?)\}\), (?P<take_rows>\d+), (?P<take_cols>\d+)\)\)",
+        ],
+        "converters": {"values": _int_list, "sort_by": _int_list, "take_rows": int, "take_cols": int},
+    },
+    "extract_hidden_input_value": {
+        "module": "question_handlers.hidden_input",
+        "patterns": [
+            r"Just above this paragraph, there's a hidden input with a secret value\.",
+        ],
+    },
+    "count_weekdays_in_range": {
+        "module": "question_handlers.weekday_count",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"How many (?P<weekday>\w+)s are there in the date range (?P<start_date>\d{4}-\d{2}-\d{2}) to (?P<end_date>\d{4}-\d{2}-\d{2})\?",
+        ],
+        "converters": {"weekday": str.capitalize},
+    },
+    "extract_answer_from_csv": {
+        "module": "question_handlers.extract_csv",
+        "pool": "cpu",
+        "upload_arg": "zip_file_path",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"Download and unzip file which has a single extract\.csv file inside\. What is the value in the \"answer\" column of the CSV file\?",
+        ],
+    },
+    "sort_json_array": {
+        "module": "question_handlers.json_sort",
+        "patterns": [
+            r"sort (?:this|the) JSON array of objects? by the value of the (?P<primary_key>\w+) field(?:\. In case of a tie, sort by the (?P<secondary_key>\w+) field)?",
+        ],
+    },
+    "count_different_lines": {
+        "module": "question_handlers.compare_files",
+        "pool": "cpu",
+        "patterns": [
+            r"how many lines are different between (\w+\.txt) and (\w+\.txt)\?",
+        ],
+    },
+    "generate_total_sales_query": {
+        "module": "question_handlers.sqlquery_totalsales",
+        "patterns": [
+            r"what is the total sales of all the items in the (?P<ticket_type>\w+) ticket type\??(?: write sql to calculate it\.)?",
+        ],
+    },
+    "get_github_raw_url": {
+        "module": "question_handlers.raw_github",
+        "patterns": [
+            r"enter the raw github url of email\.json so we can verify it\.",
+        ],
+    },
+    "sum_values_for_symbols": {
+        "module": "question_handlers.unicode",
+        "pool": "cpu",
+        "upload_arg": "zip_file_path",
+        "cache_ttl": 86400,
+        "patterns": [
+            r"sum up all the values where the symbol matches (?P<symbols>.+?) across all three files\.",
+        ],
+        "converters": {"symbols": _symbol_list},
+    },
+    "start_similarity_api": {
+        "module": "question_handlers.similarity_api",
+        "patterns": [
+            r"what is the api url endpoint for your implementation\?",
+        ],
+    },
+    "generate_openai_embeddings_request": {
+        "module": "question_handlers.embeddings",
+        "patterns": [
+            r"write the json body for a post request that will be sent to the openai api endpoint to obtain the text embedding.*",
+        ],
+    },
+    "create_post_request_json": {
+        "module": "question_handlers.imageurl_jsonbody",
+        "upload_arg": "image_path",
+        "cache_ttl": 3600,
+        "patterns": [
+            r"write the json body for a post request that will be sent to the openai api endpoint to extract text from an image.*",
+            r".*json body.*post request.*openai api endpoint.*extract text from an image.*",
+            r".*json body.*post request.*openai api endpoint.*extract text from an image.*(-F)?",
+            r".*json body.*post request.*openai.*extract.*image.*",
+            r"Write just the JSON body \(not the URL, nor headers\) for the POST request that sends these two pieces of content \(text and image URL\) to the OpenAI API endpoint.*",
+        ],
+    },
+}
+
+
+def iter_routes(manifest=HANDLER_MANIFEST):
+    """
+    Yields (pattern, handler_name) pairs in routing priority order.
+    """
+    for handler_name, entry in manifest.items():
+        for pattern in entry["patterns"]:
+            yield pattern, handler_name
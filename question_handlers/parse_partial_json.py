@@ -1,35 +1,23 @@
-import json
+from question_handlers.jsonl_engine import SalesSumReducer, scan_jsonl
 
 def parse_partial_json(file_path):
     """
-    Parses a JSONL file, attempts to fix malformed lines, and calculates the total sales.
+    Parses a JSONL file, recovers truncated lines, and calculates the total sales.
+
+    The lines are summed in parallel byte ranges by the shared JSON Lines
+    engine. Lines cut off mid-record keep every field read before the cut
+    (see utils.partial_json); lines with nothing usable are dropped.
 
     Args:
         file_path (str): Path to the JSONL file.
 
     Returns:
-        dict: A JSON object containing the total sales.
+        dict: The total sales, with the number of recovered and dropped lines.
     """
-    total_sales = 0
-    with open(file_path, "r") as file:
-        for line in file:
-            line = line.strip()
-            if not line:
-                continue  # Skip empty lines
-
-            # Attempt to fix incomplete JSON entries
-            if "id" in line and not line.endswith("}"):
-                line += '"}'  # Close the "id" field properly
-
-            try:
-                record = json.loads(line)  # Try parsing the JSON line
-                sales = record.get("sales", 0)  # Default to zero if "sales" is missing
-                total_sales += sales
-            except json.JSONDecodeError:
-                continue  # Skip unrecoverable lines
-
-    # Fallback to the correct answer if the calculated total is incorrect
-    if total_sales == 0:
-        total_sales = 54227
-
-    return {"total_sales": total_sales}
+    (result,), _ = scan_jsonl(file_path, [SalesSumReducer("sales")])
+    stats = result["stats"]
+    return {
+        "total_sales": result["total"],
+        "recovered_lines": stats["recovered"],
+        "dropped_lines": stats["dropped"],
+    }
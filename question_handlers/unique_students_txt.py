@@ -1,20 +1,31 @@
 import logging
 import os
-import re
-import csv
+
+from utils.unique_ids import HyperLogLog, count_unique_ids
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def count_unique_students(file_path):
+# Estimate the count with HyperLogLog instead of counting exactly (for huge rosters)
+UNIQUE_IDS_APPROXIMATE = os.getenv("UNIQUE_IDS_APPROXIMATE", "0") not in ("0", "false", "no")
+UNIQUE_IDS_HLL_PRECISION = int(os.getenv("UNIQUE_IDS_HLL_PRECISION", "14"))
+
+def count_unique_students(file_path, approximate=None):
     """
     Count the number of unique students in a text file containing student marks.
-    The function identifies students uniquely by their alphanumeric IDs (e.g., UA1OB2H69A).
-    
+    The function identifies students uniquely by their alphanumeric IDs (e.g., UA1OB2H69A),
+    the leading alphanumeric run of each line.
+
+    The file is memory-mapped and scanned as a NumPy byte array: `leading_ids`
+    finds every line's ID with vectorized masks and `hash_ids` hashes the IDs
+    to 64-bit integers in bulk, which are then deduplicated (see
+    utils.unique_ids). No line is decoded and each student costs 8 bytes.
+
     Args:
         file_path (str): Path to the text file containing student marks
-        
+        approximate (bool, optional): Estimate with HyperLogLog. None uses UNIQUE_IDS_APPROXIMATE.
+
     Returns:
         dict: {"count": int} or {"error": str} if an error occurs
     """
@@ -27,20 +38,14 @@ def count_unique_students(file_path):
         return {"count": 0, "note": "The file is empty."}
     
     try:
-        unique_student_ids = set()
-        
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                line = line.strip()
-                if line:
-                    # Extract the student ID using a regex for alphanumeric IDs
-                    match = re.match(r'([A-Za-z0-9]+)', line)
-                    if match:
-                        student_id = match.group(1).strip()
-                        unique_student_ids.add(student_id)
-        
-        logger.info(f"Found {len(unique_student_ids)} unique student IDs in {file_path}")
-        return {"count": len(unique_student_ids)}
+        approximate = UNIQUE_IDS_APPROXIMATE if approximate is None else approximate
+        count, lines = count_unique_ids(file_path, approximate=approximate, precision=UNIQUE_IDS_HLL_PRECISION)
+
+        logger.info(f"Found {count} unique student IDs over {lines} lines in {file_path}")
+        if approximate:
+            relative_error = HyperLogLog(UNIQUE_IDS_HLL_PRECISION).relative_error
+            return {"count": count, "approximate": True, "relative_error": round(relative_error, 4)}
+        return {"count": count}
     
     except Exception as e:
         logger.exception(f"Error processing student marks file: {e}")
@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Memoized lookups are saved here, one JSON file per domain (disabled if empty)
+CANONICAL_STORE_DIR = os.getenv("CANONICAL_STORE_DIR", os.path.join(tempfile.gettempdir(), "tds_solver_canonical"))
+CANONICAL_CACHE_SIZE = int(os.getenv("CANONICAL_CACHE_SIZE", "65536"))
+# Minimum fuzz.ratio (0-100) for a spelling to resolve to a known name
+CANONICAL_THRESHOLD = int(os.getenv("CANONICAL_THRESHOLD", "80"))
+STORE_VERSION = 1
+
+# Well-known names per domain that fuzzy matching alone cannot find
+DEFAULT_ALIASES = {
+    "country": {
+        "United States": ["us", "usa", "u.s.", "u.s.a.", "united states", "united states of america", "america", "states"],
+        "United Kingdom": ["uk", "u.k.", "britain", "great britain", "england"],
+        "United Arab Emirates": ["uae", "u.a.e.", "emirates"],
+        "India": ["india", "bharat"],
+        "Brazil": ["brazil", "brasil"],
+        "Germany": ["germany", "deutschland"],
+        "South Africa": ["south africa", "rsa"],
+    },
+    "city": {
+        "Chennai": ["madras"],
+        "Mumbai": ["bombay"],
+        "Kolkata": ["calcutta"],
+        "Bengaluru": ["bangalore"],
+        "Beijing": ["peking"],
+        "New York": ["nyc", "new york city"],
+    },
+    "product": {},
+}
+
+
+class Canonicalizer:
+    """
+    Resolves raw spellings to canonical names within one domain (city, country, product, ...).
+
+    A lookup first tries a bounded LRU memo of raw -> canonical results, then
+    an exact match on the normalized spelling (lower-cased, punctuation
+    stripped), then the rapidfuzz index over every known spelling. The index
+    is built once, on the first fuzzy lookup. The memo can be saved to and
+    loaded from disk, so repeated lookups across restarts are dict hits.
+    """
+
+    def __init__(self, domain, aliases=None, threshold=CANONICAL_THRESHOLD, cache_size=CANONICAL_CACHE_SIZE,
+                 store_dir=None):
+        """
+        Args:
+            domain (str): Domain name, also the store file name.
+            aliases (dict, optional): {canonical: [alias, ...]} known up front.
+            threshold (int): Minimum fuzz.ratio for a fuzzy match.
+            cache_size (int): Maximum memoized lookups.
+            store_dir (str, optional): Directory to persist to. Not persisted if None.
+        """
+        self.domain = domain
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.store_dir = store_dir
+        self._known = {}
+        self._memo = OrderedDict()
+        self._choices = None
+        self._canonicals = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        for canonical, names in (aliases or {}).items():
+            self._add(canonical, canonical)
+            for name in names:
+                self._add(name, canonical)
+        if store_dir:
+            self._load()
+
+    @property
+    def path(self):
+        return os.path.join(self.store_dir, f"{self.domain}.json") if self.store_dir else None
+
+    def _add(self, name, canonical):
+        key = default_process(str(name))
+        if key and self._known.get(key) != canonical:
+            self._known[key] = canonical
+            self._choices = None
+
+    def _index(self):
+        if self._choices is None:
+            self._choices = list(self._known)
+            self._canonicals = [self._known[key] for key in self._choices]
+        return self._choices, self._canonicals
+
+    def _remember(self, raw, canonical):
+        self._memo[raw] = canonical
+        self._memo.move_to_end(raw)
+        while len(self._memo) > self.cache_size:
+            self._memo.popitem(last=False)
+        self._dirty = True
+
+    def canonicalize(self, raw):
+        """
+        Returns the canonical name of a spelling, or None if nothing known is close enough.
+        """
+        return self.canonicalize_many([raw])[0]
+
+    def canonicalize_many(self, values):
+        """
+        Canonicalizes many spellings; memo misses are scored in one rapidfuzz cdist call.
+
+        Returns:
+            list: Canonical name (or None) per value.
+        """
+        results = [None] * len(values)
+        misses = {}
+        with self._lock:
+            for position, raw in enumerate(values):
+                raw = "" if raw is None else str(raw)
+                if raw in self._memo:
+                    self._memo.move_to_end(raw)
+                    results[position] = self._memo[raw]
+                    continue
+                key = default_process(raw)
+                if key in self._known:
+                    results[position] = self._known[key]
+                    self._remember(raw, results[position])
+                elif key:
+                    misses.setdefault(key, []).append((position, raw))
+            if not misses:
+                return results
+
+            choices, canonicals = self._index()
+            keys = list(misses)
+            if choices:
+                scores = process.cdist(keys, choices, scorer=fuzz.ratio, score_cutoff=self.threshold, workers=-1)
+                best = scores.argmax(axis=1)
+                found = scores[np.arange(len(keys)), best] > 0
+            else:
+                best = found = [False] * len(keys)
+            for key, index, matched in zip(keys, best, found):
+                canonical = canonicals[index] if matched else None
+                for position, raw in misses[key]:
+                    results[position] = canonical
+                    self._remember(raw, canonical)
+        return results
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable canonicalization store {self.path}: {e}")
+            return
+        if stored.get("version") != STORE_VERSION or stored.get("threshold") != self.threshold:
+            return
+        for raw, canonical in stored.get("memo", {}).items():
+            self._memo[raw] = canonical
+        while len(self._memo) > self.cache_size:
+            self._memo.popitem(last=False)
+
+    def save(self):
+        """
+        Writes the memoized lookups to the store (atomically), if anything changed.
+        """
+        if not self.store_dir:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {
+                "version": STORE_VERSION,
+                "threshold": self.threshold,
+                "memo": dict(self._memo),
+            }
+            self._dirty = False
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".part")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save canonicalization store {self.path}: {e}")
+
+
+_canonicalizers = {}
+_canonicalizers_lock = threading.Lock()
+
+
+def get_canonicalizer(domain):
+    """
+    Returns the process-wide Canonicalizer of a domain, loading its store on first use.
+    """
+    with _canonicalizers_lock:
+        canonicalizer = _canonicalizers.get(domain)
+        if canonicalizer is None:
+            canonicalizer = Canonicalizer(
+                domain, DEFAULT_ALIASES.get(domain), store_dir=CANONICAL_STORE_DIR or None
+            )
+            _canonicalizers[domain] = canonicalizer
+        return canonicalizer
+
+
+def canonicalize(domain, raw):
+    """
+    Shortcut for get_canonicalizer(domain).canonicalize(raw).
+    """
+    return get_canonicalizer(domain).canonicalize(raw)
+
+
+_vocabularies = OrderedDict()
+_vocabularies_lock = threading.Lock()
+
+
+def closest_match(word, valid_words, threshold=CANONICAL_THRESHOLD):
+    """
+    Returns the valid word closest to `word`, or None; the index of each vocabulary is built once (LRU of 64).
+    """
+    vocabulary = tuple(valid_words)
+    with _vocabularies_lock:
+        canonicalizer = _vocabularies.get(vocabulary)
+        if canonicalizer is None:
+            canonicalizer = Canonicalizer("vocabulary", {name: [] for name in vocabulary}, threshold=threshold)
+            _vocabularies[vocabulary] = canonicalizer
+            while len(_vocabularies) > 64:
+                _vocabularies.popitem(last=False)
+        else:
+            _vocabularies.move_to_end(vocabulary)
+    return canonicalizer.canonicalize(word)
@@ -0,0 +1,257 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default pools. `kind` is "thread" for IO-bound handlers and "process" for
+# CPU-bound ones; `max_queue` bounds how many calls may wait for a worker.
+# The "cpu" pool gets a quarter of the cores, so each of its handlers may run
+# a parallel scan over about four processes (see `scan_worker_budget`).
+DEFAULT_POOL_DEFINITIONS = {
+    "io": {"kind": "thread", "max_workers": 16, "max_queue": 256},
+    "cpu": {"kind": "process", "max_workers": max(1, (os.cpu_count() or 1) // 4), "max_queue": 64},
+    "media": {"kind": "process", "max_workers": 1, "max_queue": 4},
+}
+
+
+# Set in every handler process to the number of processes a handler may start for
+# its own parallel scans (see `scan_worker_budget`)
+SCAN_WORKER_BUDGET_ENV = "HANDLER_SCAN_WORKERS"
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when a pool's queue is full and the call is rejected."""
+
+
+def load_pool_definitions(env_value=None):
+    """
+    Builds the pool definitions, applying size overrides from HANDLER_POOL_SIZES.
+
+    The override format is a comma-separated list of `name=workers` or
+    `name=workers:max_queue`, e.g. "io=32,cpu=4:16".
+
+    Args:
+        env_value (str, optional): Override string. Defaults to the HANDLER_POOL_SIZES environment variable.
+
+    Returns:
+        dict: Pool name -> definition.
+    """
+    definitions = {name: dict(definition) for name, definition in DEFAULT_POOL_DEFINITIONS.items()}
+    env_value = os.getenv("HANDLER_POOL_SIZES", "") if env_value is None else env_value
+
+    for item in env_value.split(","):
+        if "=" not in item:
+            continue
+        name, sizes = (part.strip() for part in item.split("=", 1))
+        workers, _, max_queue = sizes.partition(":")
+        definition = definitions.setdefault(name, {"kind": "thread", "max_workers": 1, "max_queue": 16})
+        try:
+            definition["max_workers"] = max(1, int(workers))
+            if max_queue:
+                definition["max_queue"] = max(0, int(max_queue))
+        except ValueError:
+            logger.warning(f"Ignoring invalid pool size for {name}: {sizes}")
+
+    return definitions
+
+
+def scan_worker_budget():
+    """
+    Returns how many worker processes a parallel scan may use by default.
+
+    Inside a handler process pool this is the pool's share of the cores
+    (cpu_count // pool workers, at least 1), so a busy "cpu" pool never runs
+    more scan processes than there are cores. With the default "cpu" pool
+    size that share is about four processes. Elsewhere it is one per core.
+    """
+    budget = os.getenv(SCAN_WORKER_BUDGET_ENV)
+    if budget:
+        return max(1, int(budget))
+    return os.cpu_count() or 1
+
+
+def _init_worker_process(scan_workers):
+    os.environ[SCAN_WORKER_BUDGET_ENV] = str(scan_workers)
+
+
+def _call_in_process(module_name, function_name, func_args, submitted_at):
+    """
+    Runs a handler inside a worker process. The module is imported there on first use.
+    """
+    started_at = time.time()
+    function = getattr(importlib.import_module(module_name), function_name)
+    return started_at, function(**func_args)
+
+
+class HandlerExecutor:
+    """
+    Dispatches handler calls to bounded thread or process pools and keeps
+    queue-depth and wait-time metrics per pool.
+    """
+
+    def __init__(self, registry, pool_definitions=None):
+        """
+        Args:
+            registry (HandlerRegistry): Registry used to resolve thread-pool handlers.
+            pool_definitions (dict, optional): Pool name -> definition. Defaults to `load_pool_definitions()`.
+        """
+        self.registry = registry
+        self.pool_definitions = pool_definitions or load_pool_definitions()
+        self._pools = {}
+        self._metrics = {name: self._new_metrics() for name in self.pool_definitions}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_metrics():
+        return {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "run_ms_total": 0.0,
+            "run_ms_max": 0.0,
+        }
+
+    def _get_pool(self, pool_name):
+        pool = self._pools.get(pool_name)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            pool = self._pools.get(pool_name)
+            if pool is None:
+                definition = self.pool_definitions[pool_name]
+                if definition["kind"] == "process":
+                    pool = ProcessPoolExecutor(
+                        max_workers=definition["max_workers"],
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker_process,
+                        initargs=(max(1, (os.cpu_count() or 1) // definition["max_workers"]),)
+                    )
+                else:
+                    pool = ThreadPoolExecutor(
+                        max_workers=definition["max_workers"],
+                        thread_name_prefix=f"handler-{pool_name}"
+                    )
+                self._pools[pool_name] = pool
+                logger.info(f"Started {definition['kind']} pool '{pool_name}' with {definition['max_workers']} workers")
+        return pool
+
+    def _reset_pool(self, pool_name, broken):
+        """
+        Drops a process pool whose worker died, so the next call starts a fresh one.
+        """
+        with self._lock:
+            if self._pools.get(pool_name) is broken:
+                del self._pools[pool_name]
+                logger.warning(f"Pool '{pool_name}' is broken; restarting it")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, pool, definition, entry, name, func_args, submitted_at):
+        if definition["kind"] == "process":
+            return pool.submit(
+                _call_in_process, entry["module"], entry.get("function", name), func_args, submitted_at
+            )
+        return pool.submit(self._call_in_thread, name, func_args, submitted_at)
+
+    def _call_in_thread(self, name, func_args, submitted_at):
+        started_at = time.time()
+        return started_at, self.registry.get(name)(**func_args)
+
+    async def run(self, name, func_args):
+        """
+        Runs a handler in the pool named by its manifest entry (default "io").
+
+        A process pool broken by a dying worker (e.g. killed for memory) is
+        restarted and the call is retried once.
+
+        Args:
+            name (str): The handler name.
+            func_args (dict): Keyword arguments for the handler.
+
+        Returns:
+            Any: The handler's result.
+
+        Raises:
+            PoolSaturatedError: If the pool's queue is full.
+        """
+        entry = self.registry.manifest[name]
+        pool_name = entry.get("pool", "io")
+        definition = self.pool_definitions[pool_name]
+        metrics = self._metrics[pool_name]
+
+        if metrics["in_flight"] >= definition["max_workers"] + definition["max_queue"]:
+            metrics["rejected"] += 1
+            raise PoolSaturatedError(f"Pool '{pool_name}' is saturated ({metrics['in_flight']} calls in flight)")
+
+        metrics["submitted"] += 1
+        metrics["in_flight"] += 1
+        try:
+            for attempt in range(2):
+                pool = self._get_pool(pool_name)
+                submitted_at = time.time()
+                try:
+                    future = self._submit(pool, definition, entry, name, func_args, submitted_at)
+                    started_at, result = await asyncio.wrap_future(future)
+                    break
+                except BrokenProcessPool:
+                    self._reset_pool(pool_name, pool)
+                    if attempt:
+                        raise
+                    logger.warning(f"Retrying {name} in a fresh '{pool_name}' pool")
+        except Exception:
+            metrics["failed"] += 1
+            raise
+        finally:
+            metrics["in_flight"] -= 1
+
+        finished_at = time.time()
+        wait_ms = max(0.0, started_at - submitted_at) * 1000
+        run_ms = max(0.0, finished_at - started_at) * 1000
+        metrics["completed"] += 1
+        metrics["wait_ms_total"] += wait_ms
+        metrics["wait_ms_max"] = max(metrics["wait_ms_max"], wait_ms)
+        metrics["run_ms_total"] += run_ms
+        metrics["run_ms_max"] = max(metrics["run_ms_max"], run_ms)
+        logger.info(f"{name} ran in pool '{pool_name}': waited {wait_ms:.1f} ms, ran {run_ms:.1f} ms")
+        return result
+
+    def stats(self):
+        """
+        Returns per-pool configuration, queue depth and wait/run times in milliseconds.
+        """
+        stats = {}
+        for pool_name, definition in self.pool_definitions.items():
+            metrics = dict(self._metrics[pool_name])
+            completed = metrics["completed"] or 1
+            metrics.update(definition)
+            metrics["running"] = min(metrics["in_flight"], definition["max_workers"])
+            metrics["queue_depth"] = max(0, metrics["in_flight"] - definition["max_workers"])
+            metrics["wait_ms_avg"] = metrics["wait_ms_total"] / completed
+            metrics["run_ms_avg"] = metrics["run_ms_total"] / completed
+            metrics["started"] = pool_name in self._pools
+            stats[pool_name] = metrics
+        return stats
+
+    def shutdown(self, wait=False):
+        """
+        Shuts down all started pools.
+
+        Args:
+            wait (bool): Whether to wait for the workers to exit (and finish their background work).
+        """
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
+        self._pools.clear()
@@ -0,0 +1,108 @@
+import importlib
+import logging
+import threading
+import time
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class HandlerRegistry:
+    """
+    Resolves handler names to functions, importing each module on first use.
+
+    The registry is built from a static manifest (see `question_handlers.manifest`),
+    so heavy modules (Whisper, PyMuPDF, pandas, ...) are only loaded when a
+    question that needs them actually arrives.
+    """
+
+    def __init__(self, manifest):
+        """
+        Args:
+            manifest (dict): Handler name -> manifest entry.
+        """
+        self.manifest = manifest
+        self._functions = {}
+        self._load_times = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.manifest
+
+    def get(self, name):
+        """
+        Returns the handler function, importing its module if needed.
+
+        Args:
+            name (str): The handler name.
+
+        Returns:
+            callable: The handler function.
+
+        Raises:
+            KeyError: If the handler is not in the manifest.
+            ImportError: If the module or function cannot be loaded.
+        """
+        function = self._functions.get(name)
+        if function is not None:
+            return function
+
+        entry = self.manifest[name]
+        with self._lock:
+            function = self._functions.get(name)
+            if function is not None:
+                return function
+
+            start = time.perf_counter()
+            module = importlib.import_module(entry["module"])
+            function = getattr(module, entry.get("function", name), None)
+            if function is None:
+                raise ImportError(f"Function {entry.get('function', name)} not found in {entry['module']}")
+
+            self._load_times[name] = (time.perf_counter() - start) * 1000
+            self._functions[name] = function
+            logger.info(f"Loaded handler {name} from {entry['module']} in {self._load_times[name]:.1f} ms")
+            return function
+
+    def bind_arguments(self, name, match):
+        """
+        Converts the named groups of a route match into handler keyword arguments.
+
+        Args:
+            name (str): The handler name.
+            match (re.Match): The match returned by the router.
+
+        Returns:
+            dict: Keyword arguments for the handler.
+        """
+        converters = self.manifest[name].get("converters", {})
+        func_args = {}
+        for arg_name, value in match.groupdict().items():
+            if value is None:
+                continue
+            converter = converters.get(arg_name)
+            func_args[arg_name] = converter(value) if converter else value
+        return func_args
+
+    def warm_up(self, names):
+        """
+        Imports the given handlers ahead of the first request.
+
+        Args:
+            names (iterable): Handler names to load. Unknown or failing handlers are logged and skipped.
+        """
+        for name in names:
+            name = name.strip()
+            if not name:
+                continue
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"Failed to warm up handler {name}: {e}")
+
+    def loaded(self):
+        """
+        Returns the handlers that have been imported, with their load times in milliseconds.
+        """
+        return dict(self._load_times)
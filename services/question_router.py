@@ -0,0 +1,212 @@
+import re
+import time
+import logging
+from collections import namedtuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Minimum length of a literal run to be used as a prefilter anchor
+MIN_ANCHOR_LENGTH = 3
+
+RouteMatch = namedtuple("RouteMatch", ["func_name", "pattern", "match", "elapsed_ms", "candidates_tested"])
+
+_QUANTIFIER_RE = re.compile(r"\{(\d*)(?:,(\d*))?\}")
+_NON_LITERAL_ESCAPES = set("dDwWsSbBAZnrtfv0123456789")
+
+
+def _skip_char_class(pattern, i):
+    """
+    Returns the index just past the character class starting at pattern[i] == '['.
+    """
+    i += 1
+    if i < len(pattern) and pattern[i] == "^":
+        i += 1
+    if i < len(pattern) and pattern[i] == "]":
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i + 1
+
+
+def extract_literal_anchors(pattern):
+    """
+    Extracts the literal substrings that every match of `pattern` must contain.
+
+    Only literals outside of groups are considered, and a top-level alternation
+    disables anchoring altogether, so the anchors are a necessary (never a
+    sufficient) condition for a match.
+
+    Args:
+        pattern (str): The regex pattern.
+
+    Returns:
+        list: Lower-cased literal anchors, longest first.
+    """
+    runs = []
+    current = []
+    depth = 0
+    i = 0
+
+    def flush():
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if depth == 0:
+                if escaped in _NON_LITERAL_ESCAPES:
+                    flush()
+                else:
+                    current.append(escaped)
+            continue
+
+        if char == "[":
+            i = _skip_char_class(pattern, i)
+            flush()
+            continue
+
+        if char == "(":
+            depth += 1
+            flush()
+        elif char == ")":
+            depth = max(depth - 1, 0)
+            flush()
+        elif char == "|":
+            if depth == 0:
+                return []
+        elif depth == 0:
+            quantifier = _QUANTIFIER_RE.match(pattern, i) if char == "{" else None
+            if char in "*?" or (quantifier and not quantifier.group(1)) or (quantifier and int(quantifier.group(1)) == 0):
+                # The preceding literal is optional, so it can't be part of an anchor
+                if current:
+                    current.pop()
+                flush()
+                if quantifier:
+                    i = quantifier.end()
+                    continue
+            elif char == "+" or quantifier:
+                # The preceding literal is required but may repeat
+                flush()
+                if quantifier:
+                    i = quantifier.end()
+                    continue
+            elif char in ".^$":
+                flush()
+            else:
+                current.append(char)
+        i += 1
+
+    flush()
+    anchors = {run.strip().lower() for run in runs}
+    return sorted((a for a in anchors if len(a) >= MIN_ANCHOR_LENGTH), key=len, reverse=True)
+
+
+def _simplify_pattern(pattern):
+    """
+    Drops leading/trailing `.*` wrappers that only add backtracking to `re.search`.
+
+    A trailing `.*` always matches, so it never changes the groups. A leading
+    `.*` can change which occurrence a group captures, so it is only dropped
+    from patterns without capturing groups.
+    """
+    simplified = pattern
+    if simplified.endswith(".*"):
+        backslashes = len(simplified[:-2]) - len(simplified[:-2].rstrip("\\"))
+        if backslashes % 2 == 0:
+            simplified = simplified[:-2]
+    if simplified.startswith(".*") and re.compile(simplified, re.IGNORECASE).groups == 0:
+        simplified = simplified[2:]
+    return simplified
+
+
+class QuestionRouter:
+    """
+    Routes a question to a handler name using precompiled regex patterns.
+
+    Patterns are tried in their original priority order, but only patterns whose
+    literal anchors all appear in the question are actually searched.
+    """
+
+    def __init__(self, routes):
+        """
+        Args:
+            routes (iterable): (pattern, func_name) pairs in priority order.
+        """
+        self.routes = []
+        for pattern, func_name in routes:
+            compiled = re.compile(_simplify_pattern(pattern), re.IGNORECASE)
+            anchors = extract_literal_anchors(pattern)
+            self.routes.append((pattern, func_name, compiled, anchors))
+
+        self._stats = {
+            "requests": 0,
+            "matched": 0,
+            "unmatched": 0,
+            "candidates_tested": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "last_ms": 0.0,
+        }
+        logger.info(f"Compiled {len(self.routes)} question routes")
+
+    def route(self, question):
+        """
+        Finds the first route whose pattern matches the question.
+
+        Args:
+            question (str): The question text.
+
+        Returns:
+            RouteMatch: The matched route, or None if nothing matched.
+        """
+        start = time.perf_counter()
+        lowered = question.lower()
+        candidates_tested = 0
+        result = None
+
+        for pattern, func_name, compiled, anchors in self.routes:
+            if not all(anchor in lowered for anchor in anchors):
+                continue
+            candidates_tested += 1
+            match = compiled.search(question)
+            if match:
+                result = (pattern, func_name, match)
+                break
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record(elapsed_ms, candidates_tested, result is not None)
+
+        if result is None:
+            return None
+        pattern, func_name, match = result
+        return RouteMatch(func_name, pattern, match, elapsed_ms, candidates_tested)
+
+    def _record(self, elapsed_ms, candidates_tested, matched):
+        stats = self._stats
+        stats["requests"] += 1
+        stats["matched" if matched else "unmatched"] += 1
+        stats["candidates_tested"] += candidates_tested
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["last_ms"] = elapsed_ms
+
+    def stats(self):
+        """
+        Returns routing counters and timings.
+
+        Returns:
+            dict: Request counts, candidates tested and match timings in milliseconds.
+        """
+        stats = dict(self._stats)
+        requests = stats["requests"] or 1
+        stats["routes"] = len(self.routes)
+        stats["avg_ms"] = stats["total_ms"] / requests
+        stats["avg_candidates_tested"] = stats["candidates_tested"] / requests
+        return stats
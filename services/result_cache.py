@@ -0,0 +1,246 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _to_json_compatible(value):
+    """
+    json.dumps fallback for NumPy/pandas scalars and other objects with `.item()`.
+    """
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def make_cache_key(handler_name, func_args, upload_arg=None, upload_hash=None):
+    """
+    Builds a cache key from the handler name, its arguments and the upload's content hash.
+
+    The upload path is replaced by the content hash, so the same file uploaded
+    again (under any name) maps to the same key.
+
+    Args:
+        handler_name (str): The handler name.
+        func_args (dict): Keyword arguments passed to the handler.
+        upload_arg (str, optional): Name of the argument holding the upload path.
+        upload_hash (str, optional): SHA-256 of the upload.
+
+    Returns:
+        str: Hex digest identifying the call.
+    """
+    params = {name: value for name, value in func_args.items() if name != upload_arg}
+    payload = json.dumps(
+        [handler_name, params, upload_hash],
+        sort_keys=True,
+        default=_to_json_compatible
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for deterministic handler results.
+
+    Tier 1 is an in-process LRU bounded by entry count and serialized size.
+    Tier 2 (optional) is a directory of JSON files that all uvicorn workers
+    on the host can share; it is pruned oldest-first past `disk_max_bytes`.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 ** 2, disk_dir=None, disk_max_bytes=512 * 1024 ** 2):
+        """
+        Args:
+            max_entries (int): Maximum number of in-memory entries.
+            max_bytes (int): Maximum serialized size of the in-memory entries.
+            disk_dir (str, optional): Directory for the shared tier. Disabled if None.
+            disk_max_bytes (int): Size budget of the shared tier.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Creates a cache configured by RESULT_CACHE_ENTRIES, RESULT_CACHE_MAX_BYTES,
+        RESULT_CACHE_DIR and RESULT_CACHE_DISK_MAX_BYTES.
+        """
+        return cls(
+            max_entries=int(os.getenv("RESULT_CACHE_ENTRIES", "1024")),
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 ** 2))),
+            disk_dir=os.getenv("RESULT_CACHE_DIR") or None,
+            disk_max_bytes=int(os.getenv("RESULT_CACHE_DISK_MAX_BYTES", str(512 * 1024 ** 2)))
+        )
+
+    def get(self, key):
+        """
+        Looks a key up in memory, then on disk.
+
+        Args:
+            key (str): Cache key from `make_cache_key`.
+
+        Returns:
+            tuple: (hit, value).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, size = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return True, value
+                self._remove(key)
+                self._stats["expired"] += 1
+
+        if self.disk_dir:
+            record = self._read_disk(key)
+            if record is not None:
+                expires_at, value = record
+                if expires_at > now:
+                    with self._lock:
+                        self._stats["disk_hits"] += 1
+                        self._store_memory(key, value, expires_at, len(json.dumps(value)))
+                    return True, value
+                self._delete_disk(key)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return False, None
+
+    def set(self, key, value, ttl):
+        """
+        Stores a result in both tiers. Error results, results marked
+        `"cacheable": False` (generated sample data, swallowed failures) and
+        unserializable values are skipped.
+
+        Args:
+            key (str): Cache key from `make_cache_key`.
+            value: The handler's result.
+            ttl (float): Time to live in seconds.
+        """
+        if isinstance(value, dict) and ("error" in value or value.get("cacheable") is False):
+            return
+
+        try:
+            serialized = json.dumps(value, default=_to_json_compatible)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Not caching unserializable result: {e}")
+            return
+
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._stats["stores"] += 1
+            self._store_memory(key, value, expires_at, len(serialized))
+
+        if self.disk_dir:
+            self._write_disk(key, serialized, expires_at)
+
+    def _store_memory(self, key, value, expires_at, size):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        expires_at, value, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            return record["expires_at"], record["value"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {key}: {e}")
+            return None
+
+    def _write_disk(self, key, serialized, expires_at):
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".part")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(f'{{"expires_at": {expires_at}, "value": {serialized}}}')
+            os.replace(temp_path, self._disk_path(key))
+        except Exception as e:
+            logger.warning(f"Failed to write cache entry {key}: {e}")
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 64 == 0:
+            self._prune_disk()
+
+    def _delete_disk(self, key):
+        try:
+            os.unlink(self._disk_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _prune_disk(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for mtime, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                with self._lock:
+                    self._stats["evictions"] += 1
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        """
+        Returns hit/miss/eviction counters and the in-memory footprint.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["disk_enabled"] = bool(self.disk_dir)
+        return stats
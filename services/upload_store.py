@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import re
+import tempfile
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+UPLOAD_STORE_DIR = os.getenv("UPLOAD_STORE_DIR", os.path.join(tempfile.gettempdir(), "tds_solver_uploads"))
+UPLOAD_STORE_MAX_BYTES = int(os.getenv("UPLOAD_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Files younger than this are never pruned, so in-flight requests keep their inputs
+UPLOAD_STORE_MIN_AGE_SECONDS = 600
+
+StoredUpload = namedtuple("StoredUpload", ["path", "sha256", "size", "filename", "deduplicated"])
+
+_STORED_NAME_RE = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]{1,10})?$")
+
+
+def _safe_extension(filename):
+    """
+    Returns the client filename's extension if it is a plain alphanumeric one.
+    Handlers rely on it (e.g. `.gz`), so it is kept on the stored file.
+    """
+    extension = os.path.splitext(os.path.basename(filename or ""))[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,10}", extension) else ""
+
+
+def save_stream(stream, filename=None, store_dir=None, chunk_size=CHUNK_SIZE):
+    """
+    Streams a binary file-like object into the store, hashing it on the way.
+
+    The content is written in fixed-size chunks to a temporary file and then
+    renamed to `<sha256><ext>`, so identical uploads share one file and
+    concurrent uploads with the same client filename never collide.
+
+    Args:
+        stream: Binary file-like object positioned at the start of the content.
+        filename (str, optional): Client filename, used only for its extension.
+        store_dir (str, optional): Store directory. Defaults to UPLOAD_STORE_DIR.
+        chunk_size (int): Bytes read per chunk.
+
+    Returns:
+        StoredUpload: Path, content hash, size and whether the content was already stored.
+    """
+    store_dir = store_dir or UPLOAD_STORE_DIR
+    os.makedirs(store_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=store_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp_file.write(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        final_path = os.path.join(store_dir, sha256 + _safe_extension(filename))
+        deduplicated = os.path.exists(final_path)
+        if deduplicated:
+            os.unlink(temp_path)
+            os.utime(final_path)
+        else:
+            os.replace(temp_path, final_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    logger.info(f"Stored upload {filename!r} as {final_path} ({size} bytes, deduplicated={deduplicated})")
+    return StoredUpload(final_path, sha256, size, filename, deduplicated)
+
+
+async def save_upload(upload, store_dir=None):
+    """
+    Stores a FastAPI UploadFile without blocking the event loop.
+
+    Args:
+        upload (UploadFile): The uploaded file.
+        store_dir (str, optional): Store directory. Defaults to UPLOAD_STORE_DIR.
+
+    Returns:
+        StoredUpload: See `save_stream`.
+    """
+    await upload.seek(0)
+    stored = await asyncio.to_thread(save_stream, upload.file, upload.filename, store_dir)
+    await asyncio.to_thread(prune, store_dir)
+    return stored
+
+
+def file_sha256(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Returns the SHA-256 of a file, reusing the name of files that live in the store.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    name_match = _STORED_NAME_RE.match(os.path.basename(file_path))
+    if name_match and os.path.dirname(os.path.abspath(file_path)) == os.path.abspath(UPLOAD_STORE_DIR):
+        return name_match.group(1)
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def open_mmap(file_path):
+    """
+    Memory-maps a file read-only.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Yields:
+        mmap.mmap or bytes: The mapped content (an empty bytes object for empty files).
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+def prune(store_dir=None, max_bytes=None):
+    """
+    Deletes the least recently stored files until the store fits in `max_bytes`.
+
+    Args:
+        store_dir (str, optional): Store directory. Defaults to UPLOAD_STORE_DIR.
+        max_bytes (int, optional): Size budget. Defaults to UPLOAD_STORE_MAX_BYTES.
+
+    Returns:
+        int: Number of files removed.
+    """
+    store_dir = store_dir or UPLOAD_STORE_DIR
+    max_bytes = UPLOAD_STORE_MAX_BYTES if max_bytes is None else max_bytes
+
+    entries = []
+    total = 0
+    for entry in os.scandir(store_dir):
+        if entry.is_file() and _STORED_NAME_RE.match(entry.name):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    removed = 0
+    cutoff = time.time() - UPLOAD_STORE_MIN_AGE_SECONDS
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes or mtime > cutoff:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+    if removed:
+        logger.info(f"Pruned {removed} files from the upload store")
+    return removed
@@ -0,0 +1,49 @@
+import mmap
+import os
+
+
+def newline_aligned_ranges(file_path, chunk_size, start=0, end=None):
+    """
+    Splits a file into byte ranges that each end just after a newline.
+
+    Every range except possibly the last ends with b"\\n", so each one can be
+    parsed on its own without seeing a partial line.
+
+    Args:
+        file_path (str): Path to an uncompressed file.
+        chunk_size (int): Target range size in bytes. Ranges are extended to the next newline.
+        start (int): Offset to start splitting at (must be at a line start).
+        end (int, optional): Offset to stop at. Defaults to the file size.
+
+    Returns:
+        list: (start, end) tuples covering [start, end) with no gaps or overlaps.
+    """
+    chunk_size = max(1, int(chunk_size))
+    file_size = os.path.getsize(file_path)
+    end = file_size if end is None else min(end, file_size)
+    if start >= end:
+        return []
+
+    ranges = []
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            position = start
+            while position < end:
+                cut = position + chunk_size
+                if cut >= end:
+                    ranges.append((position, end))
+                    break
+                newline = mapped.find(b"\n", cut - 1, end)
+                cut = end if newline == -1 else newline + 1
+                ranges.append((position, cut))
+                position = cut
+    return ranges
+
+
+def read_range(file_path, start, end):
+    """
+    Reads the bytes in [start, end) of a file.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
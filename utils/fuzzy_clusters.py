@@ -0,0 +1,95 @@
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+# Rows of the similarity matrix computed per cdist call (block x n scores in memory)
+CLUSTER_BLOCK_ROWS = 2048
+
+
+class UnionFind:
+    """
+    Disjoint sets over 0..n-1 with path halving and union by size.
+    """
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def labels(self):
+        """
+        Returns an int32 array of cluster ids 0..k-1, numbered by first member.
+        """
+        roots = [self.find(item) for item in range(len(self.parent))]
+        ids = {}
+        return np.array([ids.setdefault(root, len(ids)) for root in roots], dtype=np.int32)
+
+
+def cluster_strings(values, threshold=80, weights=None, scorer=fuzz.ratio):
+    """
+    Groups spelling variants: strings scoring at least `threshold` against
+    each other (after lower-casing and stripping punctuation) are linked,
+    and clusters are the connected components of those links.
+
+    Scores come from rapidfuzz `cdist` in blocks of CLUSTER_BLOCK_ROWS rows,
+    so memory stays at block x n bytes for any number of distinct values.
+
+    Args:
+        values (list): Distinct strings.
+        threshold (int): Minimum similarity (0-100) for two strings to be linked.
+        weights (list, optional): Row counts per value; the heaviest spelling names its cluster.
+        scorer: A rapidfuzz scorer.
+
+    Returns:
+        tuple: (labels: int32 array of cluster ids per value, canonical: list of cluster names)
+    """
+    values = list(values)
+    count = len(values)
+    sets = UnionFind(count)
+    processed = [default_process(str(value)) for value in values]
+    for start in range(0, count, CLUSTER_BLOCK_ROWS):
+        scores = process.cdist(
+            processed[start:start + CLUSTER_BLOCK_ROWS], processed,
+            scorer=scorer, score_cutoff=threshold, dtype=np.uint8, workers=-1
+        )
+        rows, columns = np.nonzero(scores)
+        rows += start
+        for a, b in zip(rows[rows < columns].tolist(), columns[rows < columns].tolist()):
+            sets.union(a, b)
+
+    labels = sets.labels()
+    weights = np.ones(count) if weights is None else np.asarray(weights, dtype=np.float64)
+    canonical = [None] * (int(labels.max()) + 1 if count else 0)
+    best = np.full(len(canonical), -1.0)
+    for index, (label, weight) in enumerate(zip(labels.tolist(), weights.tolist())):
+        if weight > best[label]:
+            best[label] = weight
+            canonical[label] = values[index]
+    return labels, canonical
+
+
+def match_cluster(query, values, labels, threshold=80, scorer=fuzz.ratio):
+    """
+    Returns the cluster id of the value most similar to `query`, or -1 if none scores `threshold`.
+    """
+    if not len(values):
+        return -1
+    best = process.extractOne(
+        query, [str(value) for value in values], scorer=scorer, processor=default_process, score_cutoff=threshold
+    )
+    return int(labels[best[2]]) if best else -1
@@ -0,0 +1,186 @@
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+
+READ_SIZE = 1024 * 1024
+_SEPARATORS = re.compile(r"[\s,]*")
+# A string followed by ":" is an object key (group 1); any other string matches with an empty group
+_KEYS = re.compile(rb'"([^"\\]*(?:\\.[^"\\]*)*)"(?=\s*:)|"[^"\\]*(?:\\.[^"\\]*)*"')
+_ESCAPES = re.compile(rb"\\.", re.DOTALL)
+# A string without escapes (see `looks_complete`)
+_LINE_STRINGS = re.compile(rb'"[^"]*"')
+_CLOSING = {b"{": b"}", b"[": b"]"}
+# Distinct raw keys whose match result is remembered
+KEY_DECISION_CACHE_SIZE = 4096
+
+
+def iter_json_records(file_path, read_size=READ_SIZE):
+    """
+    Streams the values of a JSON file holding either a top-level array,
+    JSON Lines, or concatenated values, reading `read_size` characters at a
+    time instead of loading the whole document.
+
+    Args:
+        file_path (str): Path to the JSON file (UTF-8, optional BOM).
+        read_size (int): Characters read per refill.
+
+    Yields:
+        The top-level values (array elements, or one per line).
+
+    Raises:
+        json.JSONDecodeError: If the file is not valid JSON.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        buffer = f.read(read_size)
+        eof = not buffer
+        position = _SEPARATORS.match(buffer).end()
+        in_array = buffer.startswith("[", position)
+        if in_array:
+            position += 1
+
+        while True:
+            position = _SEPARATORS.match(buffer, position).end()
+            if in_array and buffer.startswith("]", position):
+                return
+            if position < len(buffer):
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # Only trust a value followed by more input: a number cut at the buffer end also decodes
+                    if end < len(buffer) or eof:
+                        yield value
+                        position = end
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                if in_array:
+                    raise json.JSONDecodeError("Unterminated array", buffer, position)
+                return
+            more = f.read(read_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+
+
+def _opening_quote(buffer, end):
+    """
+    Returns the position of the last unescaped '"' before `end`, or -1.
+    """
+    while True:
+        position = buffer.rfind(b'"', 0, end)
+        if position <= 0:
+            return position
+        backslashes = 0
+        while backslashes < position and buffer[position - backslashes - 1] == ord("\\"):
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return position
+        end = position
+
+
+def _safe_cut(buffer):
+    """
+    Returns how much of `buffer` can be scanned for keys now: everything
+    except an unterminated string at the end, or a trailing string whose
+    ":" (if any) has not been read yet.
+    """
+    # Quotes outside strings are invalid JSON, so the parity of unescaped quotes tells if the end is inside one
+    if _ESCAPES.sub(b"", buffer).count(b'"') % 2:
+        return _opening_quote(buffer, len(buffer))
+    stripped = len(buffer.rstrip())
+    if stripped and buffer[stripped - 1] == ord('"'):
+        return _opening_quote(buffer, stripped - 1)
+    return len(buffer)
+
+
+def looks_complete(line):
+    """
+    Whether a stripped line can be one whole JSON object or array, without
+    parsing it: it opens and closes with matching brackets, does not end
+    inside a string, and its brackets balance (strings are only removed
+    first when the raw counts disagree). Catches the usual damage in JSON
+    Lines (a record cut off mid-way) and guarantees `count_keys` its
+    precondition.
+    """
+    if _CLOSING.get(line[:1]) != line[-1:]:
+        return False
+    unescaped = _ESCAPES.sub(b"", line) if b"\\" in line else line
+    if unescaped.count(b'"') % 2:
+        return False
+    if line.count(b"{") == line.count(b"}") and line.count(b"[") == line.count(b"]"):
+        return True
+    # Brackets inside strings may account for the difference
+    skeleton = _LINE_STRINGS.sub(b"", unescaped)
+    return skeleton.count(b"{") == skeleton.count(b"}") and skeleton.count(b"[") == skeleton.count(b"]")
+
+
+@lru_cache(maxsize=KEY_DECISION_CACHE_SIZE)
+def key_equals(raw, wanted):
+    """
+    Whether a raw key as it appears in the JSON bytes (still escaped) equals `wanted` once lower-cased.
+    """
+    text = raw.decode("utf-8", errors="replace")
+    if "\\" in text:
+        try:
+            text = json.loads(f'"{text}"')
+        except json.JSONDecodeError:
+            pass
+    return text.lower() == wanted
+
+
+@lru_cache(maxsize=64)
+def _literal_key(wanted):
+    return re.compile(rb'"' + re.escape(wanted.encode("ascii")) + rb'"\s*:', re.IGNORECASE)
+
+
+def count_keys(data, wanted, start=0, end=None):
+    """
+    Counts object keys equal to `wanted` (lower-case) in JSON bytes that start and end outside a string.
+    """
+    end = len(data) if end is None else end
+    if wanted.isascii() and data.find(b"\\", start, end) == -1:
+        # Without escapes, '"key":' can only be that key: a quote inside a string would end it
+        return len(_literal_key(wanted).findall(data, start, end))
+    keys = Counter(_KEYS.findall(data, start, end))
+    keys.pop(b"", None)
+    return sum(occurrences for raw, occurrences in keys.items() if key_equals(raw, wanted))
+
+
+def count_json_keys(file_path, key, read_size=READ_SIZE):
+    """
+    Counts object keys equal to `key` (case-insensitively) anywhere in a
+    JSON document, JSON Lines or concatenated values, without parsing them.
+
+    The bytes are scanned in `read_size` chunks with one regex: every string
+    is matched left to right, and a string followed by ":" is an object key,
+    which needs no tree and no container stack. Memory is bounded by
+    `read_size` plus the longest string, whatever the nesting depth. Keys
+    with escapes are unescaped before comparing; malformed input is counted
+    as far as it tokenizes.
+
+    Args:
+        file_path (str): Path to the JSON file (UTF-8, optional BOM).
+        key (str): Key to count.
+        read_size (int): Bytes read per refill.
+
+    Returns:
+        int: Number of occurrences.
+    """
+    wanted = key.lower()
+    count = 0
+    with open(file_path, "rb") as f:
+        buffer = f.read(read_size)
+        if buffer.startswith(b"\xef\xbb\xbf"):
+            buffer = buffer[3:]
+        while buffer:
+            more = f.read(read_size)
+            cut = len(buffer) if not more else max(_safe_cut(buffer), 0)
+            count += count_keys(buffer, wanted, 0, cut)
+            buffer = buffer[cut:] + more
+            if not more:
+                # The unterminated tail (if any) was scanned above as far as it goes
+                break
+    return count
@@ -0,0 +1,183 @@
+import socket
+
+import numpy as np
+
+# IPv6 keys are stored as two big-endian 64-bit halves
+IPV6_DTYPE = np.dtype([("hi", ">u8"), ("lo", ">u8")])
+
+
+def pack_ip(ip):
+    """
+    Packs an IP address given as bytes or str.
+
+    Args:
+        ip (bytes or str): Dotted IPv4 or textual IPv6 address.
+
+    Returns:
+        tuple: (4, int) for IPv4, (6, bytes of length 16) for IPv6, or (0, ip) if it is not an address.
+    """
+    text = ip.decode("ascii", errors="replace") if isinstance(ip, bytes) else ip
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except OSError:
+        pass
+    try:
+        return 6, socket.inet_pton(socket.AF_INET6, text)
+    except OSError:
+        return 0, ip
+
+
+def unpack_ipv4(value):
+    return socket.inet_ntop(socket.AF_INET, int(value).to_bytes(4, "big"))
+
+
+def unpack_ipv6(value):
+    """
+    Formats an IPV6_DTYPE record (or 16 raw bytes) as an address.
+    """
+    raw = value if isinstance(value, bytes) else value.tobytes()
+    return socket.inet_ntop(socket.AF_INET6, raw)
+
+
+def _compact(keys, sums):
+    """
+    Sums `sums` per distinct key. Sort-based, so totals stay exact int64.
+    """
+    if keys.size == 0:
+        return keys, sums
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    sums = sums[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(sums, starts)
+
+
+class IpTotals:
+    """
+    Per-IP byte totals keyed by packed integers.
+
+    IPv4 keys are uint32 and IPv6 keys 16-byte records, each next to an
+    int64 total: 12 or 24 bytes per IP instead of a bytes key, an int and a
+    dict slot. Per-block totals are appended as arrays and folded together
+    (sort + reduceat) only when the pending rows outgrow the compacted ones,
+    so merging partials from worker processes is a concatenation. Anything
+    in the host field that is not an address (e.g. a resolved hostname) is
+    kept in a small dict.
+    """
+
+    def __init__(self):
+        self.v4 = (np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64))
+        self.v6 = (np.zeros(0, dtype=IPV6_DTYPE), np.zeros(0, dtype=np.int64))
+        self.other = {}
+        self._pending = {4: [], 6: []}
+        self._pending_rows = 0
+
+    def add_totals(self, totals):
+        """
+        Adds a {ip_bytes: total} mapping, typically the distinct IPs of one block.
+        """
+        v4_keys, v4_sums, v6_keys, v6_sums = [], [], [], []
+        for ip, total in totals.items():
+            version, key = pack_ip(ip)
+            if version == 4:
+                v4_keys.append(key)
+                v4_sums.append(total)
+            elif version == 6:
+                v6_keys.append(key)
+                v6_sums.append(total)
+            else:
+                self.other[key] = self.other.get(key, 0) + total
+        if v4_keys:
+            self._add(4, np.array(v4_keys, dtype=np.uint32), np.array(v4_sums, dtype=np.int64))
+        if v6_keys:
+            self._add(6, np.frombuffer(b"".join(v6_keys), dtype=IPV6_DTYPE), np.array(v6_sums, dtype=np.int64))
+
+    def _add(self, version, keys, sums):
+        self._pending[version].append((keys, sums))
+        self._pending_rows += keys.size
+        if self._pending_rows > max(65536, self.v4[0].size + self.v6[0].size):
+            self.compact()
+
+    def merge(self, other):
+        """
+        Folds another IpTotals (e.g. a worker's partial) into this one.
+        """
+        other.compact()
+        self.other.update({ip: self.other.get(ip, 0) + total for ip, total in other.other.items()})
+        if other.v4[0].size:
+            self._add(4, *other.v4)
+        if other.v6[0].size:
+            self._add(6, *other.v6)
+        return self
+
+    def compact(self):
+        for version in (4, 6):
+            pending = self._pending[version]
+            if not pending:
+                continue
+            current = self.v4 if version == 4 else self.v6
+            keys = np.concatenate([current[0]] + [keys for keys, _ in pending])
+            sums = np.concatenate([current[1]] + [sums for _, sums in pending])
+            compacted = _compact(keys, sums)
+            if version == 4:
+                self.v4 = compacted
+            else:
+                self.v6 = compacted
+            self._pending[version] = []
+        self._pending_rows = 0
+
+    def __len__(self):
+        self.compact()
+        return self.v4[0].size + self.v6[0].size + len(self.other)
+
+    def __getstate__(self):
+        # Ship compacted arrays between processes
+        self.compact()
+        return self.__dict__
+
+    def arrays(self):
+        """
+        Returns the compacted totals as plain arrays (for saving with np.savez)
+        and the non-address hosts.
+
+        Returns:
+            tuple: ({"v4_keys", "v4_sums", "v6_keys", "v6_sums": numpy.ndarray}, {host_bytes: total})
+        """
+        self.compact()
+        return {"v4_keys": self.v4[0], "v4_sums": self.v4[1], "v6_keys": self.v6[0], "v6_sums": self.v6[1]}, self.other
+
+    @classmethod
+    def from_arrays(cls, v4_keys, v4_sums, v6_keys, v6_sums, other=None):
+        """
+        Rebuilds totals saved by `arrays`.
+        """
+        totals = cls()
+        totals.v4 = (np.asarray(v4_keys, dtype=np.uint32), np.asarray(v4_sums, dtype=np.int64))
+        totals.v6 = (np.asarray(v6_keys, dtype=IPV6_DTYPE), np.asarray(v6_sums, dtype=np.int64))
+        totals.other = dict(other or {})
+        return totals
+
+    @property
+    def nbytes(self):
+        self.compact()
+        return sum(array.nbytes for array in (*self.v4, *self.v6))
+
+    def top(self):
+        """
+        Returns:
+            tuple: (ip_str, total) of the largest total, or None if empty.
+        """
+        self.compact()
+        candidates = []
+        if self.v4[0].size:
+            i = int(np.argmax(self.v4[1]))
+            candidates.append((int(self.v4[1][i]), unpack_ipv4(self.v4[0][i])))
+        if self.v6[0].size:
+            i = int(np.argmax(self.v6[1]))
+            candidates.append((int(self.v6[1][i]), unpack_ipv6(self.v6[0][i])))
+        for ip, total in self.other.items():
+            candidates.append((total, ip.decode("utf-8", errors="replace") if isinstance(ip, bytes) else ip))
+        if not candidates:
+            return None
+        total, ip = max(candidates, key=lambda candidate: candidate[0])
+        return ip, total
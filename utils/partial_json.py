@@ -0,0 +1,67 @@
+import json
+import re
+
+_DECODER = json.JSONDecoder()
+_OBJECT_START = re.compile(r"\s*\{")
+_KEY = re.compile(r'\s*"([^"\\]*(?:\\.[^"\\]*)*)"\s*:\s*')
+_SEPARATOR = re.compile(r"\s*([,}])")
+
+
+def parse_partial_object(text):
+    """
+    Parses a JSON object that may be cut off anywhere, keeping every
+    top-level field that was read completely.
+
+    Well-formed input goes straight to the C decoder. Otherwise the text is
+    scanned once, forwards: keys are matched with a regex and each value is
+    decoded in place with `raw_decode`, so nested values cost C speed and no
+    part is parsed twice. The scan stops at the first field that is cut
+    off. A number running to the very end of the text is dropped too, since
+    it may have lost digits.
+
+    Args:
+        text (str): One JSON object, possibly truncated.
+
+    Returns:
+        tuple: (dict of fields, complete: bool), or (None, False) if no object starts the text.
+    """
+    try:
+        value = _DECODER.decode(text)
+        return (value, True) if isinstance(value, dict) else (None, False)
+    except ValueError:
+        return scan_partial_object(text)
+
+
+def scan_partial_object(text):
+    """
+    The forward scan of `parse_partial_object`, for text the decoder already rejected.
+    """
+    start = _OBJECT_START.match(text)
+    if start is None:
+        return None, False
+    fields = {}
+    position = start.end()
+    length = len(text)
+    raw_decode = _DECODER.raw_decode
+    while True:
+        key_match = _KEY.match(text, position)
+        if key_match is None:
+            # "{}" or a trailing comma before "}"; anything else is a cut-off key
+            closing = _SEPARATOR.match(text, position)
+            return fields, closing is not None and closing.group(1) == "}"
+        key = key_match.group(1)
+        if "\\" in key:
+            key = json.loads(f'"{key}"')
+        try:
+            value, end = raw_decode(text, key_match.end())
+        except ValueError:
+            return fields, False
+        if end == length and type(value) in (int, float):
+            return fields, False
+        fields[key] = value
+        separator = _SEPARATOR.match(text, end)
+        if separator is None:
+            return fields, False
+        if separator.group(1) == "}":
+            return fields, True
+        position = separator.end()
@@ -0,0 +1,214 @@
+import math
+import mmap
+import os
+
+import numpy as np
+
+# Bytes of the file scanned per step
+BLOCK_SIZE = 4 * 1024 * 1024
+UTF8_BOM = b"\xef\xbb\xbf"
+
+_ALNUM = np.zeros(256, dtype=bool)
+_ALNUM[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789", dtype=np.uint8)] = True
+_BLANK = np.zeros(256, dtype=bool)
+_BLANK[np.frombuffer(b" \t\f\v", dtype=np.uint8)] = True
+_WORD_OFFSETS = np.arange(8)
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def leading_ids(data):
+    """
+    Finds the leading alphanumeric ID of every line of a byte array, after
+    leading blanks; "\n", "\r\n" and a lone "\r" all end a line. The array
+    must end with a line break (a sentinel the IDs stop at).
+
+    Returns:
+        tuple: (start offsets, lengths) of the IDs, as int64 arrays.
+    """
+    breaks = (data == 10) | (data == 13)
+    starts = np.flatnonzero(breaks[:-1]) + 1
+    starts = np.concatenate(([0], starts))
+    blank = _BLANK[data[starts]]
+    while blank.any():
+        starts[blank] += 1
+        blank[blank] = _BLANK[data[starts[blank]]]
+    starts = starts[_ALNUM[data[starts]]]
+    stops = np.flatnonzero(~_ALNUM[data])
+    lengths = stops[np.searchsorted(stops, starts)] - starts
+    return starts, lengths
+
+
+def hash_ids(data, starts, lengths):
+    """
+    Hashes byte runs of `data` to uint64 in bulk: eight bytes at a time
+    (zero-padded) are mixed into a length-seeded state, then finalized with
+    splitmix64. Only runs longer than the current offset stay in the loop,
+    so a few long IDs do not widen the work for the others.
+
+    Returns:
+        numpy.ndarray: uint64 hash per run.
+    """
+    hashes = lengths.astype(np.uint64)
+    last = len(data) - 1
+    active = np.arange(len(starts))
+    offset = 0
+    while len(active):
+        positions = starts[active, None] + offset + _WORD_OFFSETS
+        words = data[np.minimum(positions, last)]
+        words[offset + _WORD_OFFSETS >= lengths[active, None]] = 0
+        hashes[active] ^= words.view(np.uint64)[:, 0]
+        hashes[active] *= _MULTIPLIER
+        offset += 8
+        active = active[lengths[active] > offset]
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= _MIX_1
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= _MIX_2
+    hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+def iter_id_hashes(file_path, block_size=BLOCK_SIZE):
+    """
+    Yields, per newline-aligned block of a memory-mapped file, the uint64
+    hashes of the leading IDs of its lines. Scanned pages are released from
+    the mapping as the scan moves on, so resident memory stays at about one block.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        position = len(UTF8_BOM) if mapped[:len(UTF8_BOM)] == UTF8_BOM else 0
+        released = 0
+        while position < size:
+            # Blocks end just after a newline, found in the mapping being scanned
+            end = position + block_size
+            if end < size:
+                newline = mapped.find(b"\n", end - 1)
+                end = size if newline == -1 else newline + 1
+            else:
+                end = size
+            data = np.frombuffer(mapped[position:end] + b"\n", dtype=np.uint8)
+            starts, lengths = leading_ids(data)
+            yield hash_ids(data, starts, lengths)
+            position = end
+            release_end = end // mmap.PAGESIZE * mmap.PAGESIZE
+            if hasattr(mapped, "madvise") and release_end > released:
+                mapped.madvise(mmap.MADV_DONTNEED, released, release_end - released)
+                released = release_end
+
+
+def _sorted_unique(values):
+    values = np.sort(values)
+    if len(values) > 1:
+        values = values[np.concatenate(([True], values[1:] != values[:-1]))]
+    return values
+
+
+class HashSet64:
+    """
+    A set of 64-bit hashes kept as one sorted uint64 array (8 bytes per
+    member), with added hashes buffered and merged in bulk.
+    """
+
+    def __init__(self):
+        self.members = np.zeros(0, dtype=np.uint64)
+        self._pending = []
+        self._pending_size = 0
+
+    def add(self, hashes):
+        self._pending.append(hashes)
+        self._pending_size += len(hashes)
+        if self._pending_size > max(1 << 20, len(self.members)):
+            self.compact()
+
+    def compact(self):
+        if not self._pending:
+            return
+        pending = _sorted_unique(np.concatenate(self._pending))
+        self._pending = []
+        self._pending_size = 0
+        if len(self.members):
+            index = np.minimum(np.searchsorted(self.members, pending), len(self.members) - 1)
+            pending = pending[self.members[index] != pending]
+        merged = np.concatenate((self.members, pending))
+        # Two sorted runs: the stable sort (timsort) merges them in linear time
+        merged.sort(kind="stable")
+        self.members = merged
+
+    def __len__(self):
+        self.compact()
+        return len(self.members)
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count over 64-bit hashes with 2**precision one-byte
+    registers; the relative standard error is about 1.04 / sqrt(2**precision)
+    (0.8% at the default precision of 14, in 16 KiB).
+    """
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add(self, hashes):
+        precision = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - precision)).astype(np.intp)
+        rest = hashes << precision
+        # Rank = leading zeros of the remaining bits + 1, from the exact log2 of a 32-bit half
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        rank = np.where(
+            high > 0,
+            32 - np.floor(np.log2(np.maximum(high, 1))),
+            64 - np.floor(np.log2(np.maximum(low, 1))),
+        )
+        rank = np.minimum(np.where((high == 0) & (low == 0), 65, rank), 64 - self.precision + 1)
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def __len__(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * size and empty:
+            # Small-range correction: linear counting
+            estimate = size * math.log(size / empty)
+        return int(round(estimate))
+
+
+def count_unique_ids(file_path, approximate=False, precision=14, block_size=BLOCK_SIZE):
+    """
+    Counts the distinct leading alphanumeric IDs of a file's lines.
+
+    The file is memory-mapped and scanned a block at a time with NumPy: line
+    starts come from the newline offsets and no per-line Python object is
+    made. IDs are deduplicated as 64-bit hashes (collisions are negligible
+    below billions of IDs), or estimated with a HyperLogLog sketch.
+
+    Args:
+        file_path (str): Path to the text file.
+        approximate (bool): Estimate with HyperLogLog instead of counting exactly.
+        precision (int): HyperLogLog precision (registers = 2**precision).
+        block_size (int): Bytes scanned per step.
+
+    Returns:
+        tuple: (count: int, lines with an ID: int)
+    """
+    seen = HyperLogLog(precision) if approximate else HashSet64()
+    matched = 0
+    for hashes in iter_id_hashes(file_path, block_size):
+        matched += len(hashes)
+        seen.add(hashes)
+    return len(seen), matched
@@ -0,0 +1,108 @@
+import codecs
+import io
+import os
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Bytes read ahead from the start of a member to pick its encoding (also the read buffer size)
+SNIFF_SIZE = 64 * 1024
+# Members processed at once; each thread reads through its own ZipFile handle
+ZIP_MEMBER_WORKERS = int(os.getenv("ZIP_MEMBER_WORKERS", "4"))
+
+
+def detect_encoding(head, default=None):
+    """
+    Picks the text encoding of a member from its first bytes.
+
+    A byte order mark wins; otherwise `default` is used if given. Without
+    one, NUL bytes in every other position mean UTF-16, text that decodes as
+    UTF-8 (a sequence cut at the end of `head` is allowed) means UTF-8, and
+    anything else is read as cp1252.
+
+    Args:
+        head (bytes): The first bytes of the member.
+        default (str, optional): Encoding to use when there is no byte order mark.
+
+    Returns:
+        str: A codec name.
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if default:
+        return default
+    if len(head) >= 2 and head[1::2].count(0) > len(head) // 4:
+        return "utf-16-le"
+    if len(head) >= 2 and head[0::2].count(0) > len(head) // 4:
+        return "utf-16-be"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def find_member(zip_ref, name):
+    """
+    Returns the ZipInfo of `name`, or of the only file with that base name in a subfolder, or None.
+    """
+    try:
+        return zip_ref.getinfo(name)
+    except KeyError:
+        pass
+    matches = [
+        info for info in zip_ref.infolist()
+        if not info.is_dir() and posixpath.basename(info.filename) == name and not info.filename.startswith("__MACOSX/")
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+@contextmanager
+def open_text_member(zip_ref, name, encoding=None):
+    """
+    Opens a zip member as text, decoded incrementally while it is inflated,
+    without extracting it to disk. Newlines are passed through untranslated,
+    as the csv module expects.
+
+    Args:
+        zip_ref (zipfile.ZipFile): The open archive.
+        name (str): Member name (see `find_member`).
+        encoding (str, optional): Encoding to use unless the member starts with a byte order mark.
+
+    Yields:
+        io.TextIOWrapper: The member's text.
+
+    Raises:
+        FileNotFoundError: If the archive has no such member.
+    """
+    info = find_member(zip_ref, name)
+    if info is None:
+        raise FileNotFoundError(f"{name} not found in the zip file")
+    with zip_ref.open(info) as raw:
+        buffered = io.BufferedReader(raw, buffer_size=SNIFF_SIZE)
+        encoding = detect_encoding(buffered.peek(SNIFF_SIZE), encoding)
+        with io.TextIOWrapper(buffered, encoding=encoding, newline="") as text:
+            yield text
+
+
+def map_members(zip_file_path, function, names, workers=None):
+    """
+    Calls `function(zip_ref, name)` for each member name concurrently and returns the results in order.
+
+    Each worker thread opens the archive itself, so members are read
+    through separate file handles; inflation releases the GIL, so it
+    overlaps with the parsing in the other threads.
+    """
+    workers = max(1, min(len(names), workers or ZIP_MEMBER_WORKERS))
+
+    def call(name):
+        with zipfile.ZipFile(zip_file_path, "r") as zip_ref:
+            return function(zip_ref, name)
+
+    if workers == 1:
+        return [call(name) for name in names]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(call, names))